@@ -16,10 +16,30 @@ import imp
 import math
 import errno
 import stat
+import collections
+import multiprocessing
+import select
+import atexit
+import uuid
+import struct
+import mmap
+import hashlib
+import gzip
+import bz2
+import xml.etree.ElementTree
 try:
 	from queue import Queue
 except:
 	from Queue import Queue
+try:
+	import lzma
+except ImportError:
+	lzma = None # Not available with Python 2, neither is the xz compression
+try:
+	import ctypes
+	import ctypes.util
+except ImportError:
+	ctypes = None
 
 # ---- Logging methods --------------------------------------------------------
 
@@ -71,13 +91,11 @@ class Commands:
 	@staticmethod
 	def http(context, argList):
 		if len(argList) != 1:
-			raise Exception("Malformed sleep command, must take exactly 1 argument (port).")
+			raise Exception("Malformed http command, must take exactly 1 argument (port).")
 		port = int(argList[0])
 		info("Deployed HTTP server at http://localhost:%i, serving '%s'" % (port, context["cwd"]))
-		if sys.version_info >= (3, 0):
-			shell([sys.executable, "-m", "http.server", str(port)], cwd=context["cwd"])
-		else:
-			shell([sys.executable, "-m", "SimpleHTTPServer", str(port)], cwd=context["cwd"])
+		# Can also be run as a daemon: "daemon www python .irapp/server.py 8080"
+		shell([sys.executable, os.path.join(os.path.dirname(os.path.realpath(__file__)), "server.py"), str(port)], cwd=context["cwd"])
 
 	@staticmethod
 	def port(context, argList):
@@ -101,30 +119,155 @@ class Commands:
 		shell(argList, cwd=context["cwd"], blocking=False)
 
 """
-Start a list of commands
+Look for the command starting an application with a module in the presets.
+Returns its arguments, its options and its context, or None if not found.
 """
-def start(config, commandList):
-	# Context fo the command
-	context = {
-		"cwd": config["root"]
-	}
+def getStartCommand(config, moduleId, appId):
+	presets = config["start"]
+	if isinstance(presets, str):
+		presets = [presets]
+	if isinstance(presets, list):
+		presets = {"default": presets}
+	for commandList in presets.values():
+		context = {
+			"cwd": config["root"]
+		}
+		for command in commandList:
+			options = {}
+			if isinstance(command, dict):
+				options = {key: value for key, value in command.items() if key not in ["command", "after"]}
+				command = command["command"]
+			argList = shellSplit(command)
+			if argList[0] == "cd":
+				Commands.cd(context, argList[1:])
+			elif argList[0] == moduleId and len(argList) > 2 and argList[1] == appId:
+				return argList, options, context
+	return None
 
-	for command in commandList:
-		argList = shellSplit(command)
+"""
+Start the command presets presetIdList (all by default) out of presets, a dictionary {<presetId>: <commandList>}.
+
+A command is either a string or a dictionary {"command": <command>, "after": [<name>, ...], ...}, the other
+entries (readiness probes, replicas...) being passed as options to the module starting the application. Commands are launched concurrently
+as soon as their dependencies are met:
+- An application started by a module (e.g. daemon) depends on the applications or presets named in "after",
+  and on the previous pre-built command of its preset.
+- A pre-built command (sleep, run...) acts as a barrier, it depends on all the previous commands of its preset.
+- cd only changes the working directory of the following commands of its preset.
+Presets named in "after" are started as well.
+"""
+def start(config, presets, presetIdList=None):
+
+	presetIdList = list(presets.keys()) if presetIdList is None else list(presetIdList)
+
+	# Build the list of tasks
+	taskList = []
+	appTasks = {}
+	presetTasks = {}
+	parsedSet = set()
+	while presetIdList:
+		presetId = presetIdList.pop(0)
+		if presetId in parsedSet:
+			continue
+		parsedSet.add(presetId)
+		info("Starting command preset '%s'" % (presetId))
 
-		# Command from module
-		if argList[0] in config["pimpl"]:
-			if len(argList) < 3:
-				raise Exception("Too few arguments for command '%s'" % (command))
-			config["pimpl"][argList[0]].start(argList[1], argList[2:], context)
-		# Pre-built command
-		else:
-			commandExec = getattr(Commands, argList[0], None)
-			if commandExec:
-				commandExec(context, argList[1:])
-			# Else an error occured
+		# Context fo the command
+		context = {
+			"cwd": config["root"]
+		}
+		barrier = None
+		sinceBarrierList = []
+		for command in presets[presetId]:
+			options = {}
+			afterList = []
+			if isinstance(command, dict):
+				options = {key: value for key, value in command.items() if key not in ["command", "after"]}
+				afterList = command.get("after", [])
+				command = command["command"]
+			argList = shellSplit(command)
+
+			if argList[0] == "cd":
+				Commands.cd(context, argList[1:])
+				continue
+
+			index = len(taskList)
+			task = {
+				"command": command,
+				"after": set() if barrier is None else set([barrier]),
+				"names": afterList
+			}
+			# Command from module
+			if argList[0] in config["pimpl"]:
+				if len(argList) < 3:
+					raise Exception("Too few arguments for command '%s'" % (command))
+				if argList[1] in appTasks:
+					raise Exception("Application '%s' is started twice" % (argList[1]))
+				appTasks[argList[1]] = index
+				sinceBarrierList.append(index)
+				task["run"] = (config["pimpl"][argList[0]].start, (argList[1], argList[2:], dict(context)), options)
+			# Pre-built command
 			else:
-				raise Exception("Unknown command '%s'" % (command))
+				commandExec = getattr(Commands, argList[0], None)
+				# Else an error occured
+				if not commandExec:
+					raise Exception("Unknown command '%s'" % (command))
+				task["run"] = (commandExec, (dict(context), argList[1:]), {})
+				task["after"].update(sinceBarrierList)
+				barrier = index
+				sinceBarrierList = []
+
+			presetIdList.extend([name for name in afterList if name in presets])
+			presetTasks.setdefault(presetId, []).append(index)
+			taskList.append(task)
+
+	# Resolve the dependencies
+	for index, task in enumerate(taskList):
+		for name in task["names"]:
+			if name in appTasks:
+				task["after"].add(appTasks[name])
+			elif name in presetTasks:
+				task["after"].update(presetTasks[name])
+			else:
+				raise Exception("Unknown dependency '%s' for command '%s'" % (name, task["command"]))
+		task["after"].discard(index)
+
+	# Launch the tasks as soon as their dependencies are completed
+	condition = threading.Condition()
+	startedSet = set()
+	doneSet = set()
+	errorList = []
+
+	def runTask(index):
+		try:
+			fct, args, kwargs = taskList[index]["run"]
+			fct(*args, **kwargs)
+		except Exception as e:
+			with condition:
+				errorList.append(e)
+		finally:
+			with condition:
+				doneSet.add(index)
+				condition.notify()
+
+	with condition:
+		while len(doneSet) < len(taskList):
+			if not errorList:
+				for index, task in enumerate(taskList):
+					if index not in startedSet and task["after"] <= doneSet:
+						startedSet.add(index)
+						thread = threading.Thread(target=runTask, args=(index, ))
+						thread.daemon = True
+						thread.start()
+			if startedSet == doneSet:
+				if errorList:
+					break
+				raise Exception("Circular dependency between commands: %s" % (", ".join(["'%s'" % (task["command"]) for index, task in enumerate(taskList) if index not in doneSet])))
+			# Use a timeout to remain interruptible
+			condition.wait(1)
+
+	if errorList:
+		raise errorList[0]
 
 # ---- Utility methods --------------------------------------------------------
 
@@ -160,6 +303,78 @@ def rmtree(path, ignoreError=False):
 	if retryCounter == 0:
 		fatal("Unable to delete directory '%s'" % (str(path)))
 
+"""
+Directory where the deleted directories are moved before being reclaimed
+"""
+trashPath = os.path.join(os.path.dirname(os.path.realpath(__file__)), "trash")
+
+"""
+Script reclaiming the content of the trash, run as a detached process
+"""
+RECLAIM_SCRIPT = """
+import os, sys, shutil
+for name in os.listdir(sys.argv[1]):
+	path = os.path.join(sys.argv[1], name)
+	try:
+		if name.startswith("."):
+			continue
+		elif os.path.isdir(path) and not os.path.islink(path):
+			shutil.rmtree(path, ignore_errors=True)
+		else:
+			os.remove(path)
+	except OSError:
+		pass
+try:
+	os.remove(os.path.join(sys.argv[1], ".reclaim.pid"))
+except OSError:
+	pass
+"""
+
+"""
+Delete a file or a directory without waiting. It is atomically moved into the trash
+and reclaimed by a detached process which outlives this one.
+If it cannot be moved (on another filesystem for example), it is deleted synchronously.
+"""
+def trash(path, trashDirPath=None):
+	if not os.path.lexists(path):
+		return
+	trashDirPath = trashDirPath or trashPath
+	mkdir(trashDirPath)
+	try:
+		os.rename(path, os.path.join(trashDirPath, str(uuid.uuid4())))
+	except OSError:
+		if os.path.isdir(path) and not os.path.islink(path):
+			rmtree(path)
+		else:
+			os.remove(path)
+		return
+	reclaimTrash(trashDirPath)
+
+"""
+Start reclaiming the trash in the background if it is not empty and not already being reclaimed.
+"""
+def reclaimTrash(trashDirPath=None):
+	trashDirPath = trashDirPath or trashPath
+	if not os.path.isdir(trashDirPath) or not [name for name in os.listdir(trashDirPath) if not name.startswith(".")]:
+		return
+	pidPath = os.path.join(trashDirPath, ".reclaim.pid")
+	try:
+		with open(pidPath, "r") as f:
+			os.kill(int(f.read()), 0)
+		return
+	except:
+		pass
+	kwargs = {}
+	if sys.platform == "win32":
+		# DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+		kwargs["creationflags"] = 0x00000008 | 0x00000200
+	elif hasattr(os, "setsid"):
+		kwargs["preexec_fn"] = os.setsid
+	with open(os.devnull, "r+") as devnull:
+		proc = subprocess.Popen([sys.executable, "-c", RECLAIM_SCRIPT, trashDirPath], stdin=devnull, stdout=devnull, stderr=devnull, close_fds=True, **kwargs)
+	with open(pidPath, "w") as f:
+		f.write(str(proc.pid))
+
 """
 Build the directory of directories missing to complete the path
 """
@@ -238,9 +453,9 @@ def configDescriptor():
 			"root": True
 		},
 		"start": {
-			"type": [dict, list, str],
+			"type": [dict, list, (str, dict)],
 			"example": {"server": ["cd server/bin", "daemon server ./main"]},
-			"help": "Predefined commands to ease developmnent or deployment.",
+			"help": "Predefined commands to ease developmnent or deployment. A command can also be {\"command\": <command>, \"ready\": {...}, \"after\": [...]}, to wait until the application is ready: \"tcp\": <port>, \"http\": <url>, \"log\": <regex>, \"pid\": <path>, \"timeout\": <seconds>; and to start it only once the applications or presets listed in \"after\" are ready, independent applications being started concurrently. Daemons also support \"replicas\": <number> or \"auto\" to start one instance per job (each gets $IRAPP_INSTANCE), and \"listen\": [<port> or \"<host>:<port>\", ...] for listening sockets bound by the supervisor with SO_REUSEPORT and passed to the application (LISTEN_FDS), and \"stopTimeout\": <seconds> for the time given to stop gracefully before being killed (default 10s).",
 			"root": True
 		},
 		"dependencies": {
@@ -332,11 +547,10 @@ def configSanityCheck(config, user=False, modules={}):
 		"""
 		def assertTypesInternal(values, typeList):
 			# Handle the case where str can be unicode and since there is a major difference between python2 and 3,
-			# it needs to be addressed with basestring or str
-			if typeList[0] == str:
-				if not isinstance(values, basestring if sys.version_info.major == 2 else str):
-					return False
-			elif not isinstance(values, typeList[0]):
+			# it needs to be addressed with basestring or str. A tuple means any of the types.
+			expectedTypes = typeList[0] if isinstance(typeList[0], tuple) else (typeList[0], )
+			expectedTypes = tuple([(basestring if sys.version_info.major == 2 else str) if t == str else t for t in expectedTypes])
+			if not isinstance(values, expectedTypes):
 				return False
 
 			if len(typeList) > 1:
@@ -353,7 +567,7 @@ def configSanityCheck(config, user=False, modules={}):
 		if key in config:
 			if not assertTypesInternal(config[key], typeList):
 				raise Exception("The configuration {... \"%s\": %s ...} is not of valid format, it should be of type %s; for example: {... \"%s\": %s ...}" % (
-						key, json.dumps(config[key]), "::".join([t.__name__ for t in typeList]), key, json.dumps(example)))
+						key, json.dumps(config[key]), "::".join(["|".join([t.__name__ for t in (types if isinstance(types, tuple) else (types, ))]) for types in typeList]), key, json.dumps(example)))
 
 	def assertDescriptor(conf, descriptor, modules, keyList=[], isRoot=True):
 		for key in conf.keys():
@@ -377,6 +591,82 @@ def configSanityCheck(config, user=False, modules={}):
 
 	assertDescriptor(config, configDescriptor(), modules)
 
+"""
+Matcher for the ignore rules of the configuration, such as "git.gitignore.irapp" or "cmake.builds.*-debug".
+Each rule is a list of keys separated by dots, where a key can contain '*' wildcards matching any
+sequence of characters. A rule matches a key path if each of its keys matches entirely the key at the
+same depth, it also matches all the nested keys.
+
+Rules are compiled once into a trie, literal keys are looked-up directly while keys with wildcards
+are matched through an anchored regular expression.
+"""
+class IgnoreMatcher:
+	def __init__(self, ruleList):
+		self.root = IgnoreMatcher.createNode()
+		for rule in ruleList:
+			node = self.root
+			for key in rule.split("."):
+				if "*" in key:
+					globs = [glob for glob in node["globs"] if glob["key"] == key]
+					if not globs:
+						globs = [{
+							"key": key,
+							"regexpr": re.compile("^%s$" % (".*".join([re.escape(part) for part in key.split("*")])), re.DOTALL),
+							"node": IgnoreMatcher.createNode()
+						}]
+						node["globs"].append(globs[0])
+					node = globs[0]["node"]
+				else:
+					node = node["literals"].setdefault(key, IgnoreMatcher.createNode())
+			node["terminal"] = True
+
+	@staticmethod
+	def createNode():
+		return {"terminal": False, "literals": {}, "globs": []}
+
+	"""
+	Return the list of nodes matching a key, from a list of nodes
+	"""
+	@staticmethod
+	def getChildren(nodeList, key):
+		children = []
+		for node in nodeList:
+			if key in node["literals"]:
+				children.append(node["literals"][key])
+			children.extend([glob["node"] for glob in node["globs"] if glob["regexpr"].match(key)])
+		return children
+
+	"""
+	Tells whether the key path passed into argument is ignored
+	"""
+	def isIgnored(self, *keys):
+		nodeList = [self.root]
+		for key in keys:
+			nodeList = IgnoreMatcher.getChildren(nodeList, key)
+			if not nodeList:
+				return False
+			if any(node["terminal"] for node in nodeList):
+				return True
+		return False
+
+	"""
+	Remove all ignored keys from a configuration
+	"""
+	def apply(self, config):
+		def applyNodes(nodeList, config):
+			# Only go through all the keys if there are wildcards, otherwise look-up the literal keys
+			if any(node["globs"] for node in nodeList):
+				keyList = list(config.keys())
+			else:
+				keyList = set([key for node in nodeList for key in node["literals"] if key in config])
+			for key in keyList:
+				children = IgnoreMatcher.getChildren(nodeList, key)
+				if any(node["terminal"] for node in children):
+					del config[key]
+				elif children and isinstance(config[key], dict):
+					applyNodes(children, config[key])
+		applyNodes([self.root], config)
+
 """
 Return the specific command based on the attributes and the global configuration
 """
@@ -434,21 +724,60 @@ To store the instance of process started with the non-blocking option
 """
 runningProcess = []
 
+"""
+Tells if a process is running, zombies (exited but not yet reaped by their parent) are not.
+On Windows, it cannot be told without listing the processes, they are then assumed to be running.
+"""
+def isProcessRunning(pid):
+	if sys.platform == "win32":
+		return True
+	try:
+		with open("/proc/%i/stat" % (pid), "r") as f:
+			return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+	except (IOError, OSError):
+		if os.path.isdir("/proc/self"):
+			return False
+	try:
+		os.kill(pid, 0)
+	except OSError as e:
+		return e.errno == errno.EPERM
+	return True
+
+"""
+Poll (or wait for) a process started with subprocess, if usage is set and supported by the platform,
+it is filled with the resources used by the process.
+Returns the return code or None if still running.
+"""
+def waitProcess(proc, usage=None, blocking=False):
+	if usage is None or not hasattr(os, "wait4") or proc.returncode is not None:
+		return proc.wait() if blocking else proc.poll()
+	try:
+		pid, status, rusage = os.wait4(proc.pid, 0 if blocking else os.WNOHANG)
+	except OSError:
+		return proc.wait() if blocking else proc.poll()
+	if pid == 0:
+		return None
+	proc.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+	# Linux reports the maximum resident set size in kilobytes, macOS in bytes
+	usage["maxRssKB"] = rusage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+	return proc.returncode
+
 """
 Execute a shell command in a specific directory.
 If it fails, it will throw.
 @param blocking Tells if the process should block the execution. If not it will run in parallel and might block the ending of the caller
                 process if it ends.
 """
-def shell(command, cwd=".", capture=False, ignoreError=False, queue=None, signal=None, hideStdout=False, hideStderr=False, blocking=True):
+def shell(command, cwd=".", capture=False, ignoreError=False, queue=None, signal=None, hideStdout=False, hideStderr=False, blocking=True, usage=None):
 
-	def enqueueOutput(out, queue, signal):
+	def enqueueOutput(out, queue, signal, closed):
 		try:
 			for line in iter(out.readline, b''):
 				queue.put(line.rstrip().decode('utf-8', 'ignore'))
 		except:
 			pass
 		out.close()
+		closed.set()
 		signal.set()
 
 	stdout = open(os.devnull, 'w') if hideStdout else (subprocess.PIPE if capture or queue else None)
@@ -478,11 +807,16 @@ def shell(command, cwd=".", capture=False, ignoreError=False, queue=None, signal
 
 	# Wait until a signal is raised or until the the process is terminated
 	if capture:
-		outputThread = threading.Thread(target=enqueueOutput, args=(proc.stdout, queue, signal))
+		closed = threading.Event()
+		outputThread = threading.Thread(target=enqueueOutput, args=(proc.stdout, queue, signal, closed))
 		outputThread.start()
 		signal.wait()
+		# If the output has been closed, the process is about to terminate, wait for it
+		# instead of killing it.
+		if closed.is_set():
+			waitProcess(proc, usage, blocking=True)
 	else:
-		while proc.poll() is None:
+		while waitProcess(proc, usage) is None:
 			time.sleep(0.1)
 			if signal.is_set():
 				break
@@ -514,14 +848,358 @@ def shell(command, cwd=".", capture=False, ignoreError=False, queue=None, signal
 	# Build the output list
 	return list(queue.queue) if isReturnStdout else []
 
+"""
+Bounded capture of the output of a command.
+It keeps the last lines in memory (up to maxSizeBytes) and, if a spool path is set,
+writes the full output to this file. It exposes the same put() method as a Queue,
+hence it can be passed to shell() as a queue.
+"""
+class OutputCapture:
+	def __init__(self, maxSizeBytes=64 * 1024, spoolPath=None):
+		self.maxSizeBytes = maxSizeBytes
+		self.sizeBytes = 0
+		self.lines = collections.deque()
+		self.lock = threading.Lock()
+		self.spoolPath = spoolPath
+		self.spool = codecs.open(spoolPath, "w", encoding="utf-8") if spoolPath else None
+
+	def put(self, line):
+		with self.lock:
+			if self.spool:
+				self.spool.write(line + "\n")
+			self.lines.append(line)
+			self.sizeBytes += len(line) + 1
+			# Keep at least the last line, even if it is bigger than the maximum size
+			while self.sizeBytes > self.maxSizeBytes and len(self.lines) > 1:
+				self.sizeBytes -= len(self.lines.popleft()) + 1
+
+	"""
+	Return the last lines captured
+	"""
+	def tail(self):
+		with self.lock:
+			return list(self.lines)
+
+	"""
+	Close the spool file, and delete it unless it needs to be kept
+	"""
+	def close(self, keep=False):
+		with self.lock:
+			if self.spool:
+				self.spool.close()
+				self.spool = None
+				if not keep and os.path.exists(self.spoolPath):
+					os.remove(self.spoolPath)
+
+"""
+Persistent record of the wall time (and peak memory when available) of the commands previously executed.
+Durations are smoothed over the runs and the least recently used entries are dropped
+to keep the store compact.
+"""
+class DurationHistory:
+	def __init__(self, path, maxEntries=1000, smoothing=0.5):
+		self.path = path
+		self.maxEntries = maxEntries
+		self.smoothing = smoothing
+		self.lock = threading.Lock()
+		self.durations = {}
+		try:
+			with open(self.path, "r") as f:
+				self.durations = json.load(f)
+		except:
+			pass
+
+	@staticmethod
+	def key(command):
+		return " ".join(command) if isinstance(command, list) else command
+
+	"""
+	Return the expected duration of a command, unknown commands default to the average of the known ones
+	"""
+	def estimate(self, command, default=None):
+		with self.lock:
+			entry = self.durations.get(DurationHistory.key(command))
+			if entry:
+				return entry[0]
+			if default is not None:
+				return default
+			return (sum([entry[0] for entry in self.durations.values()]) / len(self.durations)) if self.durations else 0.
+
+	"""
+	Return the maximum resident set size observed for a command in kilobytes, None if unknown
+	"""
+	def memory(self, command):
+		with self.lock:
+			entry = self.durations.get(DurationHistory.key(command))
+			return entry[2] if entry and len(entry) > 2 else None
+
+	def update(self, command, durationS, maxRssKB=None):
+		key = DurationHistory.key(command)
+		with self.lock:
+			entry = self.durations.get(key)
+			durationS = (entry[0] * self.smoothing + durationS * (1. - self.smoothing)) if entry else durationS
+			self.durations[key] = [round(durationS, 3), int(time.time())]
+			# Keep the worst memory usage, the one to budget for
+			maxRssKB = max(maxRssKB or 0, entry[2] if entry and len(entry) > 2 else 0)
+			if maxRssKB:
+				self.durations[key].append(maxRssKB)
+
+	"""
+	Sort the commands by expected duration, the longest first, the order of equal ones is preserved
+	"""
+	def sort(self, commandList):
+		return sorted(commandList, key=lambda command: -self.estimate(command))
+
+	def save(self):
+		with self.lock:
+			durations = self.durations
+			if len(durations) > self.maxEntries:
+				keyList = sorted(durations.keys(), key=lambda key: durations[key][1])
+				durations = {key: durations[key] for key in keyList[-self.maxEntries:]}
+			tempPath = "%s.%i.tmp" % (self.path, os.getpid())
+			with open(tempPath, "w") as f:
+				json.dump(durations, f, separators=(",", ":"))
+			os.rename(tempPath, self.path)
+
+"""
+Adapt the number of jobs running in parallel to the load of the machine.
+The limit ramps up quickly (doubling) between a floor and a ceiling until the first sign of pressure,
+then additively; it is halved whenever the CPU or the memory is under pressure.
+Pressure is read from PSI (/proc/pressure) when available, from /proc/loadavg and /proc/meminfo otherwise.
+"""
+class LoadController:
+	def __init__(self, floor=1, ceiling=None, intervalS=1., memoryReserveRatio=0.1, cpuPressureThreshold=50., memoryPressureThreshold=10.):
+		self.nbCpus = multiprocessing.cpu_count()
+		self.floor = max(floor, 1)
+		self.ceiling = max(ceiling or self.nbCpus, self.floor)
+		self.intervalS = intervalS
+		self.memoryReserveRatio = memoryReserveRatio
+		self.cpuPressureThreshold = cpuPressureThreshold
+		self.memoryPressureThreshold = memoryPressureThreshold
+		self.limit = self.floor
+		self.isSlowStart = True
+		self.lastSampleTime = None
+		self.memInfo = {}
+
+	"""
+	Read the "some avg10" value of a PSI file, None if not available
+	"""
+	@staticmethod
+	def readPressure(resource):
+		try:
+			with open("/proc/pressure/%s" % (resource), "r") as f:
+				for line in f:
+					if line.startswith("some"):
+						return float(re.search(r'avg10=([0-9\.]+)', line).group(1))
+		except:
+			pass
+		return None
+
+	@staticmethod
+	def readLoadAverage():
+		try:
+			with open("/proc/loadavg", "r") as f:
+				return float(f.read().split()[0])
+		except:
+			pass
+		return None
+
+	"""
+	Read /proc/meminfo, values are in kilobytes
+	"""
+	@staticmethod
+	def readMemInfo():
+		memInfo = {}
+		try:
+			with open("/proc/meminfo", "r") as f:
+				for line in f:
+					key, value = line.split(":", 1)
+					memInfo[key] = int(value.split()[0])
+		except:
+			pass
+		return memInfo
+
+	def isCpuPressure(self):
+		pressure = LoadController.readPressure("cpu")
+		if pressure is not None:
+			return pressure > self.cpuPressureThreshold
+		load = LoadController.readLoadAverage()
+		return load is not None and load > self.nbCpus * 1.25
+
+	def isMemoryPressure(self):
+		pressure = LoadController.readPressure("memory")
+		if pressure is not None and pressure > self.memoryPressureThreshold:
+			return True
+		return self.getAvailableMemoryKB() == 0
+
+	"""
+	Memory available for new jobs in kilobytes (after the reserve), None if unknown
+	"""
+	def getAvailableMemoryKB(self):
+		if "MemAvailable" not in self.memInfo or "MemTotal" not in self.memInfo:
+			return None
+		return max(self.memInfo["MemAvailable"] - int(self.memInfo["MemTotal"] * self.memoryReserveRatio), 0)
+
+	"""
+	Return the number of jobs allowed to run in parallel, it is re-evaluated at most every intervalS
+	"""
+	def getLimit(self):
+		currentTime = timeit.default_timer()
+		if self.lastSampleTime is None or currentTime - self.lastSampleTime >= self.intervalS:
+			self.lastSampleTime = currentTime
+			self.memInfo = LoadController.readMemInfo()
+			if self.isMemoryPressure() or self.isCpuPressure():
+				self.limit = max(self.limit // 2, self.floor)
+				self.isSlowStart = False
+			else:
+				self.limit = min(self.limit * 2 if self.isSlowStart else self.limit + 1, self.ceiling)
+		return self.limit
+
+	"""
+	Tells if a job expected to use memoryKB can be started
+	"""
+	def hasMemoryFor(self, memoryKB):
+		availableKB = self.getAvailableMemoryKB()
+		return memoryKB is None or availableKB is None or memoryKB <= availableKB
+
+"""
+Jobserver compatible with the GNU make protocol (named pipe flavor), shared by all the processes started
+from the top-level one to keep the total concurrency within the machine budget.
+Each token read from the pipe allows one extra job, on top of the implicit slot owned by the process.
+Dispatched processes do not own an implicit slot, the top-level process lends its own while it is
+waiting for them.
+"""
+class Jobserver:
+	ENV_VARIABLE = "IRAPP_JOBSERVER"
+
+	def __init__(self, path, hasImplicitSlot=True, isOwner=False):
+		self.path = path
+		self.hasImplicitSlot = hasImplicitSlot
+		self.isOwner = isOwner
+		self.lock = threading.Lock()
+		self.tokens = []
+		# Opened in read-write mode, so that it never blocks on open and never reads EOF
+		self.fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+		atexit.register(self.close)
+
+	"""
+	Create a new jobserver with a budget of nbJobs (including the implicit slot of this process),
+	returns None if not supported on this platform.
+	"""
+	@staticmethod
+	def create(path, nbJobs):
+		if not hasattr(os, "mkfifo"):
+			return None
+		if os.path.exists(path):
+			os.remove(path)
+		os.mkfifo(path, 0o600)
+		jobserver = Jobserver(path, isOwner=True)
+		os.write(jobserver.fd, b"+" * max(nbJobs - 1, 0))
+		os.environ[Jobserver.ENV_VARIABLE] = "fifo:%s" % (path)
+		return jobserver
+
+	"""
+	Attach to the jobserver advertised in the environment if any.
+	"""
+	@staticmethod
+	def fromEnvironment(hasImplicitSlot=True):
+		auth = os.environ.get(Jobserver.ENV_VARIABLE, "")
+		if not auth.startswith("fifo:"):
+			return None
+		try:
+			return Jobserver(auth[5:], hasImplicitSlot=hasImplicitSlot)
+		except OSError as e:
+			warning("Cannot attach to jobserver '%s': %s" % (auth[5:], str(e)))
+		return None
+
+	"""
+	Acquire a token, wait up to timeout seconds (None to wait forever). Returns the token or None.
+	"""
+	def acquire(self, timeout=0):
+		startTime = timeit.default_timer()
+		while True:
+			try:
+				token = os.read(self.fd, 1)
+				if token:
+					with self.lock:
+						self.tokens.append(token)
+					return token
+			except OSError as e:
+				if e.errno not in [errno.EAGAIN, errno.EWOULDBLOCK]:
+					raise
+			remainingS = None if timeout is None else timeout - (timeit.default_timer() - startTime)
+			if remainingS is not None and remainingS <= 0:
+				return None
+			select.select([self.fd], [], [], remainingS)
+
+	def release(self, token):
+		with self.lock:
+			self.tokens.remove(token)
+		os.write(self.fd, token)
+
+	"""
+	Acquire up to maxJobs slots, including the implicit one. Wait for the first one if this process
+	does not own an implicit slot. Returns the number of slots and the list of tokens to be released.
+	"""
+	def acquireSlots(self, maxJobs):
+		tokens = [] if self.hasImplicitSlot else [self.acquire(timeout=None)]
+		nbSlots = len(tokens) + (1 if self.hasImplicitSlot else 0)
+		while nbSlots < maxJobs:
+			token = self.acquire()
+			if token is None:
+				break
+			tokens.append(token)
+			nbSlots += 1
+		return nbSlots, tokens
+
+	"""
+	Lend the implicit slot of this process to the others while idle (waiting for sub-processes).
+	"""
+	def lend(self):
+		jobserver = self
+		class Lend:
+			def __enter__(self):
+				if jobserver.hasImplicitSlot:
+					os.write(jobserver.fd, b"+")
+			def __exit__(self, *args):
+				if jobserver.hasImplicitSlot:
+					token = jobserver.acquire(timeout=None)
+					with jobserver.lock:
+						jobserver.tokens.remove(token)
+		return Lend()
+
+	def close(self):
+		if self.fd is None:
+			return
+		# Give back the tokens still held
+		with self.lock:
+			if self.tokens:
+				os.write(self.fd, b"".join(self.tokens))
+			self.tokens = []
+		os.close(self.fd)
+		self.fd = None
+		if self.isOwner and os.path.exists(self.path):
+			os.remove(self.path)
+
+"""
+The jobserver in use by this process, if any
+"""
+jobserver = None
+
 """
 Execute multiple commands, either sequentially or in parallel.
 It supports a limited number of iterations, of time or other options.
 
 @param nbIterations Total number of iteration of the commandList before terminating. If 0, it will be endless.
 @param isAutoTimeout If set, it will automatically calculate a timeout for each iteration, this timeout is based on previous run.
+@param spoolDir If set and not verbose, the full output of each worker is written to a file in this directory.
+@param captureSizeBytes Maximum size of the output kept in memory per worker when not verbose.
+@param historyPath If set, the duration of each command is recorded in this file and, when running in parallel, the commands
+                   expected to be the longest are scheduled first.
+@param controller If set (a LoadController), nbJobs is the maximum, the actual number of jobs is adapted to the load of the machine.
 """
-def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose=True, verboseCommand=False, timeout=0, duration=0, nbJobs=1, hideStdout=False, hideStderr=False, ignoreError=False):
+def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose=True, verboseCommand=False, timeout=0, duration=0, nbJobs=1, hideStdout=False, hideStderr=False, ignoreError=False,
+		spoolDir=None, captureSizeBytes=64 * 1024, historyPath=None, controller=None):
 
 	# Custom process class to control process pool
 	class Thread(threading.Thread):
@@ -557,6 +1235,18 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 	iterations = {}
 	errorMsg = None
 
+	# Directory where the full output of the workers is spooled
+	if spoolDir and not verbose:
+		spoolDir = os.path.join(spoolDir, "shellMulti")
+		mkdir(spoolDir)
+	else:
+		spoolDir = None
+
+	# Longest expected commands first, so that no long command is left alone at the end of the run
+	history = DurationHistory(historyPath) if historyPath else None
+	if history and nbJobs > 1:
+		commandList = history.sort(commandList)
+
 	try:
 
 		while not bool(workerErrors):
@@ -581,6 +1271,10 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 							raise Exception("<<<< FAILURE >>>>")
 
 						workerList[i]["worker"].join()
+						if history:
+							history.update(workerList[i]["command"], workerElpasedTimeS, workerList[i]["usage"].get("maxRssKB"))
+						if workerList[i]["token"] is not None:
+							jobserver.release(workerList[i]["token"])
 						workerIteration = workerList[i]["iterationId"]
 						workerList[i] = None
 					
@@ -596,14 +1290,32 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 
 				# If not registered, add it
 				if not workerList[i] and (nbIterations == 0 or curIteration < nbIterations):
-					workerContext[i] = Queue()
+					# Always keep at least one job running, otherwise only start if the machine can handle it
+					if controller and any(workerList):
+						if len([worker for worker in workerList if worker]) >= controller.getLimit():
+							continue
+						if not controller.hasMemoryFor(history.memory(commandList[commandIndex]) if history else None):
+							continue
+					# A token is needed unless the implicit slot of this process is available
+					token = None
+					if jobserver and (not jobserver.hasImplicitSlot or any(worker and worker["token"] is None for worker in workerList)):
+						# Do not spin while nothing else is running
+						token = jobserver.acquire(timeout=(0 if any(workerList) else 0.1))
+						if token is None:
+							continue
+					if workerContext[i]:
+						workerContext[i].close()
+					workerContext[i] = None if verbose else OutputCapture(captureSizeBytes, os.path.join(spoolDir, "worker.%i.log" % (i)) if spoolDir else None)
 					signal = threading.Event()
+					usage = {}
 					workerList[i] = {
 						"command": " ".join(commandList[commandIndex]),
-						"worker": Thread(target=shell, args=(commandList[commandIndex], cwd, (not verbose), ignoreError, None if verbose else workerContext[i], signal, hideStdout, hideStderr)),
+						"worker": Thread(target=shell, args=(commandList[commandIndex], cwd, (not verbose), ignoreError, workerContext[i], signal, hideStdout, hideStderr, True, usage)),
 						"time": timeit.default_timer(),
 						"iterationId": curIteration,
-						"signal": signal
+						"signal": signal,
+						"token": token,
+						"usage": usage
 					}
 					if verboseCommand:
 						info("Executing %s" % (workerList[i]["command"]))
@@ -636,11 +1348,22 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 			if nbIterations and (curNbIterations >= nbIterations):
 				break
 
+			# Do not take a core from the jobs while adapting to the load
+			if controller:
+				time.sleep(0.01)
+
 	except (KeyboardInterrupt, SystemExit) as e:
 		errorMsg = "<<<< Keyboard Interrupt >>>>"
 	except BaseException as e:
 		errorMsg = str(e)
 
+	# Keep the durations recorded so far, even on failure
+	if history:
+		try:
+			history.save()
+		except Exception as e:
+			warning("Cannot save the duration history to '%s': %s" % (historyPath, str(e)))
+
 	# Print the error message if any
 	if not verbose:
 		print("")
@@ -666,14 +1389,26 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 			if errorMsg:
 				workerErrors[i] = workerErrors[i] if i in workerErrors else []
 				workerErrors[i].append(str(errorMsg))
+	for i in range(nbJobs):
+		if workerList[i] and workerList[i]["token"] is not None:
+			jobserver.release(workerList[i]["token"])
+			workerList[i]["token"] = None
+
+	# Close the captured outputs, only keep the spooled files of the failing workers
+	for i in range(nbJobs):
+		if workerContext[i]:
+			workerContext[i].close(keep=(i in workerErrors and bool(workerList[i])))
 
 	if bool(workerErrors):
 		for i, errorList in workerErrors.items():
 			if workerList[i]:
 				# Print the content of the log
 				error("---- (worker #%i) -------------------------------------------------------------" % (i))
-				for line in list(workerContext[i].queue):
-					print(line)
+				if workerContext[i]:
+					for line in workerContext[i].tail():
+						print(line)
+					if workerContext[i].spoolPath:
+						error("Full output available at '%s'" % (workerContext[i].spoolPath))
 				error("Failure cause: %s" % (", ".join(errorList)))
 		raise Exception()
 
@@ -681,59 +1416,997 @@ def shellMulti(commandList, cwd=".", nbIterations=1, isAutoTimeout=True, verbose
 Ensure that the processes previously started are destroyed
 """
 def destroy():
-	isError = False
 	# Wait until all non-blocking process previously started are done
-	for process in runningProcess:
-		isError |= (process.wait() != 0)
+	def waitRunningProcess():
+		isError = False
+		for process in runningProcess:
+			isError |= (process.wait() != 0)
+		return isError
+
+	# They can use the slot of this process meanwhile
+	if runningProcess and jobserver:
+		with jobserver.lend():
+			isError = waitRunningProcess()
+	else:
+		isError = waitRunningProcess()
+	if jobserver:
+		jobserver.close()
 	return isError
 
+# ---- Test report related methods --------------------------------------------
+
+"""
+Read a JUnit report (such as the one generated by gtest).
+Returns the root element and the list of failing tests, or None if the report cannot be read.
+"""
+def readJunitReport(path):
+	try:
+		root = xml.etree.ElementTree.parse(path).getroot()
+	except:
+		return None
+	failures = []
+	for testcase in root.iter("testcase"):
+		if testcase.find("failure") is not None or testcase.find("error") is not None:
+			failures.append("%s.%s" % (testcase.get("classname"), testcase.get("name")))
+	return {"root": root, "failures": failures}
+
+"""
+Merge multiple JUnit reports into a single one.
+Returns the list of individual reports as read by readJunitReport().
+"""
+def mergeJunitReports(pathList, outputPath):
+	reportList = [readJunitReport(path) for path in pathList]
+	merged = xml.etree.ElementTree.Element("testsuites", name="AllTests")
+	totals = {"tests": 0, "failures": 0, "disabled": 0, "errors": 0, "time": 0.}
+	testsuites = {}
+	toString = lambda value: ("%.3f" % value) if isinstance(value, float) else str(value)
+	for report in reportList:
+		if report is None:
+			continue
+		for key in totals:
+			totals[key] += type(totals[key])(report["root"].get(key, 0))
+		# Testsuites with the same name across reports are merged together
+		testsuiteList = [report["root"]] if report["root"].tag == "testsuite" else report["root"].findall("testsuite")
+		for testsuite in testsuiteList:
+			name = testsuite.get("name")
+			if name in testsuites:
+				for key in totals:
+					testsuites[name].set(key, toString(type(totals[key])(testsuites[name].get(key, 0)) + type(totals[key])(testsuite.get(key, 0))))
+				testsuites[name].extend(list(testsuite))
+			else:
+				testsuites[name] = testsuite
+				merged.append(testsuite)
+	for key, value in totals.items():
+		merged.set(key, toString(value))
+	xml.etree.ElementTree.ElementTree(merged).write(outputPath, encoding="utf-8")
+	return reportList
+
+"""
+Return the commands to run a test, using the first template of nameList available for its types.
+Tests with a 'shard' template are split into nbShards commands instead, if a report is requested. Each shard
+writes its own report next to the one requested, they are merged with mergeShardReports() once completed.
+Returns a tuple (template name, commands, shard reports), the commands are empty if no template is available.
+"""
+def getTestCommands(config, typeIds, nameList, args, nbShards=1):
+	if nbShards > 1 and args.get("report"):
+		commandList = []
+		shardReportList = []
+		for index in range(nbShards):
+			shardReportPath = "%s.shard%i.xml" % (os.path.splitext(args["report"])[0], index)
+			command = getCommand(config, "shard", typeIds, dict(args, shardIndex=str(index), shardTotal=str(nbShards), report=shardReportPath))
+			if not command:
+				break
+			commandList.append(command)
+			shardReportList.append(shardReportPath)
+		if commandList:
+			return ("shard", commandList, shardReportList)
+	for name in nameList:
+		command = getCommand(config, name, typeIds, args)
+		if command:
+			return (name, [command], [])
+	return (None, [], [])
+
+"""
+Merge the reports of the shards of a test and report the failures of each of them.
+Returns the list of the shard reports as read by readJunitReport().
+"""
+def mergeShardReports(name, reportPath, shardReportList):
+	shardReports = mergeJunitReports(shardReportList, reportPath)
+	for index, shardReport in enumerate(shardReports):
+		if shardReport is None:
+			warning("Shard %i/%i of '%s' did not complete" % (index + 1, len(shardReports), name))
+		elif shardReport["failures"]:
+			error("Shard %i/%i of '%s' has %i failure(s): %s" % (index + 1, len(shardReports), name, len(shardReport["failures"]), ", ".join(shardReport["failures"])))
+	info("Test report for '%s' merged into '%s'" % (name, reportPath))
+	return shardReports
+
 # ---- Log related methods ----------------------------------------------------
 
 # Hack
 codecs.register_error("strict", codecs.ignore_errors)
 
 """
-Rotating log
+Rotating log, made of segments <prefix>.<index>.log. Completed segments are passed to onComplete,
+which might compress them (<prefix>.<index>.log.<extension>).
+
+If indexed, the time of the writes is recorded in a sparse index (<prefix>.index), at most one entry per second,
+mapping a time to a position in the segments. If tokenized, the distinct tokens of each segment are passed to onComplete
+as well, to build its bloom filter.
 """
 class RotatingLog:
-	def __init__(self, directoryPath, prefix=None, maxLogs=10, maxLogSizeBytes=100 * 1024):
+	PATTERN = re.compile(r"^(?:(.+)\.)?(\d{8})\.log(\.gz|\.bz2|\.xz)?$")
+	# Time, segment index, offset in the (uncompressed) segment
+	INDEX_RECORD = struct.Struct("<dII")
+	TOKEN = re.compile(r"\w+", re.UNICODE)
+	# Beyond, the segment is not worth filtering
+	MAX_TOKENS = 100000
+	# Directories of the logs being written by this process, format: { directoryPath: number of logs }
+	writtenDirPaths = {}
+	lock = threading.Lock()
+
+	def __init__(self, directoryPath, prefix=None, maxLogSizeBytes=1024 * 1024, onComplete=None, indexed=False, tokenized=False):
 		self.maxLogSize = maxLogSizeBytes
 		self.curLogSize = maxLogSizeBytes
-		self.maxLogs = maxLogs
 		self.curLogIndex = -1
 		self.curLog = None
 		self.prefix = prefix
 		self.path = directoryPath
+		self.onComplete = onComplete
+		self.indexed = indexed
+		self.index = None
+		self.indexTime = None
+		self.tokenized = tokenized
+		self.tokens = None
+		self.isWritten = False
+
+	"""
+	Tells if logs of a directory are being written by this process
+	"""
+	@staticmethod
+	def isDirWritten(directoryPath):
+		with RotatingLog.lock:
+			return directoryPath in RotatingLog.writtenDirPaths
+
+	def setWritten(self, isWritten):
+		if isWritten != self.isWritten:
+			with RotatingLog.lock:
+				count = RotatingLog.writtenDirPaths.get(self.path, 0) + (1 if isWritten else -1)
+				if count:
+					RotatingLog.writtenDirPaths[self.path] = count
+				else:
+					del RotatingLog.writtenDirPaths[self.path]
+			self.isWritten = isWritten
 
 	def getLogPath(self, index):
 		fileName = "%s%.8i.log" % (("%s." % self.prefix) if self.prefix else "", index)
 		return os.path.join(self.path, fileName)
 
-	def add(self, message):
+	@staticmethod
+	def getIndexPath(directoryPath, prefix=None):
+		return os.path.join(directoryPath, "%s.index" % (prefix) if prefix else ".index")
+
+	"""
+	Path of the bloom filter of a segment
+	"""
+	@staticmethod
+	def getBloomPath(segmentPath):
+		return segmentPath[:segmentPath.rindex(".log")] + ".bloom"
+
+	def add(self, message, timestamp=None):
+
+		data = message.encode("utf-8")
+		now = timestamp or time.time()
 
 		# Create a new log file
 		if self.curLogSize >= self.maxLogSize:
-			# Check if old log needs to be removed
-			oldLog = self.getLogPath(self.curLogIndex - self.maxLogs)
-			if os.path.exists(oldLog):
-				os.remove(oldLog)
+			self.complete()
+			self.setWritten(True)
 			self.curLogIndex += 1
-			self.curLog = codecs.open(self.getLogPath(self.curLogIndex), "w", encoding="utf-8")
+			self.curLog = open(self.getLogPath(self.curLogIndex), "wb")
 			self.curLogSize = 0
-
-		self.curLog.write(message)
+			self.indexTime = None
+			self.tokens = set() if self.tokenized else None
+
+		# Each segment starts with an entry, so that an entry never spans over 2 segments
+		if self.indexed and int(now) != self.indexTime:
+			if not self.index:
+				self.index = open(RotatingLog.getIndexPath(self.path, self.prefix), "ab")
+			self.index.write(RotatingLog.INDEX_RECORD.pack(now, self.curLogIndex, self.curLogSize))
+			self.index.flush()
+			self.indexTime = int(now)
+
+		if self.tokens is not None:
+			self.tokens.update(RotatingLog.TOKEN.findall(message))
+			if len(self.tokens) > RotatingLog.MAX_TOKENS:
+				self.tokens = None
+
+		self.curLog.write(data)
 		self.curLog.flush()
-		self.curLogSize += len(message)
+		self.curLogSize += len(data)
+
+	def complete(self):
+		if self.curLog:
+			self.curLog.close()
+			self.curLog = None
+			if self.onComplete:
+				self.onComplete(self.getLogPath(self.curLogIndex), self.tokens)
+			self.tokens = None
+
+	def close(self):
+		self.complete()
+		if self.index:
+			self.index.close()
+			self.index = None
+		self.curLogSize = self.maxLogSize
+		self.setWritten(False)
+
+	"""
+	Return the segments of a log, compressed or not, format: { index: path }
+	"""
+	@staticmethod
+	def getSegmentPaths(directoryPath, prefix=None):
+		segments = {}
+		for name in (os.listdir(directoryPath) if os.path.isdir(directoryPath) else []):
+			match = RotatingLog.PATTERN.match(name)
+			if match and match.group(1) == prefix:
+				# A segment being compressed exists in both forms for a moment, the plain one is preferred
+				if match.group(3) is None or int(match.group(2)) not in segments:
+					segments[int(match.group(2))] = os.path.join(directoryPath, name)
+		return segments
+
+	"""
+	Return the segments of a log in order, compressed or not
+	"""
+	@staticmethod
+	def getSegments(directoryPath, prefix=None):
+		segments = RotatingLog.getSegmentPaths(directoryPath, prefix)
+		return [segments[index] for index in sorted(segments.keys())]
+
+	"""
+	Read the index of a log, a list of (time, segment index, offset)
+	"""
+	@staticmethod
+	def readIndex(directoryPath, prefix=None):
+		try:
+			with open(RotatingLog.getIndexPath(directoryPath, prefix), "rb") as f:
+				data = f.read()
+		except (IOError, OSError):
+			return []
+		size = RotatingLog.INDEX_RECORD.size
+		return [RotatingLog.INDEX_RECORD.unpack_from(data, offset) for offset in range(0, len(data) - len(data) % size, size)]
+
+	"""
+	Open a segment for reading in binary mode, decompressing it if needed
+	"""
+	@staticmethod
+	def open(path):
+		extension = RotatingLog.PATTERN.match(os.path.basename(path)).group(3)
+		return LogCompressor.getOpener(extension)(path, "rb")
+
+"""
+Compress the completed log segments on a background thread, shared by all the logs of the process,
+and keep the logs of each application within a disk budget by removing the oldest segments.
+"""
+class LogCompressor:
+	EXTENSIONS = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "none": None}
+	tasks = collections.deque()
+	lock = threading.Lock()
+	thread = None
+
+	@staticmethod
+	def getOpener(extension):
+		if extension == ".gz":
+			return gzip.open
+		elif extension == ".bz2":
+			return bz2.BZ2File
+		elif extension == ".xz":
+			if not lzma:
+				raise Exception("xz compression is not supported by this version of Python")
+			return lzma.open
+		return open
+
+	"""
+	Write the bloom filter of a segment out of its tokens (if set), compress it (if compression is not "none")
+	and then enforce the budget of the application
+	"""
+	@staticmethod
+	def submit(path, compression, appDirPath, budgetBytes, tokens=None):
+		with LogCompressor.lock:
+			LogCompressor.tasks.append((path, compression, appDirPath, budgetBytes, tokens))
+			# The thread only lives while there are segments to compress
+			if not LogCompressor.thread:
+				LogCompressor.thread = threading.Thread(target=LogCompressor.run)
+				LogCompressor.thread.start()
+
+	@staticmethod
+	def run():
+		while True:
+			with LogCompressor.lock:
+				if not LogCompressor.tasks:
+					LogCompressor.thread = None
+					return
+				path, compression, appDirPath, budgetBytes, tokens = LogCompressor.tasks.popleft()
+				# Segments still to be compressed would be accounted at their full size
+				isPending = any(task[2] == appDirPath for task in LogCompressor.tasks)
+			try:
+				if tokens is not None:
+					BloomFilter.create(tokens).save(RotatingLog.getBloomPath(path))
+				LogCompressor.compress(path, compression)
+				if budgetBytes is not None and not isPending:
+					LogCompressor.enforceBudget(appDirPath, budgetBytes)
+			except (IOError, OSError):
+				pass # The logs might have been removed meanwhile
+
+	"""
+	Wait until all the submitted segments are processed
+	"""
+	@staticmethod
+	def wait():
+		thread = LogCompressor.thread
+		while thread:
+			thread.join()
+			thread = LogCompressor.thread
+
+	@staticmethod
+	def compress(path, compression):
+		extension = LogCompressor.EXTENSIONS[compression]
+		if not extension:
+			return
+		# The compressed segment only appears once complete
+		tempPath = "%s%s.tmp" % (path, extension)
+		with open(path, "rb") as fileIn:
+			fileOut = LogCompressor.getOpener(extension)(tempPath, "wb")
+			try:
+				shutil.copyfileobj(fileIn, fileOut, 64 * 1024)
+			finally:
+				fileOut.close()
+		os.rename(tempPath, path + extension)
+		os.remove(path)
+
+	"""
+	Remove the oldest segments of an application, until its logs fit within the budget.
+	All the files of the application are accounted for (bloom filters, indexes, metadata...), but only
+	the segments and their bloom filters are removed.
+	The last segment of each log of a running process (or still written by the supervisor) is never removed,
+	as it might be the one being written. Once all its segments are removed, the directory of a process that
+	is gone is removed as well.
+	"""
+	@staticmethod
+	def enforceBudget(appDirPath, budgetBytes):
+		totalBytes = 0
+		segmentList = []
+		lastIndexes = {}
+		# Format: { pid: [size in bytes of the directory, number of segments, is running] }
+		pidDirs = {}
+		for root, dirs, files in os.walk(appDirPath):
+			pid = os.path.basename(root) if os.path.dirname(root) == appDirPath else None
+			if pid is not None:
+				pidDirs[pid] = [0, 0, not pid.isdigit() or RotatingLog.isDirWritten(root) or isProcessRunning(int(pid))]
+			for name in files:
+				try:
+					fileStat = os.stat(os.path.join(root, name))
+				except OSError:
+					continue
+				totalBytes += fileStat.st_size
+				if pid is None:
+					continue
+				pidDirs[pid][0] += fileStat.st_size
+				match = RotatingLog.PATTERN.match(name)
+				if not match:
+					continue
+				key = (pid, match.group(1))
+				index = int(match.group(2))
+				segmentList.append((fileStat.st_mtime, os.path.join(root, name), key, index))
+				lastIndexes[key] = max(lastIndexes.get(key, -1), index)
+				pidDirs[pid][1] += 1
+
+		for mtime, path, key, index in sorted(segmentList):
+			if totalBytes <= budgetBytes:
+				break
+			pidDir = pidDirs[key[0]]
+			if index == lastIndexes[key] and pidDir[2]:
+				continue
+			for removePath in [path, RotatingLog.getBloomPath(path)]:
+				try:
+					sizeBytes = os.path.getsize(removePath)
+					os.remove(removePath)
+					totalBytes -= sizeBytes
+					pidDir[0] -= sizeBytes
+				except OSError:
+					pass
+			pidDir[1] -= 1
+			if pidDir[1] == 0 and not pidDir[2]:
+				rmtree(os.path.dirname(path), ignoreError=True)
+				totalBytes -= pidDir[0]
+
+"""
+Bloom filter of the tokens of a log segment, used to skip the segments that cannot match a search.
+The trigrams of the tokens are indexed (lower case), so that parts of tokens can be searched for as well.
+"""
+class BloomFilter:
+	MAGIC = b"IRBF"
+	# Magic, number of hashes, number of bits
+	HEADER = struct.Struct("<4sII")
+
+	def __init__(self, nbBits, nbHashes=7, bits=None):
+		self.nbBits = nbBits
+		self.nbHashes = nbHashes
+		self.bits = bits or bytearray((nbBits + 7) // 8)
+
+	"""
+	Create a filter sized for a false positive rate of about 1%
+	"""
+	@staticmethod
+	def create(tokens):
+		trigrams = BloomFilter.getTrigrams(tokens)
+		bloomFilter = BloomFilter(max(len(trigrams) * 10, 64))
+		for trigram in trigrams:
+			bloomFilter.add(trigram)
+		return bloomFilter
+
+	@staticmethod
+	def getTrigrams(tokens):
+		trigrams = set()
+		for token in tokens:
+			token = token.lower()
+			trigrams.update([token[i:i + 3] for i in range(len(token) - 2)])
+		return trigrams
+
+	def getPositions(self, trigram):
+		h1, h2 = struct.unpack_from("<II", hashlib.md5(trigram.encode("utf-8")).digest())
+		return [(h1 + i * (h2 | 1)) % self.nbBits for i in range(self.nbHashes)]
+
+	def add(self, trigram):
+		for position in self.getPositions(trigram):
+			self.bits[position >> 3] |= (1 << (position & 7))
+
+	def contains(self, trigram):
+		return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.getPositions(trigram))
+
+	"""
+	Tells if all the tokens might be part of the segment
+	"""
+	def mayContain(self, tokens):
+		return all(self.contains(trigram) for trigram in BloomFilter.getTrigrams(tokens))
+
+	def save(self, path):
+		with open(path, "wb") as f:
+			f.write(BloomFilter.HEADER.pack(BloomFilter.MAGIC, self.nbHashes, self.nbBits))
+			f.write(self.bits)
+
+	"""
+	Load a bloom filter, None if it does not exist or is invalid
+	"""
+	@staticmethod
+	def load(path):
+		try:
+			with open(path, "rb") as f:
+				data = f.read()
+			magic, nbHashes, nbBits = BloomFilter.HEADER.unpack_from(data, 0)
+		except (IOError, OSError, struct.error):
+			return None
+		if magic != BloomFilter.MAGIC or len(data) != BloomFilter.HEADER.size + (nbBits + 7) // 8:
+			return None
+		return BloomFilter(nbBits, nbHashes, bytearray(data[BloomFilter.HEADER.size:]))
+
+"""
+Read the logs of applications in chronological order, stdout and stderr being merged at the resolution of their index.
+The index is used to only read the parts of the logs within a time range, and the bloom filters to skip the segments
+that cannot match the pattern searched. Plain segments are memory mapped, compressed ones are decompressed in memory.
+
+If limits are set, only the streams listed are read and up to the position given, format: { (pidDirPath, prefix): (segment index, offset) }
+"""
+class LogSearch:
+	PREFIXES = ["stdout", "stderr"]
+	# Number of segments kept open
+	MAX_BUFFERS = 4
+
+	def __init__(self, appDirPathList, since=None, until=None, pattern=None, ignoreCase=False, limits=None):
+		self.appDirPathList = appDirPathList
+		self.since = since
+		self.until = until
+		self.limits = limits
+		self.regexpr = re.compile(pattern.encode("utf-8"), re.MULTILINE | (re.IGNORECASE if ignoreCase else 0)) if pattern else None
+		# Tokens that a segment must contain to match, only known for literal patterns
+		self.tokens = RotatingLog.TOKEN.findall(pattern) if pattern and not re.search(r"[.^$*+?{}\[\]\\|()]", pattern) else None
+		# Format: { path: (file, buffer) }
+		self.buffers = collections.OrderedDict()
+		self.bloomFilters = {}
+
+	"""
+	Return the chunks of the logs within the time range, in chronological order.
+	Format: [(time, pidDirPath, prefix, segmentPath, start, end or None for the end of the segment), ...]
+	"""
+	def getChunks(self):
+		chunkList = []
+		for appDirPath in self.appDirPathList:
+			for pid in (os.listdir(appDirPath) if os.path.isdir(appDirPath) else []):
+				pidDirPath = os.path.join(appDirPath, pid)
+				if not os.path.isdir(pidDirPath):
+					continue
+				startTime = LogFactory.getMetadata(pidDirPath)[0].get("time", 0)
+				for prefix in LogSearch.PREFIXES:
+					limit = self.limits.get((pidDirPath, prefix)) if self.limits is not None else None
+					if self.limits is not None and not limit:
+						continue
+					segments = RotatingLog.getSegmentPaths(pidDirPath, prefix)
+					entryList = RotatingLog.readIndex(pidDirPath, prefix)
+					isIndexed = bool(entryList)
+					# Logs without index are read entirely
+					if not isIndexed:
+						entryList = [(startTime, index, 0) for index in sorted(segments.keys())]
+					for i, (entryTime, index, offset) in enumerate(entryList):
+						nextEntry = entryList[i + 1] if i + 1 < len(entryList) else None
+						if index not in segments:
+							continue # Removed to fit within the budget
+						if self.until is not None and entryTime > self.until:
+							break
+						# An entry is written at every new second, so the lines of a chunk are all written within the second of its entry
+						if self.since is not None and isIndexed and math.floor(entryTime) + 1 <= self.since:
+							continue
+						end = nextEntry[2] if nextEntry and nextEntry[1] == index else None
+						if limit:
+							if index > limit[0]:
+								break
+							if index == limit[0]:
+								end = limit[1] if end is None else min(end, limit[1])
+								if offset >= end:
+									continue
+						chunkList.append((entryTime, pidDirPath, prefix, segments[index], offset, end))
+		chunkList.sort(key=lambda chunk: chunk[0])
+		return chunkList
+
+	"""
+	Return the lines of the logs, format: (pidDirPath, prefix, line)
+	"""
+	def lines(self):
+		try:
+			for entryTime, pidDirPath, prefix, path, start, end in self.getChunks():
+				if self.tokens and not self.mayMatch(path):
+					continue
+				buffer = self.getBuffer(path)
+				if buffer is None:
+					continue
+				end = len(buffer) if end is None else min(end, len(buffer))
+				for line in self.search(buffer, start, end):
+					yield (pidDirPath, prefix, line)
+		finally:
+			self.close()
+
+	def mayMatch(self, path):
+		if path not in self.bloomFilters:
+			self.bloomFilters[path] = BloomFilter.load(RotatingLog.getBloomPath(path))
+		bloomFilter = self.bloomFilters[path]
+		return bloomFilter.mayContain(self.tokens) if bloomFilter else True
+
+	"""
+	Return the content of a segment, None if it does not exist anymore
+	"""
+	def getBuffer(self, path):
+		if path in self.buffers:
+			buffer = self.buffers.pop(path)
+			self.buffers[path] = buffer
+			return buffer[1]
+		# The segment might have been compressed meanwhile
+		candidateList = [path] + (["%s%s" % (path, extension) for extension in [".gz", ".bz2", ".xz"]] if path.endswith(".log") else [])
+		for candidatePath in candidateList:
+			try:
+				if candidatePath.endswith(".log"):
+					f = open(candidatePath, "rb")
+					buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+				else:
+					f = None
+					stream = RotatingLog.open(candidatePath)
+					try:
+						buffer = stream.read()
+					finally:
+						stream.close()
+				break
+			except (IOError, OSError, EOFError):
+				continue
+		else:
+			return None
+		self.buffers[path] = (f, buffer)
+		while len(self.buffers) > LogSearch.MAX_BUFFERS:
+			LogSearch.closeBuffer(*self.buffers.popitem(last=False)[1])
+		return buffer
+
+	"""
+	Return the lines of a part of the buffer, only the ones matching the pattern if any
+	"""
+	def search(self, buffer, start, end):
+		position = start
+		while position < end:
+			if self.regexpr:
+				match = self.regexpr.search(buffer, position, end)
+				if not match:
+					break
+				lineStart = buffer.rfind(b"\n", position, match.start())
+				lineStart = position if lineStart == -1 else lineStart + 1
+				lineEnd = buffer.find(b"\n", match.end(), end)
+			else:
+				lineStart = position
+				lineEnd = buffer.find(b"\n", position, end)
+			position = end if lineEnd == -1 else lineEnd + 1
+			yield buffer[lineStart:position]
+
+	@staticmethod
+	def closeBuffer(f, buffer):
+		if f:
+			if buffer:
+				buffer.close()
+			f.close()
+
+	def close(self):
+		for f, buffer in self.buffers.values():
+			LogSearch.closeBuffer(f, buffer)
+		self.buffers.clear()
+
+"""
+Watch directories for changes through inotify. It is only available on Linux, the directories have to be polled otherwise.
+"""
+class DirectoryWatcher:
+	IN_MODIFY = 0x00000002
+	IN_MOVED_TO = 0x00000080
+	IN_CREATE = 0x00000100
+	IN_DELETE = 0x00000200
+	IN_DELETE_SELF = 0x00000400
+	IN_Q_OVERFLOW = 0x00004000
+	IN_IGNORED = 0x00008000
+	IN_ONLYDIR = 0x01000000
+	# Watch descriptor, mask, cookie, length of the name that follows
+	EVENT = struct.Struct("iIII")
+
+	def __init__(self):
+		self.fd = None
+		# Format: { watch descriptor: path }
+		self.paths = {}
+		try:
+			libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+			self.addWatch = libc.inotify_add_watch
+			self.addWatch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+			fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+			if fd >= 0:
+				self.fd = fd
+		except (AttributeError, OSError, TypeError):
+			pass # No ctypes or not a Linux system
+
+	def isActive(self):
+		return self.fd is not None
+
+	"""
+	Watch a directory, return False if it cannot be watched, in which case the watcher is deactivated
+	(for example when the maximum number of watches of the user is reached)
+	"""
+	def watch(self, path):
+		if self.fd is None:
+			return False
+		mask = DirectoryWatcher.IN_MODIFY | DirectoryWatcher.IN_MOVED_TO | DirectoryWatcher.IN_CREATE | DirectoryWatcher.IN_DELETE | DirectoryWatcher.IN_DELETE_SELF | DirectoryWatcher.IN_ONLYDIR
+		wd = self.addWatch(self.fd, path.encode(sys.getfilesystemencoding()), mask)
+		if wd < 0:
+			# The directory might have been removed meanwhile
+			if ctypes.get_errno() in [errno.ENOENT, errno.ENOTDIR]:
+				return True
+			self.close()
+			return False
+		self.paths[wd] = path
+		return True
+
+	"""
+	Wait for changes, return the set of directories changed or None if unknown (the events have overflowed)
+	"""
+	def wait(self, timeoutS=None):
+		if not select.select([self.fd], [], [], timeoutS)[0]:
+			return set()
+		pathSet = set()
+		while True:
+			try:
+				data = os.read(self.fd, 64 * 1024)
+			except OSError as e:
+				if e.errno in [errno.EAGAIN, errno.EWOULDBLOCK]:
+					break
+				raise
+			offset = 0
+			while offset < len(data):
+				wd, mask, cookie, length = DirectoryWatcher.EVENT.unpack_from(data, offset)
+				offset += DirectoryWatcher.EVENT.size + length
+				if mask & DirectoryWatcher.IN_Q_OVERFLOW:
+					return None
+				if wd in self.paths:
+					pathSet.add(self.paths[wd])
+				# The directory is not watched anymore, its watch descriptor might be reused
+				if mask & DirectoryWatcher.IN_IGNORED:
+					self.paths.pop(wd, None)
+		return pathSet
+
+	def close(self):
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+		self.paths.clear()
+
+"""
+Follow the logs of the applications as they are written, stdout and stderr of all their instances.
+The segments are followed through their rotation and the logs of the new instances (after a restart for example)
+are picked up as they are created. Changes are notified through inotify, the directories are polled otherwise.
+
+The logs existing at creation are followed from their current end, the ones created later from their start.
+"""
+class LogFollower:
+
+	def __init__(self, logDirPath, isFollowed, pattern=None, ignoreCase=False, pollIntervalS=0.5, inotify=True):
+		self.logDirPath = logDirPath
+		self.isFollowed = isFollowed
+		self.regexpr = re.compile(pattern.encode("utf-8"), re.IGNORECASE if ignoreCase else 0) if pattern else None
+		self.pollIntervalS = pollIntervalS
+		self.watcher = DirectoryWatcher()
+		if not inotify:
+			self.watcher.close()
+		# Format: { (pidDirPath, prefix): {"index": segment index, "offset": offset, "file": file, "partial": incomplete line} }
+		self.streams = {}
+		self.appDirPathSet = set()
+		self.pidDirPathSet = set()
+		self.scan(isInitial=True)
+
+	"""
+	Return the position of the streams followed, format: { (pidDirPath, prefix): (segment index, offset) }
+	"""
+	def getPositions(self):
+		return {key: (stream["index"], stream["offset"]) for key, stream in self.streams.items()}
+
+	"""
+	Look for new and removed logs, return the keys of the streams added and the lines of the ones removed
+	"""
+	def scan(self, isInitial=False):
+		# Directories are watched before being listed, so that no change is missed
+		self.watcher.watch(self.logDirPath)
+		appDirPathSet = set()
+		pidDirPathSet = set()
+		for appId in (os.listdir(self.logDirPath) if os.path.isdir(self.logDirPath) else []):
+			appDirPath = os.path.join(self.logDirPath, appId)
+			if not self.isFollowed(appId) or not os.path.isdir(appDirPath):
+				continue
+			if appDirPath not in self.appDirPathSet:
+				self.watcher.watch(appDirPath)
+			appDirPathSet.add(appDirPath)
+			for pid in (os.listdir(appDirPath) if os.path.isdir(appDirPath) else []):
+				pidDirPath = os.path.join(appDirPath, pid)
+				if os.path.isdir(pidDirPath):
+					pidDirPathSet.add(pidDirPath)
+
+		keyList = []
+		for pidDirPath in pidDirPathSet - self.pidDirPathSet:
+			self.watcher.watch(pidDirPath)
+			for prefix in LogSearch.PREFIXES:
+				stream = {"index": 0, "offset": 0, "file": None, "partial": b""}
+				if isInitial:
+					segments = RotatingLog.getSegmentPaths(pidDirPath, prefix)
+					if segments:
+						stream["index"] = max(segments.keys())
+						# A compressed segment is complete and will not be followed by another
+						if RotatingLog.PATTERN.match(os.path.basename(segments[stream["index"]])).group(3):
+							stream["index"] += 1
+						else:
+							stream["offset"] = os.path.getsize(segments[stream["index"]])
+				self.streams[(pidDirPath, prefix)] = stream
+				keyList.append((pidDirPath, prefix))
+
+		lineList = []
+		for key in [key for key in self.streams.keys() if key[0] not in pidDirPathSet]:
+			lineList += self.readStream(key, isLast=True)
+			del self.streams[key]
+		self.appDirPathSet = appDirPathSet
+		self.pidDirPathSet = pidDirPathSet
+		return keyList, lineList
+
+	"""
+	Wait for new lines, up to timeoutS if set. Format: [(pidDirPath, prefix, line), ...]
+	It might return earlier without any line.
+	"""
+	def poll(self, timeoutS=None):
+		if self.watcher.isActive():
+			pathSet = self.watcher.wait(timeoutS)
+		else:
+			time.sleep(self.pollIntervalS if timeoutS is None else min(self.pollIntervalS, timeoutS))
+			pathSet = None
+
+		# Applications or instances created or removed
+		keyList, lineList = [], []
+		if pathSet is None or any(path not in self.pidDirPathSet for path in pathSet):
+			keyList, lineList = self.scan()
+		keyList += [key for key in self.streams.keys() if pathSet is None or key[0] in pathSet]
+
+		for key in sorted(set(keyList)):
+			if key in self.streams:
+				lineList += self.readStream(key)
+		return lineList
+
+	"""
+	Read the new lines of a stream, moving to the next segment once the current one is complete
+	"""
+	def readStream(self, key, isLast=False):
+		stream = self.streams[key]
+		pidDirPath, prefix = key
+		lineList = []
+		while True:
+			if stream["file"] is None:
+				segments = RotatingLog.getSegmentPaths(pidDirPath, prefix)
+				indexList = [index for index in segments.keys() if index >= stream["index"]]
+				if not indexList:
+					break
+				# The segments might have been removed to fit within the budget
+				if min(indexList) != stream["index"]:
+					stream["index"], stream["offset"] = min(indexList), 0
+				path = segments[stream["index"]]
+				try:
+					if path.endswith(".log"):
+						stream["file"] = open(path, "rb", 0)
+						stream["file"].seek(stream["offset"])
+					else:
+						stream["file"] = RotatingLog.open(path)
+						stream["file"].read(stream["offset"])
+				except (IOError, OSError, EOFError):
+					stream["file"] = None
+					break # Being compressed, the next change will tell
+			lineList += self.readLines(stream, pidDirPath, prefix)
+
+			# A segment is complete once the next one is created, the file remains readable even if it has been compressed meanwhile
+			if not any(index > stream["index"] for index in RotatingLog.getSegmentPaths(pidDirPath, prefix).keys()):
+				break
+			lineList += self.readLines(stream, pidDirPath, prefix, isComplete=True)
+			stream["file"].close()
+			stream["file"] = None
+			stream["index"], stream["offset"] = stream["index"] + 1, 0
+
+		if isLast:
+			if stream["partial"]:
+				lineList += self.filter([(pidDirPath, prefix, stream["partial"])])
+			if stream["file"]:
+				stream["file"].close()
+		return lineList
+
+	def readLines(self, stream, pidDirPath, prefix, isComplete=False):
+		try:
+			data = stream["file"].read()
+		except (IOError, OSError, EOFError):
+			data = b""
+		if not data and not isComplete:
+			return []
+		stream["offset"] += len(data or b"")
+		data = stream["partial"] + (data or b"")
+		end = len(data) if isComplete else data.rfind(b"\n") + 1
+		stream["partial"] = data[end:]
+		return self.filter([(pidDirPath, prefix, line) for line in data[:end].splitlines(True)])
+
+	def filter(self, lineList):
+		if self.regexpr:
+			return [item for item in lineList if self.regexpr.search(item[2])]
+		return lineList
+
+	def close(self):
+		for stream in self.streams.values():
+			if stream["file"]:
+				stream["file"].close()
+		self.streams.clear()
+		self.watcher.close()
+
+"""
+Fixed-size time series of the resources used by an application, stored in a memory mapped file.
+The file is made of a header followed by an array of records used as a ring buffer, the oldest
+records being overwritten. The default is 24h at a 10s resolution.
+"""
+class StatsRing:
+	MAGIC = b"IRST"
+	# Magic, version, capacity, record size, interval, next record index, number of records
+	HEADER = struct.Struct("<4sIIIdQQ")
+	# Timestamp, CPU usage (%), memory (bytes), number of threads, number of open files
+	RECORD = struct.Struct("<dfQII")
+	KEYS = ["cpu", "memory", "threads", "fds"]
+
+	def __init__(self, path, capacity=8640, intervalS=10., create=False):
+		self.path = path
+		if create:
+			header = StatsRing.readHeader(path)
+			if not header or header["capacity"] != capacity:
+				with open(path, "wb") as f:
+					f.write(StatsRing.HEADER.pack(StatsRing.MAGIC, 1, capacity, StatsRing.RECORD.size, intervalS, 0, 0))
+					f.write(b"\0" * (capacity * StatsRing.RECORD.size))
+		self.file = open(path, "r+b" if create else "rb")
+		self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+		header = StatsRing.HEADER.unpack_from(self.map, 0)
+		if header[0] != StatsRing.MAGIC or header[3] != StatsRing.RECORD.size:
+			self.close()
+			raise Exception("Invalid stats file '%s'" % (path))
+		self.capacity = header[2]
+		self.intervalS = header[4]
+
+	@staticmethod
+	def readHeader(path):
+		try:
+			with open(path, "rb") as f:
+				magic, version, capacity, recordSize, intervalS, head, count = StatsRing.HEADER.unpack(f.read(StatsRing.HEADER.size))
+			if magic == StatsRing.MAGIC:
+				return {"capacity": capacity, "interval": intervalS, "head": head, "count": count}
+		except:
+			pass
+		return None
+
+	def append(self, cpu, memory, threads, fds, timestamp=None):
+		magic, version, capacity, recordSize, intervalS, head, count = StatsRing.HEADER.unpack_from(self.map, 0)
+		StatsRing.RECORD.pack_into(self.map, StatsRing.HEADER.size + head * recordSize, timestamp or time.time(), cpu, int(memory), threads, fds)
+		StatsRing.HEADER.pack_into(self.map, 0, magic, version, capacity, recordSize, intervalS, (head + 1) % capacity, min(count + 1, capacity))
+
+	"""
+	Return the records in chronological order, optionally only the ones after a specific time
+	"""
+	def records(self, since=None):
+		magic, version, capacity, recordSize, intervalS, head, count = StatsRing.HEADER.unpack_from(self.map, 0)
+		recordList = []
+		for i in range(count):
+			index = (head - count + i) % capacity
+			record = StatsRing.RECORD.unpack_from(self.map, StatsRing.HEADER.size + index * recordSize)
+			if since is None or record[0] >= since:
+				recordList.append(dict(zip(["time"] + StatsRing.KEYS, record)))
+		return recordList
+
+	"""
+	Return min/avg/max and percentiles of each resource of a record list
+	"""
+	@staticmethod
+	def summarize(recordList):
+		summary = {
+			"samples": len(recordList),
+			"start": recordList[0]["time"] if recordList else None,
+			"end": recordList[-1]["time"] if recordList else None
+		}
+		for key in StatsRing.KEYS:
+			valueList = sorted([record[key] for record in recordList])
+			if not valueList:
+				continue
+			percentile = lambda p: valueList[max(int(math.ceil(p / 100. * len(valueList))) - 1, 0)]
+			summary[key] = {
+				"min": valueList[0],
+				"avg": float(sum(valueList)) / len(valueList),
+				"max": valueList[-1],
+				"p50": percentile(50),
+				"p90": percentile(90),
+				"p99": percentile(99)
+			}
+		return summary
+
+	"""
+	Read and summarize a stats file, None if it does not exist
+	"""
+	@staticmethod
+	def read(path, since=None):
+		if not os.path.isfile(path):
+			return None
+		try:
+			stats = StatsRing(path)
+		except:
+			return None
+		try:
+			return StatsRing.summarize(stats.records(since))
+		finally:
+			stats.close()
+
+	def close(self):
+		self.map.close()
+		self.file.close()
 
 """
-Application log factory
+Application log factory.
+The completed segments are compressed in the background, and the logs of the application (all its processes)
+are kept within budgetBytes.
 """
 class LogFactory:
-	def __init__(self, logDirectory, appId, runningPidList, maxLogs=10, maxLogSizeBytes=100 * 1024):
+	def __init__(self, logDirectory, appId, runningPidList, maxLogSizeBytes=1024 * 1024, compression="gzip", budgetBytes=50 * 1024 * 1024, bloomFilter=True):
 		self.logDirPath = os.path.join(logDirectory, appId)
 		self.restart = -1
-		self.maxLogs = maxLogs
 		self.maxLogSizeBytes = maxLogSizeBytes
+		self.compression = compression
+		self.budgetBytes = budgetBytes
+		self.bloomFilter = bloomFilter
 
 		# Remove logs from all non-running apps
 		if os.path.exists(self.logDirPath):
@@ -743,6 +2416,13 @@ class LogFactory:
 				if os.path.isdir(filePath) and file not in runningPidList:
 					rmtree(filePath)
 
+	"""
+	Path of the resource time series of an application
+	"""
+	@staticmethod
+	def getStatsPath(logDirectory, appId):
+		return os.path.join(logDirectory, appId, ".irapp.stats")
+
 	@staticmethod
 	def getMetadata(*path):
 		metadataPath = os.path.join(os.path.join(*path), ".irapp.application.json")
@@ -774,8 +2454,11 @@ class LogFactory:
 		with open(metadataPath, "w") as f:
 			json.dump(metadata, f)
 
-		return (RotatingLog(curlogDirPath, "stdout", maxLogs=self.maxLogs, maxLogSizeBytes=self.maxLogSizeBytes),
-				RotatingLog(curlogDirPath, "stderr", maxLogs=self.maxLogs, maxLogSizeBytes=self.maxLogSizeBytes))
+		return (RotatingLog(curlogDirPath, "stdout", maxLogSizeBytes=self.maxLogSizeBytes, onComplete=self.complete, indexed=True, tokenized=self.bloomFilter),
+				RotatingLog(curlogDirPath, "stderr", maxLogSizeBytes=self.maxLogSizeBytes, onComplete=self.complete, indexed=True, tokenized=self.bloomFilter))
+
+	def complete(self, path, tokens):
+		LogCompressor.submit(path, self.compression, self.logDirPath, self.budgetBytes, tokens)
 
 """
 Process a template with specific values.
@@ -958,6 +2641,14 @@ class Module:
 	def check(config):
 		return False
 
+	"""
+	Return the list of paths, relative to the root directory, which presence is used by check().
+	They are part of the key of the cached configuration.
+	"""
+	@staticmethod
+	def checkPaths():
+		return []
+
 	"""
 	Return the default configuration of the module.
 	"""
@@ -996,13 +2687,7 @@ class Module:
 	Asses if a confguration is ignored or not
 	"""
 	def isIgnore(self, *keys):
-		ignoreDict = self.config["ignoreDict"]
-		for key in [self.name()] + list(keys):
-			if key in ignoreDict:
-				if isinstance(ignoreDict[key], bool):
-					return True
-				ignoreDict = ignoreDict[key]
-		return False
+		return self.config["ignoreMatcher"].isIgnored(self.name(), *keys)
 
 	"""
 	Generates a log factory, used to create logs for an application
@@ -1049,8 +2734,12 @@ class Module:
 			content = f.read()
 		return self.publishAssetTo(content, directory, *name)
 
-	def getStatusList(self):
-		statusList = self.status() or [];
+	"""
+	Return the status of the applications started by this module.
+	If live is set, resources are sampled incrementally, the CPU usage being the one since the previous call.
+	"""
+	def getStatusList(self, live=False):
+		statusList = self.status(live=live) or [];
 		for status in statusList:
 			if "pid" in status:
 				metadata, metadataPath = LogFactory.getMetadata(self.config["log"], status["id"], str(status["pid"]))
@@ -1069,11 +2758,11 @@ class Module:
 		if not self.getConfig(["builds", buildType], default=False, onlySpecific=True):
 			return False
 
-		# If build type is different than previous one already registered, then cleanup
+		# Let the module switch its outputs to the new build type
 		if save:
 			currentBuildType = self.getDefaultBuildType(onlyFromConfig=True)
+			self.switchBuildType(currentBuildType, buildType)
 			if buildType != currentBuildType:
-				self.clean()
 				info("Setting '%s' as default build configuration for '%s'" % (buildType, self.name()))
 				currentBuildTypePath = os.path.join(self.config["artifacts"], ".%s.buildtype" % (self.name()))
 				with open(currentBuildTypePath, "w") as f:
@@ -1126,6 +2815,14 @@ class Module:
 	def clean(self):
 		pass
 
+	"""
+	Called when a build type is set as default. Outputs from different build types are
+	mixed by default, hence they are cleaned up when the build type changes.
+	"""
+	def switchBuildType(self, previousBuildType, buildType):
+		if buildType != previousBuildType:
+			self.clean()
+
 	def build(self, target):
 		pass
 
@@ -1138,7 +2835,7 @@ class Module:
 	"""
 	Start application.
 	"""
-	def start(self, *args):
+	def start(self, *args, **kwargs):
 		pass
 
 	"""
@@ -1147,6 +2844,12 @@ class Module:
 	def stop(self, appId=None):
 		pass
 
+	"""
+	Restart all application refered by appId. If appId is None, restart all applications.
+	"""
+	def restart(self, appId=None):
+		pass
+
 	# Application statuses
-	def status(self):
+	def status(self, live=False):
 		pass
@@ -3,6 +3,7 @@
 
 from .. import lib
 import os
+import sys
 import re
 import json
 
@@ -12,6 +13,10 @@ class CMake(lib.Module):
 	def check(config):
 		return os.path.isfile(lib.path(config["root"], "CMakeLists.txt"))
 
+	@staticmethod
+	def checkPaths():
+		return ["CMakeLists.txt"]
+
 	@staticmethod
 	def config():
 		return {
@@ -20,7 +25,8 @@ class CMake(lib.Module):
 			},
 			"templates": {
 				"gtest": {
-					"junit": "%run% --gtest_output=xml:%report%"
+					"junit": "%run% --gtest_output=xml:%report%",
+					"shard": "env GTEST_TOTAL_SHARDS=%shardTotal% GTEST_SHARD_INDEX=%shardIndex% %run% --gtest_output=xml:%report%"
 				}
 			},
 			"buildDir": "build",
@@ -77,12 +83,12 @@ class CMake(lib.Module):
 			"binDir": {
 				"type": [str],
 				"example": ".irapp/build/bin",
-				"help": "Path of the directory that will receive the binaries."
+				"help": "Path of the directory that will receive the binaries. Each build configuration has its own directory, suffixed with its name, this path links to the current one."
 			},
 			"libDir": {
 				"type": [str],
 				"example": ".irapp/build/lib",
-				"help": "Path of the directory that will receive the libraries."
+				"help": "Path of the directory that will receive the libraries. Each build configuration has its own directory, suffixed with its name, this path links to the current one."
 			},
 			"buildGenerator": {
 				"type": [str],
@@ -118,6 +124,40 @@ class CMake(lib.Module):
 		# Check if this is a coverage build
 		return self.getConfig(["builds", buildType, "compiler"], default="gcc")
 
+	"""
+	Tells if each build configuration has its own output directories, the current ones being
+	symbolic links to them.
+	"""
+	@staticmethod
+	def hasOutputPerBuildType():
+		return hasattr(os, "symlink") and sys.platform != "win32"
+
+	"""
+	Return the output directory (binDir or libDir) of a specific build configuration
+	"""
+	def getOutputPath(self, key, buildType=None):
+		path = lib.path(self.config["root"], self.getConfig([key]))
+		buildType = buildType if buildType else self.getDefaultBuildType()
+		# Without build configuration, there is nothing to separate the outputs from
+		if not CMake.hasOutputPerBuildType() or not buildType:
+			return path
+		return "%s.%s" % (path, buildType)
+
+	"""
+	Return the existing output directories (binDir or libDir) of all the build configurations, including
+	the ones that are no longer defined. The result is a dictionary of paths indexed by build configuration.
+	"""
+	def getOutputPathsPerBuildType(self, key):
+		path = lib.path(self.config["root"], self.getConfig([key]))
+		outputPaths = {}
+		if CMake.hasOutputPerBuildType() and os.path.isdir(os.path.dirname(path)):
+			prefix = "%s." % (os.path.basename(path))
+			for name in os.listdir(os.path.dirname(path)):
+				outputPath = lib.path(os.path.dirname(path), name)
+				if name.startswith(prefix) and os.path.isdir(outputPath) and not os.path.islink(outputPath):
+					outputPaths[name[len(prefix):]] = outputPath
+		return outputPaths
+
 	def init(self):
 
 		# Print cmake version
@@ -128,9 +168,18 @@ class CMake(lib.Module):
 		buildDirPath = lib.path(self.config["root"], self.getConfig(["buildDir"]))
 		lib.info("Cleanup CMake build directory at '%s'" % (buildDirPath))
 		# Try to cleanup the build directory, not critical if it fails
-		lib.shell(["rm", "-rfd", os.path.basename(buildDirPath)], cwd=os.path.dirname(buildDirPath), ignoreError=True)
+		try:
+			lib.trash(buildDirPath)
+		except Exception as e:
+			lib.warning("Could not delete '%s': %s" % (buildDirPath, str(e)))
 		lib.shell(["mkdir", os.path.basename(buildDirPath)], cwd=os.path.dirname(buildDirPath), ignoreError=True)
 
+		# Remove the output directories, they are re-created per configuration
+		for key in ["binDir", "libDir"]:
+			lib.trash(lib.path(self.config["root"], self.getConfig([key])))
+			for outputPath in self.getOutputPathsPerBuildType(key).values():
+				lib.trash(outputPath)
+
 		# Remove all CMakeCache.txt if existing
 		for root, dirs, files in os.walk(self.config["root"]):
 			for file in files:
@@ -155,9 +204,9 @@ class CMake(lib.Module):
 
 			# Set the command
 			commandList = ["cmake", "-G", self.getConfig(["buildGenerator"]), "-DCMAKE_BUILD_TYPE=%s" % (updatedBuildConfig["type"]),
-					"-DCMAKE_ARCHIVE_OUTPUT_DIRECTORY=%s" % (lib.path(self.config["root"], self.getConfig(["libDir"]))),
-					"-DCMAKE_LIBRARY_OUTPUT_DIRECTORY=%s" % (lib.path(self.config["root"], self.getConfig(["libDir"]))),
-					"-DCMAKE_RUNTIME_OUTPUT_DIRECTORY=%s" % (lib.path(self.config["root"], self.getConfig(["binDir"])))]
+					"-DCMAKE_ARCHIVE_OUTPUT_DIRECTORY=%s" % (self.getOutputPath("libDir", name)),
+					"-DCMAKE_LIBRARY_OUTPUT_DIRECTORY=%s" % (self.getOutputPath("libDir", name)),
+					"-DCMAKE_RUNTIME_OUTPUT_DIRECTORY=%s" % (self.getOutputPath("binDir", name))]
 
 			# ---- Compiler specific options ----------------------------------
 
@@ -243,12 +292,46 @@ class CMake(lib.Module):
 
 	def clean(self):
 
-		buildDirPath = lib.path(self.config["root"], self.getConfig(["buildDir"]))
-		lib.info("Cleaning %s" % (buildDirPath))
-		lib.shell(["rm", "-rfd", lib.path(buildDirPath, "bin")], cwd=self.config["root"])
-		lib.shell(["rm", "-rfd", lib.path(buildDirPath, "lib")], cwd=self.config["root"])
-		lib.shell(["mkdir", lib.path(buildDirPath, "bin")], cwd=self.config["root"])
-		lib.shell(["mkdir", lib.path(buildDirPath, "lib")], cwd=self.config["root"])
+		if not CMake.hasOutputPerBuildType():
+			buildDirPath = lib.path(self.config["root"], self.getConfig(["buildDir"]))
+			lib.info("Cleaning %s" % (buildDirPath))
+			lib.trash(lib.path(buildDirPath, "bin"))
+			lib.trash(lib.path(buildDirPath, "lib"))
+			lib.shell(["mkdir", lib.path(buildDirPath, "bin")], cwd=self.config["root"])
+			lib.shell(["mkdir", lib.path(buildDirPath, "lib")], cwd=self.config["root"])
+			return
+
+		# Only clean the outputs of the current build configuration and the ones of the configurations that no longer exist
+		for key in ["binDir", "libDir"]:
+			outputPath = self.getOutputPath(key)
+			lib.info("Cleaning %s" % (outputPath))
+			lib.trash(outputPath)
+			lib.shell(["mkdir", "-p", outputPath], cwd=self.config["root"])
+			for buildType, stalePath in self.getOutputPathsPerBuildType(key).items():
+				if buildType not in self.getConfig(["builds"], default={}):
+					lib.info("Removing %s" % (stalePath))
+					lib.trash(stalePath)
+
+	"""
+	Each build configuration has its own output directories, switching only updates the links.
+	"""
+	def switchBuildType(self, previousBuildType, buildType):
+
+		if not CMake.hasOutputPerBuildType():
+			return lib.Module.switchBuildType(self, previousBuildType, buildType)
+
+		for key in ["binDir", "libDir"]:
+			linkPath = lib.path(self.config["root"], self.getConfig([key]))
+			outputPath = self.getOutputPath(key, buildType)
+			lib.mkdir(outputPath)
+			# Directories from the previous layout, shared by all configurations, are replaced
+			if os.path.isdir(linkPath) and not os.path.islink(linkPath):
+				lib.trash(linkPath)
+			# Atomically replace the link
+			if not os.path.islink(linkPath) or os.readlink(linkPath) != os.path.basename(outputPath):
+				tempLinkPath = "%s.%i.tmp" % (linkPath, os.getpid())
+				os.symlink(os.path.basename(outputPath), tempLinkPath)
+				os.rename(tempLinkPath, linkPath)
 
 	def build(self, target=None):
 
@@ -334,8 +417,14 @@ class CMake(lib.Module):
 					hideStderr=options["hideStderr"],
 					ignoreError=True)
 		else:
-			lib.shell(["cmake", "--build", lib.path(buildDirPath, buildType), "--target", target if target else "all", "--", "-j%i" % (self.getConfig(["parallelism"]))],
-					cwd=self.config["root"])
+			# Only use the jobs available from the jobserver
+			nbJobs, tokens = lib.jobserver.acquireSlots(self.getConfig(["parallelism"])) if lib.jobserver else (self.getConfig(["parallelism"]), [])
+			try:
+				lib.shell(["cmake", "--build", lib.path(buildDirPath, buildType), "--target", target if target else "all", "--", "-j%i" % (nbJobs)],
+						cwd=self.config["root"])
+			finally:
+				for token in tokens:
+					lib.jobserver.release(token)
 
 	def info(self, verbose):
 
@@ -364,18 +453,57 @@ class CMake(lib.Module):
 		if verbose:
 			lib.info("Using build generator '%s'" % (self.getConfig(["buildGenerator"])))
 
-		# List the default targets
-		buildDirPath = lib.path(self.config["root"], self.getConfig(["buildDir"]))
-
-		# Ignore the errors, it means that init command was not run
+		# List the default targets, ignore the errors, it means that init command was not run
 		try:
-			targetsRaw = lib.shell(["cmake", "--build", lib.path(buildDirPath, defaultBuildType), "--target", "help"], cwd=self.config["root"], capture=True)
-			info["targets"] = [re.search("\.+\s+([^\s]+)", targetStr).group(1) for targetStr in targetsRaw[1:] if re.search("\.+\s+([^\s]+)", targetStr)]
+			targets = self.getTargets(defaultBuildType)
+			if targets is not None:
+				info["targets"] = targets
 		except:
 			pass
 
 		return info
 
+	"""
+	Return the list of targets of a build configuration, None if it is not initialized.
+	The list is cached until the build system is re-generated.
+	"""
+	def getTargets(self, buildType):
+
+		buildPath = lib.path(self.config["root"], self.getConfig(["buildDir"]), buildType)
+		key = [(os.path.getmtime(path) if os.path.isfile(path) else None) for path in [lib.path(buildPath, name) for name in ["build.ninja", "Makefile", "CMakeCache.txt"]]]
+		if not any(key):
+			return None
+
+		cachePath = lib.path(self.config["artifacts"], ".%s.%s.targets.json" % (self.name(), buildType))
+		try:
+			with open(cachePath, "r") as f:
+				cache = json.load(f)
+			if cache["key"] == key:
+				return cache["targets"]
+		except:
+			pass
+
+		targets = []
+		if key[0] and lib.which("ninja"):
+			# Ninja lists its root targets directly, only keep the ones not being files
+			for line in lib.shell(["ninja", "-C", buildPath, "-t", "targets"], cwd=self.config["root"], capture=True):
+				name = line.split(":", 1)[0].strip()
+				if name and "/" not in name and not name.endswith(".ninja"):
+					targets.append(name)
+		else:
+			targetsRaw = lib.shell(["cmake", "--build", buildPath, "--target", "help"], cwd=self.config["root"], capture=True)
+			for targetStr in targetsRaw[1:]:
+				match = re.search("\.+\s+([^\s]+)", targetStr)
+				if match:
+					targets.append(match.group(1))
+
+		tempPath = "%s.%i.tmp" % (cachePath, os.getpid())
+		with open(tempPath, "w") as f:
+			json.dump({"key": key, "targets": targets}, f)
+		os.rename(tempPath, cachePath)
+
+		return targets
+
 	def runPre(self, commandList):
 
 		buildType = self.getDefaultBuildType()
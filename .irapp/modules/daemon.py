@@ -11,6 +11,20 @@ import threading
 import time
 import errno
 import timeit
+import socket
+import json
+import hashlib
+import tempfile
+import glob
+import select
+try:
+	import fcntl
+except ImportError:
+	pass # Not available on Windows, neither are the listening sockets
+try:
+	from urllib.request import urlopen
+except ImportError:
+	from urllib2 import urlopen
 
 # Import local lib. The different path is needed as relative import beyond the top level
 # are not supported. Note if we use the workaround for all cases, then the module lib would be loaded twice
@@ -23,10 +37,70 @@ else:
 
 class Daemon(lib.Module):
 
+	def __init__(self, config):
+		lib.Module.__init__(self, config)
+		self.sharedLock = threading.Lock()
+
 	@staticmethod
 	def check(config):
 		return True
 
+	@staticmethod
+	def config():
+		return {
+			"shared": False,
+			"logCompression": "gzip",
+			"logSegmentSize": 1024 * 1024,
+			"logBudget": 50 * 1024 * 1024,
+			"logBloomFilter": True
+		}
+
+	@staticmethod
+	def configDescriptor():
+		return {
+			"shared": {
+				"type": [bool],
+				"example": True,
+				"help": "Supervise all the daemons with a single shared process, instead of one process per daemon."
+			},
+			"logCompression": {
+				"type": [str],
+				"example": "xz",
+				"help": "Compression of the completed log segments, done in the background: gzip, bz2, xz or none."
+			},
+			"logSegmentSize": {
+				"type": [int],
+				"example": 4 * 1024 * 1024,
+				"help": "Size in bytes of the log segments, a new segment is started once reached."
+			},
+			"logBudget": {
+				"type": [int],
+				"example": 200 * 1024 * 1024,
+				"help": "Disk space in bytes allowed for the logs of each daemon, the oldest segments are removed first."
+			},
+			"logBloomFilter": {
+				"type": [bool],
+				"example": False,
+				"help": "Record the tokens of each log segment into a bloom filter, to skip the segments that cannot match when searching the logs."
+			}
+		}
+
+	"""
+	Options of the log factories of the supervisors, they are passed through the environment
+	"""
+	def getLogOptions(self):
+		compression = self.getConfig(["logCompression"])
+		if compression not in lib.LogCompressor.EXTENSIONS:
+			raise Exception("Unsupported log compression '%s', must be one of: %s" % (compression, ", ".join(sorted(lib.LogCompressor.EXTENSIONS.keys()))))
+		if compression == "xz" and not lib.lzma:
+			raise Exception("Log compression 'xz' is not supported by this version of Python")
+		return {
+			"maxLogSizeBytes": int(self.getConfig(["logSegmentSize"])),
+			"compression": compression,
+			"budgetBytes": int(self.getConfig(["logBudget"])),
+			"bloomFilter": bool(self.getConfig(["logBloomFilter"]))
+		}
+
 	"""
 	Return the current process list and their PID
 	"""
@@ -75,18 +149,25 @@ class Daemon(lib.Module):
 				}
 		return processes
 
+	"""
+	Return the running processes associated with an application, or all applications if appId is not set.
+	@param processes The process list to be used, as returned by getProcesses() or ProcessSampler.sample(). If not
+	                 set, it is read.
+	"""
 	@staticmethod
-	def getRunningProcesses(appId=None, childrenPids=set(), includeCpuMem=False):
+	def getRunningProcesses(appId=None, childrenPids=set(), includeCpuMem=False, processes=None):
 		# Get process signature
-		cmdRegexpr = re.compile("%s\\.pyc?\\s+(%s)" % (re.escape(os.path.splitext(__file__)[0]), re.escape(appId))) if appId else re.compile("%s\\.pyc?\\s+([^\\s]+)" % (re.escape(os.path.splitext(__file__)[0])))
+		cmdRegexpr = re.compile("%s\\.pyc?\\s+(%s(?:@\\d+)?)\\s" % (re.escape(os.path.splitext(__file__)[0]), re.escape(appId))) if appId else re.compile("%s\\.pyc?\\s+([^\\s]+)" % (re.escape(os.path.splitext(__file__)[0])))
 		# Check if the same process is running
 		runningParentPis = {}
-		processes = Daemon.getProcesses(includeCpuMem=includeCpuMem)
+		if processes is None:
+			processes = Daemon.getProcesses(includeCpuMem=includeCpuMem)
 
 		# Search for the parent process (that are identifiable by the regexpr)
 		for pid, process in processes.items():
 			match = re.search(cmdRegexpr, process["command"])
-			if match:
+			# The applications of a shared supervisor are only known through its control socket
+			if match and match.group(1) != "--shared":
 				# Format: { pid: {id: <appId>, ...} }
 				runningParentPis[pid] = dict(process, id=match.group(1))
 
@@ -119,44 +200,240 @@ class Daemon(lib.Module):
 
 		return runningProcesses
 
+	"""
+	Return a process and all its descendants from a process list
+	"""
+	@staticmethod
+	def getDescendants(processes, rootPid):
+		pidList = [rootPid] if rootPid in processes else []
+		index = 0
+		while index < len(pidList):
+			pidList += [pid for pid, process in processes.items() if process["ppid"] == pidList[index]]
+			index += 1
+		return pidList
+
+	"""
+	Tells if the supervisors can be controlled through a socket on this platform
+	"""
+	@staticmethod
+	def hasControl():
+		return hasattr(socket, "AF_UNIX")
+
+	"""
+	Path of the control socket of an application, or of the shared supervisor if appId is None.
+	It is kept short, as Unix socket paths are limited in size.
+	"""
+	@staticmethod
+	def getControlPath(logDir, appId):
+		identifier = hashlib.sha1(os.path.realpath(os.path.join(logDir, appId) if appId else logDir).encode("utf-8")).hexdigest()[:16]
+		return os.path.join(tempfile.gettempdir(), "irapp-%s" % (os.getuid() if hasattr(os, "getuid") else "user"), "%s.sock" % (identifier))
+
+	"""
+	Send a request to the supervisor of an application.
+	Returns the reply, None if no supervisor is listening or False if the supervisor is gone without cleaning up.
+	"""
+	@staticmethod
+	def control(logDir, appId, command, timeout=5, request={}):
+		controlPath = Daemon.getControlPath(logDir, appId)
+		if not os.path.exists(controlPath):
+			return None
+		client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			client.settimeout(timeout)
+			try:
+				client.connect(controlPath)
+			except socket.error as e:
+				if e.errno in [errno.ECONNREFUSED, errno.ENOENT]:
+					try:
+						os.remove(controlPath)
+					except OSError:
+						pass
+					return False
+				raise
+			client.sendall((json.dumps(dict(request, command=command)) + "\n").encode("utf-8"))
+			data = b""
+			while not data.endswith(b"\n"):
+				chunk = client.recv(4096)
+				if not chunk:
+					break
+				data += chunk
+			return json.loads(data.decode("utf-8"))
+		except (socket.error, ValueError) as e:
+			lib.warning("Could not control '%s': %s" % (appId or "shared supervisor", str(e)))
+			return False
+		finally:
+			client.close()
+
+	"""
+	Send a request to the supervisors of all the applications (or only appId if set), concurrently.
+	Returns the replies and a flag telling if some supervisors are gone without cleaning up.
+	"""
+	def controlAll(self, command, appId=None, timeout=5):
+		appIdList = os.listdir(self.config["log"]) if os.path.isdir(self.config["log"]) else []
+		if appId:
+			appIdList = [appId] + [curAppId for curAppId in appIdList if curAppId != appId and Daemon.parseInstanceId(curAppId)[0] == appId]
+		results = {}
+		def control(curAppId):
+			results[curAppId] = Daemon.control(self.config["log"], curAppId, command, timeout=timeout)
+		threadList = [threading.Thread(target=control, args=(curAppId, )) for curAppId in appIdList]
+		for thread in threadList:
+			thread.start()
+		for thread in threadList:
+			thread.join()
+		replies = {curAppId: reply for curAppId, reply in results.items() if reply}
+		return replies, any(reply is False for reply in results.values())
+
+	"""
+	Send a termination signal to a process, or kill it if not graceful
+	"""
 	@staticmethod
-	def killProcess(pid):
+	def killProcess(pid, graceful=False):
 		if sys.platform == "win32":
-			subprocess.call(["taskkill", "/f", "/pid", "%i" % (pid)], stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'), shell=True)
+			subprocess.call(["taskkill"] + ([] if graceful else ["/f"]) + ["/pid", "%i" % (pid)], stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'), shell=True)
 		else:
-			os.kill(pid, signal.SIGKILL)
-		os.waitpid(pid)
+			os.kill(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+
+	"""
+	Tells if a process is running, zombies (exited but not yet reaped by their parent) are not
+	"""
+	@staticmethod
+	def isRunning(pid):
+		if sys.platform == "win32":
+			return pid in Daemon.getProcesses()
+		return lib.isProcessRunning(pid)
+
+	"""
+	Wait until the processes exit, for timeoutS at most. Returns the ones still running.
+	The processes are watched through pidfds when supported by the kernel, polled otherwise.
+	"""
+	@staticmethod
+	def waitProcesses(pidList, timeoutS):
+		deadline = timeit.default_timer() + timeoutS
+		running = set(pid for pid in pidList if Daemon.isRunning(pid))
+		# Format: { fd: pid }
+		pidfds = {}
+		poller = select.poll() if hasattr(select, "poll") else None
+		if poller and hasattr(os, "pidfd_open"):
+			for pid in running:
+				try:
+					pidfds[os.pidfd_open(pid)] = pid
+				except OSError:
+					pass # Gone or not supported, it is polled
+			for fd in pidfds.keys():
+				poller.register(fd, select.POLLIN)
+		intervalS = 0.01
+		try:
+			while running:
+				remainingS = deadline - timeit.default_timer()
+				if remainingS <= 0:
+					break
+				# Only wake up periodically if some processes cannot be watched
+				waitS = remainingS if len(pidfds) == len(running) else min(intervalS, remainingS)
+				if pidfds:
+					for fd, event in poller.poll(waitS * 1000):
+						poller.unregister(fd)
+						os.close(fd)
+						running.discard(pidfds.pop(fd))
+				else:
+					time.sleep(waitS)
+				watchedPids = set(pidfds.values())
+				running = set(pid for pid in running if pid in watchedPids or Daemon.isRunning(pid))
+				intervalS = min(intervalS * 2, 0.2)
+		finally:
+			for fd in pidfds.keys():
+				os.close(fd)
+		return sorted(running)
+
+	"""
+	Terminate processes all at once and kill the ones still running after timeoutS.
+	Returns the processes that had to be killed.
+	"""
+	@staticmethod
+	def terminateProcesses(pidList, timeoutS):
+		for pid in pidList:
+			try:
+				Daemon.killProcess(pid, graceful=True)
+			except OSError:
+				pass # Ignore errors as the process might be gone by then
+		killedPidList = Daemon.waitProcesses(pidList, timeoutS)
+		for pid in killedPidList:
+			try:
+				Daemon.killProcess(pid)
+			except OSError:
+				pass
+		return killedPidList
+
+	"""
+	Time given to an application to stop gracefully before being killed, set by its "stopTimeout" start option,
+	10s if not set. The longest of all applications if appId is None.
+	"""
+	def getStopTimeout(self, appId=None):
+		appIdList = [appId] if appId else (os.listdir(self.config["log"]) if os.path.isdir(self.config["log"]) else [])
+		timeoutList = []
+		for curAppId in appIdList:
+			try:
+				startCommand = lib.getStartCommand(self.config, self.name(), Daemon.parseInstanceId(curAppId)[0])
+			except Exception:
+				startCommand = None # The configuration might have changed since the start
+			timeoutList.append(float(startCommand[1]["stopTimeout"]) if startCommand and "stopTimeout" in startCommand[1] else 10.)
+		return max(timeoutList) if timeoutList else 10.
 
 	def stop(self, appId=None):
+		timeoutS = self.getStopTimeout(appId)
+
+		# Gracefully stop the supervisors through their control socket, all at once. The process list is only
+		# scanned if some are not reachable.
+		if Daemon.hasControl():
+			replies, isStale = self.controlAll("stop", appId, timeout=timeoutS + 10)
+			for curAppId, reply in sorted(replies.items()):
+				lib.info("Stopped daemon '%s' with pid %i" % (curAppId, reply["supervisor"]))
+				if reply.get("killed"):
+					lib.warning("Daemon '%s' did not stop gracefully, killed pid(s): %s" % (curAppId, ", ".join([str(pid) for pid in reply["killed"]])))
+			if not isStale:
+				return
+
 		# Get the list of running process
 		childrenPids = set()
 		runningProcesses = Daemon.getRunningProcesses(appId, childrenPids=childrenPids)
 
-		# Delete the running processes if any
+		# Terminate the supervisors first to make sure they will not restart their application, then the applications
+		# and their descendants, all at once
+		supervisorPids = []
 		for pid, process in runningProcesses.items():
-			lib.info("Stopping daemon '%s' with pid %i" % (process["id"], process["ppid"]))
-			# Stop the parent process for to make sure ti will not restart the child process
-			if process["ppid"]:
-				try:
-					Daemon.killProcess(process["ppid"])
-				except:
-					pass # Ignore errors as the process might be gone by then
-		# Deleting all children PIDs if still alive
-		if childrenPids:
-			lib.info("Stopping children with pid(s): %s" % (", ".join([str(pid) for pid in childrenPids])))
-			for pid in childrenPids:
-				# Stop the process itself
-				try:
-					Daemon.killProcess(pid)
-				except:
-					pass # Ignore errors as the process might be gone by then
+			supervisorPid = process["ppid"] or pid
+			lib.info("Stopping daemon '%s' with pid %i" % (process["id"], supervisorPid))
+			if supervisorPid not in supervisorPids:
+				supervisorPids.append(supervisorPid)
+		pidList = supervisorPids + [pid for pid in list(runningProcesses.keys()) + list(childrenPids) if pid not in supervisorPids]
+		killedPidList = Daemon.terminateProcesses(pidList, timeoutS)
+		if killedPidList:
+			lib.warning("Some processes did not stop within %gs, killed pid(s): %s" % (timeoutS, ", ".join([str(pid) for pid in killedPidList])))
+
+	def status(self, appId=None, live=False):
+		# Ask the supervisors directly, unless some are not reachable. Each supervisor computes the CPU usage
+		# since the previous request.
+		if Daemon.hasControl():
+			replies, isStale = self.controlAll("status", appId)
+			if not isStale:
+				statusList = [{"id": curAppId, "pid": reply["pid"], "cpu": min(reply["cpu"], 100), "memory": reply["memory"]} for curAppId, reply in replies.items()]
+				# Identify the instances of the replicated applications
+				for status in statusList:
+					appId, index = Daemon.parseInstanceId(status["id"])
+					if index is not None:
+						status.update({"app": appId, "instance": index})
+				return statusList
 
-	def status(self, appId=None):
+		# Keep the same sampler across calls, so that the CPU usage is the one since the previous call
+		processes = None
+		if live:
+			if not hasattr(self, "sampler"):
+				self.sampler = ProcessSampler()
+			processes = self.sampler.sample()
 		# Ceil the CPU at 100.A higher value might happen in case of multiprocessors, but it is fair to say that if one processor
 		# is already saturated, it already reaches its full potential
-		return [{"id": process["id"], "pid": pid, "cpu": min(process["cpu"], 100), "memory": process["memory"]} for pid, process in Daemon.getRunningProcesses(appId, includeCpuMem=True).items()]
+		return [{"id": process["id"], "pid": pid, "cpu": min(process["cpu"], 100), "memory": process["memory"]} for pid, process in Daemon.getRunningProcesses(appId, includeCpuMem=True, processes=processes).items()]
 
-	def start(self, appId, commandList, context):
+	def start(self, appId, commandList, context, ready=None, replicas=None, listen=[], stopTimeout=None):
 
 		# Stop previous instances if any
 		self.stop(appId)
@@ -168,92 +445,899 @@ class Daemon(lib.Module):
 			if fullPath:
 				commandList[0] = fullPath
 
-		# Start a subprocess with the executabel information
-		process = subprocess.Popen([sys.executable, __file__, appId, self.config["log"]] + commandList, stdin=None, stdout=None, stderr=None, shell=False, cwd=context["cwd"])
+		if listen and (sys.platform == "win32" or (replicas and not hasattr(socket, "SO_REUSEPORT"))):
+			raise Exception("Listening sockets are not supported for daemon '%s' on this platform" % (appId))
+
+		# Start the instances, each has its own supervised application and logs
+		nbReplicas = (self.getConfig(["parallelism"]) if replicas == "auto" else int(replicas)) if replicas else None
+		instanceList = [(appId, dict(os.environ))] if nbReplicas is None else [
+				(Daemon.getInstanceId(appId, index), dict(os.environ, IRAPP_INSTANCE=str(index), IRAPP_REPLICAS=str(nbReplicas))) for index in range(nbReplicas)]
+		processes = {}
+		for instanceId, env in instanceList:
+			# Start the application within the shared supervisor
+			if self.getConfig(["shared"]) and Daemon.hasControl():
+				processes[instanceId] = None
+				reply = self.startShared({"id": instanceId, "commandList": commandList, "cwd": context["cwd"], "env": env, "listen": listen, "stopTimeout": stopTimeout})
+				if not reply or "error" in reply:
+					self.stop(appId)
+					raise Exception("Unable to start daemon '%s' in '%s'%s" % (" ".join(commandList), context["cwd"], (": %s" % (reply["error"])) if reply else ""))
+			# Start a subprocess with the executabel information
+			else:
+				if listen:
+					env["IRAPP_LISTEN"] = json.dumps(listen)
+				if stopTimeout is not None:
+					env["IRAPP_STOP_TIMEOUT"] = str(stopTimeout)
+				env["IRAPP_LOG"] = json.dumps(self.getLogOptions())
+				processes[instanceId] = subprocess.Popen([sys.executable, __file__, instanceId, self.config["log"]] + commandList, stdin=None, stdout=None, stderr=None, shell=False, cwd=context["cwd"], env=env)
+
+		# Without control socket, there is no way to know when the application is spawned.
+		# 2s timeout before checking the status (one is too low), this is to give enough time for the process to start.
+		if not Daemon.hasControl() and not ready:
+			time.sleep(2)
+			for process in processes.values():
+				if process.poll() != None and process.returncode != 0:
+					self.stop(appId)
+					raise Exception("Unable to start daemon '%s' in '%s'" % (" ".join(commandList), context["cwd"]))
+		else:
+			for instanceId, process in processes.items():
+				try:
+					self.waitReady(instanceId, process, ReadinessProbe(ready or {}, os.path.join(self.config["log"], instanceId), context["cwd"]))
+				except Exception as e:
+					self.stop(appId)
+					raise Exception("Unable to start daemon '%s' in '%s': %s" % (" ".join(commandList), context["cwd"], str(e)))
+
+		lib.info("Started daemon '%s'%s" % (appId, (" with %i instance(s)" % (nbReplicas)) if nbReplicas is not None else ""))
 
-		# 2s timeout before checking the status (one is too low)
-		# This is to gfive enough time for the process to start
-		time.sleep(2)
-		if process.poll() != None and process.returncode != 0:
-			raise Exception("Unable to start daemon '%s' in '%s'" % (" ".join(commandList), context["cwd"]))
+	"""
+	Identifier of an instance of a replicated application, it is used for its logs and its supervisor
+	"""
+	@staticmethod
+	def getInstanceId(appId, index):
+		return "%s@%i" % (appId, index)
 
-		lib.info("Started daemon '%s'" % (appId))
+	"""
+	Return the application identifier and the instance index (None if not replicated) of an identifier
+	"""
+	@staticmethod
+	def parseInstanceId(instanceId):
+		match = re.match(r"^(.*)@(\d+)$", instanceId)
+		return (match.group(1), int(match.group(2))) if match else (instanceId, None)
+
+	"""
+	Restart the instances of an application, or all applications if appId is None, one at a time.
+	Applications with listening sockets are restarted without downtime: the new process is started
+	alongside the previous one, which is only terminated once the new one is ready.
+	"""
+	def restart(self, appId=None):
+		if not Daemon.hasControl():
+			raise Exception("Restarting daemons is not supported on this platform, use start instead")
+		replies, isStale = self.controlAll("status", appId)
+		if appId and not replies:
+			raise Exception("Daemon '%s' is not running" % (appId))
+
+		for instanceId in sorted(replies.keys()):
+			previous = replies[instanceId]
+			argList, options, context = lib.getStartCommand(self.config, self.name(), Daemon.parseInstanceId(instanceId)[0]) or (None, {}, {"cwd": self.config["root"]})
+			probe = ReadinessProbe(options.get("ready", {}), os.path.join(self.config["log"], instanceId), context["cwd"])
+			if previous["listen"]:
+				reply = Daemon.control(self.config["log"], instanceId, "spawn")
+				if not reply or "error" in reply:
+					raise Exception("Unable to restart daemon '%s'%s" % (instanceId, (": %s" % (reply["error"])) if reply else ""))
+				try:
+					self.waitReady(instanceId, None, probe, previous=previous, pid=reply["pid"])
+				except Exception as e:
+					Daemon.control(self.config["log"], instanceId, "rollback")
+					raise Exception("Unable to restart daemon '%s', keeping the previous process: %s" % (instanceId, str(e)))
+				Daemon.control(self.config["log"], instanceId, "drain")
+			else:
+				Daemon.control(self.config["log"], instanceId, "restart")
+				try:
+					self.waitReady(instanceId, None, probe, previous=previous)
+				except Exception as e:
+					raise Exception("Unable to restart daemon '%s': %s" % (instanceId, str(e)))
+			lib.info("Restarted daemon '%s' with pid %i" % (instanceId, probe.pid))
+
+	"""
+	Ensure the shared supervisor is running and return its reply to the start request of an application.
+	"""
+	def startShared(self, request):
+		with self.sharedLock:
+			if not Daemon.control(self.config["log"], None, "list"):
+				subprocess.Popen([sys.executable, __file__, "--shared", self.config["log"]], stdin=None, stdout=None, stderr=None, shell=False, cwd=self.config["root"],
+						env=dict(os.environ, IRAPP_LOG=json.dumps(self.getLogOptions())))
+				timeStart = timeit.default_timer()
+				while not Daemon.control(self.config["log"], None, "list"):
+					if timeit.default_timer() - timeStart > 10:
+						raise Exception("the shared supervisor did not start")
+					time.sleep(0.05)
+			return Daemon.control(self.config["log"], None, "start", request=request, timeout=30)
+
+	"""
+	Wait until the application is ready. Fails as soon as the supervisor or the application exits,
+	or if the probes do not succeed within their timeout.
+	The supervisor process is None for applications hosted by the shared supervisor.
+	"""
+	def waitReady(self, appId, process, probe, previous=None, pid=None):
+		timeStart = timeit.default_timer()
+		intervalS = 0.01
+		# When restarting, the status before the restart and the pid of the new process if known
+		restartLimit = (previous["restart"] + 1) if previous else 0
+		while True:
+			if process and process.poll() != None:
+				raise Exception("the supervisor exited with code %i" % (process.returncode))
+			spawned = True
+			if Daemon.hasControl():
+				reply = Daemon.control(self.config["log"], appId, "status")
+				if reply and (reply["restart"] > restartLimit or (pid and reply["pid"] != pid)):
+					raise Exception("the application exited during startup")
+				if not process and not reply:
+					raise Exception("the application exited")
+				spawned = bool(reply and reply["pid"] and (not previous or reply["pid"] != previous["pid"]))
+				# Only look at the output of the new process
+				if spawned:
+					probe.pid = reply["pid"]
+			if spawned and probe.check():
+				return
+			if timeit.default_timer() - timeStart > probe.timeoutS:
+				raise Exception("not ready after %gs, waiting for %s" % (probe.timeoutS, probe.describe()))
+			# Back off progressively to not burn CPU on slow starting applications
+			time.sleep(intervalS)
+			intervalS = min(intervalS * 2, 0.2)
 
 """
-Entry point fo the script
+Readiness probes of an application, configured with a dictionary (all set probes must succeed):
+- "tcp": <port> or "<host>:<port>", a connection is accepted.
+- "http": <url>, the URL responds with status 200.
+- "log": <regex>, a line of the application output (stdout or stderr) matches.
+- "pid": <path>, the file exists (relative to the working directory) and contains the pid of a running process.
+- "timeout": Maximum time in seconds to wait for (default 30s).
 """
-if __name__ == "__main__":
+class ReadinessProbe:
+	def __init__(self, ready, logDirPath, cwd):
+		unknownList = set(ready.keys()) - set(["tcp", "http", "log", "pid", "timeout"])
+		if unknownList:
+			raise Exception("Unknown readiness probe(s): %s" % (", ".join(unknownList)))
+		self.ready = ready
+		self.timeoutS = float(ready.get("timeout", 30))
+		self.logDirPath = logDirPath
+		# Restrict the log probe to the output of this process if set
+		self.pid = None
+		self.cwd = cwd
+		self.pattern = re.compile(ready["log"]) if "log" in ready else None
+		# Read position of each log file, to only read the new content
+		self.logOffsets = {}
+		self.succeeded = set()
 
-	def stdLogger(process, stream, log):
-		while True:
-			line = stream.readline()
-			if line:
-				log.add(line)
-			elif process.poll() is not None:
-				break
+	def describe(self):
+		return ", ".join(["%s '%s'" % (probe, self.ready[probe]) for probe in ["tcp", "http", "log", "pid"] if probe in self.ready and probe not in self.succeeded])
 
-	if sys.platform != "win32":
-		# Ignore signal SIGHUP to act like nohup/screen (on unix machine)
-		signal.signal(signal.SIGHUP, signal.SIG_IGN)
+	def check(self):
+		for probe in ["tcp", "http", "log", "pid"]:
+			if probe in self.ready and probe not in self.succeeded:
+				if not getattr(self, "check%s" % (probe.capitalize()))(self.ready[probe]):
+					return False
+				self.succeeded.add(probe)
+		return True
+
+	def checkTcp(self, address):
+		address = str(address).rsplit(":", 1)
+		host, port = (address[0], int(address[1])) if len(address) == 2 else ("localhost", int(address[0]))
+		try:
+			socket.create_connection((host, port), timeout=1).close()
+		except socket.error:
+			return False
+		return True
 
-	appId = sys.argv[1]
-	logDir =  sys.argv[2]
-	commandList = sys.argv[3:]
+	def checkHttp(self, url):
+		try:
+			response = urlopen(url, timeout=1)
+			return response.getcode() == 200
+		except Exception:
+			return False
 
-	restartCounter = 0
-	restartFailureCounter = 0
-	restart = True
+	def checkLog(self, pattern):
+		for logPath in sorted(glob.glob(os.path.join(self.logDirPath, str(self.pid) if self.pid else "*", "*.log"))):
+			try:
+				with open(logPath, "rb") as f:
+					f.seek(self.logOffsets.get(logPath, 0))
+					data = f.read()
+			except (IOError, OSError):
+				continue
+			# Only consume complete lines
+			end = data.rfind(b"\n") + 1
+			self.logOffsets[logPath] = self.logOffsets.get(logPath, 0) + end
+			for line in data[:end].decode("utf-8", "replace").splitlines():
+				if self.pattern.search(line):
+					return True
+		return False
 
-	# Failure that opens with the next X seconds of the process being open
-	# If they happen too often the process will be stopped
-	rapidConsequentFailureCounter = 0
+	def checkPid(self, path):
+		try:
+			with open(os.path.join(self.cwd, path), "r") as f:
+				pid = int(f.read().strip())
+			os.kill(pid, 0)
+		except (IOError, OSError, ValueError):
+			return False
+		return True
 
-	factory = lib.LogFactory(logDir, appId, Daemon.getRunningProcesses(appId).keys())
+"""
+Incremental sampler of the process list.
+On Linux, /proc is read directly and the CPU usage is computed from the jiffies consumed since the
+previous sample (since the start of the process for the first one). The command lines are only read
+for new processes. Other platforms fall back to Daemon.getProcesses().
+"""
+class ProcessSampler:
+	def __init__(self):
+		self.isProcfs = sys.platform.startswith("linux") and os.path.isdir("/proc/self")
+		if self.isProcfs:
+			self.clockTicks = float(os.sysconf("SC_CLK_TCK"))
+			self.pageSize = os.sysconf("SC_PAGE_SIZE")
+		# Format: { pid: {"start": <starttime>, "jiffies": <utime + stime>, "time": <timestamp>, "command": <command>} }
+		self.previous = {}
 
-	# The out and err streams
-	logStdout = logStderr = None
+	"""
+	Read the stat file of a process, returns (ppid, jiffies, starttime, rss, threads) or None if gone
+	"""
+	@staticmethod
+	def readStat(pid):
+		try:
+			with open("/proc/%i/stat" % (pid), "r") as f:
+				content = f.read()
+		except (IOError, OSError):
+			return None
+		# The command name might contain spaces and parenthesis
+		fields = content[content.rfind(")") + 2:].split()
+		return int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[19]), int(fields[21]), int(fields[17])
 
-	try:
-		while restart:
+	@staticmethod
+	def readCommand(pid):
+		try:
+			with open("/proc/%i/cmdline" % (pid), "rb") as f:
+				return f.read().rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "ignore")
+		except (IOError, OSError):
+			return ""
 
-			# Spawn the process
-			try:
-				process = subprocess.Popen(commandList, stdin=None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False, universal_newlines=True)
-				restartFailureCounter = 0
-			except BaseException as e:
-				restartFailureCounter += 1
-				if restartCounter == 0 or restartFailureCounter >= 5:
-					raise e
-				logStderr.add("Could not start '%s': %s, restarting in 5s" % (" ".join(commandList), str(e)))
-				time.sleep(5)
+	"""
+	Return the direct children of a process, None if not supported by the kernel
+	"""
+	@staticmethod
+	def readChildren(pid):
+		try:
+			childPids = []
+			for tid in os.listdir("/proc/%i/task" % (pid)):
+				with open("/proc/%i/task/%s/children" % (pid, tid), "r") as f:
+					childPids += [int(childPid) for childPid in f.read().split()]
+			return childPids
+		except (IOError, OSError):
+			return None
+
+	"""
+	Sample the processes given, the ones not listed are forgotten
+	"""
+	def samplePids(self, pidList):
+		with open("/proc/uptime", "r") as f:
+			uptimeS = float(f.read().split()[0])
+		currentTime = timeit.default_timer()
+
+		processes = {}
+		current = {}
+		for pid in pidList:
+			stat = ProcessSampler.readStat(pid)
+			if not stat:
 				continue
+			ppid, jiffies, startTime, rss, threads = stat
+			previous = self.previous.get(pid)
+			# The pid might have been re-used by another process
+			if previous and previous["start"] == startTime:
+				elapsedS = currentTime - previous["time"]
+				cpu = (jiffies - previous["jiffies"]) / self.clockTicks / elapsedS * 100. if elapsedS > 0 else 0.
+				command = previous["command"]
+			else:
+				elapsedS = uptimeS - startTime / self.clockTicks
+				cpu = jiffies / self.clockTicks / elapsedS * 100. if elapsedS > 0 else 0.
+				command = ProcessSampler.readCommand(pid)
+			current[pid] = {"start": startTime, "jiffies": jiffies, "time": currentTime, "command": command}
+			# Kernel threads have no command line
+			if not command:
+				continue
+			processes[pid] = {
+				"ppid": ppid,
+				"memory": float(rss * self.pageSize),
+				"cpu": cpu,
+				"threads": threads,
+				"command": command
+			}
+		self.previous = current
+		return processes
 
-			timeStart = timeit.default_timer()
+	def sample(self):
+		if not self.isProcfs:
+			return Daemon.getProcesses(includeCpuMem=True)
+		return self.samplePids([int(name) for name in os.listdir("/proc") if name.isdigit()])
 
-			# Create the rotating loggers
-			logStdout, logStderr = factory.createLogs(process.pid)
+	"""
+	Sample a process and all its descendants, the number of open files is also reported.
+	Only the tree is read if the kernel exposes the children of a process, the full list otherwise.
+	"""
+	def sampleTree(self, rootPid):
+		if not self.isProcfs:
+			processes = self.sample()
+			pidList = Daemon.getDescendants(processes, rootPid)
+			return {pid: dict(processes[pid], threads=0, fds=0) for pid in pidList}
 
-			# Log Stderr
-			thread = threading.Thread(target=stdLogger, args=(process, process.stderr, logStderr))
-			thread.start()
+		pidList = [rootPid]
+		index = 0
+		while pidList is not None and index < len(pidList):
+			childPids = ProcessSampler.readChildren(pidList[index])
+			pidList = None if childPids is None else pidList + childPids
+			index += 1
+		if pidList is None:
+			processes = self.sample()
+			processes = {pid: processes[pid] for pid in Daemon.getDescendants(processes, rootPid)}
+		else:
+			processes = self.samplePids(pidList)
+		for pid, process in processes.items():
+			try:
+				process["fds"] = len(os.listdir("/proc/%i/fd" % (pid)))
+			except OSError:
+				process["fds"] = 0
+		return processes
 
-			# Log Stdout
-			stdLogger(process, process.stdout, logStdout)
+"""
+Supervise an application: spawn it, log its outputs into rotating logs, record the resources it uses
+and restart it if it fails. It is driven by the event loop of the Supervisor hosting it.
+"""
+class Supervised:
+	def __init__(self, supervisor, appId, commandList, cwd=None, env=None, runningPidList=[], listen=[], stopTimeoutS=10):
+		self.supervisor = supervisor
+		self.appId = appId
+		self.commandList = commandList
+		self.cwd = cwd
+		# The jobserver is owned by the command starting the application and is deleted when it exits
+		self.env = {key: value for key, value in (env or os.environ).items() if key != lib.Jobserver.ENV_VARIABLE}
+		# Time given to the application to exit gracefully before being killed
+		self.stopTimeoutS = stopTimeoutS
+		# Listening sockets are kept open by the supervisor across the restarts of the application
+		self.listenList = [Supervised.bind(address) for address in listen]
+		self.factory = lib.LogFactory(supervisor.logDir, appId, runningPidList, **supervisor.logOptions)
+		self.process = None
+		self.logStderr = None
+		# Process being replaced during a rolling restart, until the new one is ready
+		self.previous = None
+		# Processes being terminated, format: [{"process": <process or None>, "pgid": <process group>, "killTime": <time>, "killPidList": [<pid>, ...]}]
+		self.draining = []
+		# Output streams of the processes, format: { fd: [stream, log, pending data, pid] }
+		self.pipes = {}
+		self.threadList = []
+		self.restart = 0
+		self.spawnFailures = 0
+		# Failure that opens with the next X seconds of the process being open
+		# If they happen too often the process will be stopped
+		self.rapidFailures = 0
+		self.stopping = False
+		self.restarting = False
+		self.time = time.time()
+		self.timeStart = None
+		# Timers, None if not set
+		self.spawnTime = timeit.default_timer()
+		self.killTime = None
+		self.killPidList = []
+		# Processes that did not exit gracefully and had to be killed
+		self.killedPidList = []
+		# Connections waiting for the application to be stopped
+		self.waitingList = []
+		self.error = None
+		self.done = False
+		self.statusSampler = ProcessSampler()
+
+		# Sample the resources used by the application tree into its time series (24h of history)
+		lib.mkdir(os.path.join(supervisor.logDir, appId))
+		intervalS = supervisor.statsIntervalS
+		self.stats = lib.StatsRing(lib.LogFactory.getStatsPath(supervisor.logDir, appId), capacity=int(24 * 3600 / intervalS), intervalS=intervalS, create=True)
+		self.statsSampler = ProcessSampler()
+		self.statsTime = timeit.default_timer() + intervalS
 
-			# Restart if the process failed
-			restart = (process.wait() != 0)
-			# If it fails within the first 60s
-			if restart and (timeit.default_timer() - timeStart) < 60:
-				rapidConsequentFailureCounter += 1
-				if rapidConsequentFailureCounter > 3:
-					raise Exception("Too many (>%i) consequent rapid (<%is) failures detected, aborting." % (3, 60))
+	"""
+	Create a listening TCP socket. SO_REUSEPORT lets the instances of a replicated application
+	bind the same port, the connections being balanced between them by the kernel.
+	"""
+	@staticmethod
+	def bind(address):
+		address = str(address).rsplit(":", 1)
+		host, port = (address[0], int(address[1])) if len(address) == 2 else ("", int(address[0]))
+		server = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+		server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		if hasattr(socket, "SO_REUSEPORT"):
+			server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+		server.bind((host, port))
+		server.listen(128)
+		return server
+
+	@property
+	def pid(self):
+		return self.process.pid if self.process else None
+
+	def status(self):
+		processes = self.statusSampler.sampleTree(self.pid) if self.pid else {}
+		status = {"supervisor": os.getpid(), "pid": self.pid, "restart": self.restart, "uptime": time.time() - self.time, "listen": len(self.listenList)}
+		status.update({key: sum([process[key] for process in processes.values()]) for key in lib.StatsRing.KEYS})
+		status["cpu"] = round(status["cpu"], 1)
+		return status
+
+	"""
+	Handle the timers and the termination of the application.
+	Returns the time of the next timer.
+	"""
+	def tick(self, now):
+		if self.spawnTime is not None and now >= self.spawnTime:
+			self.spawnTime = None
+			self.spawn(now)
+		if self.process and self.process.poll() is not None:
+			self.exited(now)
+		if self.killTime is not None and now >= self.killTime:
+			self.kill()
+		for entry in list(self.draining):
+			if entry["process"]:
+				entry["process"].poll()
+			if now >= entry["killTime"]:
+				self.killedPidList += Supervised.killAll(entry["killPidList"], entry["pgid"])
+				entry["killTime"] = now + 1
+			if not any(Daemon.isRunning(pid) for pid in entry["killPidList"]) and (not entry["process"] or entry["process"].returncode is not None):
+				self.draining.remove(entry)
+		# Once stopped, wait for all the processes to be gone
+		if self.stopping and not self.process and not self.draining and not self.done:
+			self.finish()
+		if now >= self.statsTime:
+			processes = self.statsSampler.sampleTree(self.pid) if self.pid else {}
+			if processes:
+				self.stats.append(*[sum([process[key] for process in processes.values()]) for key in lib.StatsRing.KEYS])
+			self.statsTime = now + self.supervisor.statsIntervalS
+		# Once its outputs are closed, the process is likely about to exit
+		exitTime = (now + 0.05) if self.process and not self.pipes and not self.threadList else None
+		# Processes being terminated are not all children of the supervisor, they are polled
+		drainTime = (now + 0.05) if self.draining else None
+		return min([t for t in [self.spawnTime, self.killTime, self.statsTime, exitTime, drainTime] if t is not None])
+
+	def spawn(self, now, retry=True):
+		commandList = self.commandList
+		# Each application has its own process group, to be terminated at once with its descendants
+		kwargs = {"preexec_fn": os.setpgrp} if sys.platform != "win32" else {}
+		# Pass the listening sockets as file descriptors starting at 3, following the systemd socket activation protocol.
+		# The shell sets LISTEN_PID to its own pid, which is kept by the application as it is executed in place.
+		if self.listenList:
+			fdList = [server.fileno() for server in self.listenList]
+			def passSockets():
+				os.setpgrp()
+				# Move the descriptors out of the way first, as they might overlap with their destinations
+				tempFdList = [fcntl.fcntl(fd, fcntl.F_DUPFD, 3 + len(fdList)) for fd in fdList]
+				for index, fd in enumerate(tempFdList):
+					os.dup2(fd, 3 + index)
+					os.close(fd)
+			commandList = ["sh", "-c", "LISTEN_PID=$$; export LISTEN_PID; exec \"$@\"", "sh"] + commandList
+			kwargs = {"env": dict(self.env, LISTEN_FDS=str(len(fdList))), "preexec_fn": passSockets}
+			kwargs.update({"pass_fds": list(range(3, 3 + len(fdList)))} if sys.version_info >= (3, 2) else {"close_fds": False})
+
+		# The destination descriptors are overwritten in the child, hold the free ones while the process is created,
+		# so that the pipes opened by subprocess (including its internal error pipe) cannot be allocated there.
+		reservedFdList = []
+		while self.listenList:
+			fd = os.open(os.devnull, os.O_RDONLY)
+			reservedFdList.append(fd)
+			if fd >= 3 + len(self.listenList):
+				break
+
+		try:
+			self.process = subprocess.Popen(commandList, stdin=None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=False, cwd=self.cwd, **dict({"env": self.env}, **kwargs))
+			self.spawnFailures = 0
+		except Exception as e:
+			if not retry:
+				raise
+			self.spawnFailures += 1
+			if self.restart == 0 or self.spawnFailures >= 5:
+				return self.abort("Could not start '%s': %s" % (" ".join(self.commandList), str(e)))
+			self.logStderr.add("Could not start '%s': %s, restarting in 5s\n" % (" ".join(self.commandList), str(e)))
+			self.spawnTime = now + 5
+			return
+		finally:
+			for fd in reservedFdList:
+				os.close(fd)
+
+		self.timeStart = now
+		# Create the rotating loggers, the previous error log is kept open until its process is gone
+		if self.logStderr and not any(pipe[1] is self.logStderr for pipe in self.pipes.values()):
+			self.logStderr.close()
+		logStdout, self.logStderr = self.factory.createLogs(self.process.pid)
+		for stream, log in [(self.process.stdout, logStdout), (self.process.stderr, self.logStderr)]:
+			if self.supervisor.hasSelect:
+				self.pipes[stream.fileno()] = [stream, log, b"", self.process.pid]
+				self.supervisor.register(stream.fileno(), self.read)
 			else:
-				rapidConsequentFailureCounter = 0
+				thread = threading.Thread(target=Supervised.readBlocking, args=(stream, log, log is logStdout))
+				thread.start()
+				self.threadList.append(thread)
+
+	"""
+	Read the output of a stream until it is closed, for platforms where pipes cannot be selected
+	"""
+	@staticmethod
+	def readBlocking(stream, log, closeLog):
+		for line in iter(stream.readline, b""):
+			log.add(line.decode("utf-8", "replace"))
+		stream.close()
+		if closeLog:
+			log.close()
+
+	def read(self, fd):
+		data = os.read(fd, 65536)
+		if not data:
+			return self.closePipe(fd)
+		pipe = self.pipes[fd]
+		pipe[2] += data
+		end = pipe[2].rfind(b"\n") + 1
+		if end:
+			pipe[1].add(pipe[2][:end].decode("utf-8", "replace"))
+			pipe[2] = pipe[2][end:]
+
+	def closePipe(self, fd):
+		stream, log, pending, pid = self.pipes.pop(fd)
+		if pending:
+			log.add(pending.decode("utf-8", "replace"))
+		self.supervisor.unregister(fd)
+		stream.close()
+		# The error log of the current process is also used by the supervisor
+		if log is not self.logStderr:
+			log.close()
+
+	def exited(self, now):
+		# Read what is left in the pipes, descendants of the application might still hold them open
+		for fd in [fd for fd, pipe in self.pipes.items() if pipe[3] == self.process.pid]:
+			while fd in self.pipes and select.select([fd], [], [], 0)[0]:
+				self.read(fd)
+			if fd in self.pipes:
+				self.closePipe(fd)
+		for thread in self.threadList:
+			thread.join()
+		self.threadList = []
+		# The descendants of a terminated application are given until the deadline to exit as well
+		if self.killTime is not None:
+			self.draining.append({"process": None, "pgid": self.process.pid, "killTime": self.killTime, "killPidList": self.killPidList})
+			self.killTime = None
+
+		# The new process of a rolling restart failed, keep the previous one
+		if self.previous:
+			self.logStderr.close()
+			self.process, self.logStderr, self.timeStart = self.previous
+			self.previous = None
+			return
+
+		# Restart if the process failed or if requested, unless it has been stopped
+		restart = (self.process.returncode != 0 or self.restarting) and not self.stopping
+		self.process = None
+		# If it fails within the first 60s
+		if self.restarting:
+			self.restarting = False
+		elif restart and (now - self.timeStart) < 60:
+			self.rapidFailures += 1
+			if self.rapidFailures > 3:
+				return self.abort("Too many (>%i) consequent rapid (<%is) failures detected, aborting." % (3, 60))
+		else:
+			self.rapidFailures = 0
+
+		if restart:
+			self.restart += 1
+			self.spawnTime = now
+		elif not self.stopping:
+			self.finish()
+
+	"""
+	Terminate the application tree, gracefully first
+	"""
+	def terminate(self, now):
+		if self.process and self.killTime is None:
+			self.killPidList = list(self.statusSampler.sampleTree(self.process.pid).keys())
+			Supervised.terminateAll(self.process, self.killPidList)
+			self.killTime = now + self.stopTimeoutS
+
+	def kill(self):
+		self.killedPidList += Supervised.killAll(self.killPidList, self.process.pid if self.process else None)
+		self.killTime = None
+
+	"""
+	Send SIGTERM to the process group of an application, and to its descendants that left it
+	"""
+	@staticmethod
+	def terminateAll(process, pidList):
+		if sys.platform == "win32":
+			return process.terminate()
+		try:
+			os.killpg(process.pid, signal.SIGTERM)
+		except OSError:
+			process.terminate()
+		for pid in pidList:
+			try:
+				if os.getpgid(pid) != process.pid:
+					os.kill(pid, signal.SIGTERM)
+			except OSError:
+				pass # Already gone
+
+	"""
+	Kill the processes still running, returns their list
+	"""
+	@staticmethod
+	def killAll(pidList, pgid=None):
+		killedPidList = [pid for pid in pidList if Daemon.isRunning(pid)]
+		if pgid and sys.platform != "win32":
+			try:
+				os.killpg(pgid, signal.SIGKILL)
+			except OSError:
+				pass # Already gone
+		for pid in killedPidList:
+			try:
+				os.kill(pid, signal.SIGKILL)
+			except OSError:
+				pass
+		return killedPidList
+
+	"""
+	Terminate a process other than the current one, gracefully first
+	"""
+	def drainProcess(self, process, now):
+		pidList = list(self.statusSampler.sampleTree(process.pid).keys())
+		self.draining.append({"process": process, "pgid": process.pid, "killTime": now + self.stopTimeoutS, "killPidList": pidList})
+		Supervised.terminateAll(process, pidList)
+
+	"""
+	Start a new process alongside the current one, which keeps running until drain() or rollback() is called.
+	As the listening sockets are shared, both processes accept connections in the meantime.
+	"""
+	def spawnNext(self, now):
+		if not self.process or self.previous:
+			raise Exception("Application '%s' is not running or already being restarted" % (self.appId))
+		previous = (self.process, self.logStderr, self.timeStart)
+		self.process = None
+		try:
+			self.spawn(now, retry=False)
+		except:
+			self.process, self.logStderr, self.timeStart = previous
+			raise
+		self.previous = previous
+		self.restart += 1
+
+	"""
+	Terminate the previous process, once the new one is ready
+	"""
+	def drain(self, now):
+		if not self.previous:
+			raise Exception("Application '%s' is not being restarted" % (self.appId))
+		self.drainProcess(self.previous[0], now)
+		self.previous = None
+
+	"""
+	Terminate the new process and keep the previous one
+	"""
+	def rollback(self, now):
+		if not self.previous:
+			raise Exception("Application '%s' is not being restarted" % (self.appId))
+		self.drainProcess(self.process, now)
+		self.process, self.logStderr, self.timeStart = self.previous
+		self.previous = None
+
+	def stop(self, now, connection=None):
+		if not self.stopping:
+			self.killedPidList = []
+		self.stopping = True
+		self.spawnTime = None
+		if connection:
+			self.waitingList.append(connection)
+		if self.previous:
+			self.drain(now)
+		if self.process:
+			self.terminate(now)
+		elif not self.draining:
+			self.finish()
+
+	def restartApp(self, now):
+		self.restarting = True
+		if self.process:
+			self.terminate(now)
+
+	def abort(self, message):
+		self.error = message
+		if self.logStderr:
+			self.logStderr.add("%s\n" % (message))
+		self.finish()
+
+	def finish(self):
+		self.done = True
+		for entry in self.draining:
+			self.killedPidList += Supervised.killAll(entry["killPidList"], entry["pgid"])
+		if self.logStderr:
+			self.logStderr.close()
+		for server in self.listenList:
+			server.close()
+		self.stats.close()
+		for connection in self.waitingList:
+			self.supervisor.reply(connection, {"supervisor": os.getpid(), "pid": None, "stopped": True, "killed": self.killedPidList})
+		self.waitingList = []
+
+"""
+Event loop hosting the supervised applications and serving their control sockets.
+A supervisor either hosts a single application, or is shared by all the applications of a log directory,
+in which case it also serves a socket to start new applications, and exits once all are stopped.
+"""
+class Supervisor:
+	def __init__(self, logDir, shared=False):
+		self.logDir = logDir
+		self.shared = shared
+		self.statsIntervalS = float(os.environ.get("IRAPP_STATS_INTERVAL", 10))
+		# Options of the log factories, not passed to the applications
+		self.logOptions = json.loads(os.environ.pop("IRAPP_LOG", "{}"))
+		# Pipes cannot be selected on Windows
+		self.hasSelect = (sys.platform != "win32")
+		self.apps = {}
+		# Callbacks of the readable file descriptors
+		self.readers = {}
+		# Control sockets, format: { appId: socket }, None being the one of the shared supervisor
+		self.sockets = {}
+
+	def register(self, fd, callback):
+		self.readers[fd] = callback
+
+	def unregister(self, fd):
+		self.readers.pop(fd, None)
+
+	def listen(self, appId):
+		if not Daemon.hasControl():
+			return
+		controlPath = Daemon.getControlPath(self.logDir, appId)
+		lib.mkdir(os.path.dirname(controlPath))
+		if os.path.exists(controlPath):
+			os.remove(controlPath)
+		server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		server.bind(controlPath)
+		server.listen(8)
+		self.sockets[appId] = server
+		self.register(server.fileno(), lambda fd: self.accept(appId))
+
+	def unlisten(self, appId):
+		server = self.sockets.pop(appId, None)
+		if server:
+			self.unregister(server.fileno())
+			server.close()
+			controlPath = Daemon.getControlPath(self.logDir, appId)
+			if os.path.exists(controlPath):
+				os.remove(controlPath)
+
+	def add(self, appId, commandList, cwd=None, env=None, listen=[], stopTimeoutS=None):
+		app = Supervised(self, appId, commandList, cwd=cwd, env=env, runningPidList=[] if self.shared else Daemon.getRunningProcesses(appId).keys(), listen=listen,
+				stopTimeoutS=10 if stopTimeoutS is None else float(stopTimeoutS))
+		self.apps[appId] = app
+		self.listen(appId)
+		app.tick(timeit.default_timer())
+		return app
+
+	def reply(self, connection, reply):
+		try:
+			connection.sendall((json.dumps(reply) + "\n").encode("utf-8"))
+		except socket.error:
+			pass
+		connection.close()
+
+	"""
+	Serve a request received on a control socket
+	"""
+	def accept(self, appId):
+		connection, address = self.sockets[appId].accept()
+		try:
+			connection.settimeout(1)
+			data = b""
+			while not data.endswith(b"\n"):
+				chunk = connection.recv(4096)
+				if not chunk:
+					break
+				data += chunk
+			reply = self.request(appId, json.loads(data.decode("utf-8")), connection)
+		except Exception as e:
+			reply = {"error": str(e)}
+		if reply is not None:
+			self.reply(connection, reply)
+
+	"""
+	Process a request, returns None if the reply is deferred.
+	"""
+	def request(self, appId, request, connection):
+		now = timeit.default_timer()
+		command = request["command"]
+		if appId is None:
+			if command == "start":
+				if request["id"] in self.apps:
+					raise Exception("Application '%s' is already running" % (request["id"]))
+				app = self.add(request["id"], request["commandList"], cwd=request.get("cwd"), env=request.get("env"), listen=request.get("listen", []), stopTimeoutS=request.get("stopTimeout"))
+				if app.error:
+					self.remove(app.appId)
+					raise Exception(app.error)
+				return {"supervisor": os.getpid(), "pid": app.pid}
+			elif command == "list":
+				return {"supervisor": os.getpid(), "apps": list(self.apps.keys())}
+		else:
+			app = self.apps[appId]
+			if command == "status":
+				return app.status()
+			elif command == "stop":
+				app.stop(now, connection)
+				return None
+			elif command == "restart":
+				app.restartApp(now)
+				return {"supervisor": os.getpid(), "pid": app.pid, "restarting": True}
+			elif command == "spawn":
+				app.spawnNext(now)
+				return {"supervisor": os.getpid(), "pid": app.pid}
+			elif command in ["drain", "rollback"]:
+				getattr(app, command)(now)
+				return {"supervisor": os.getpid(), "pid": app.pid}
+		raise Exception("Unknown command '%s'" % (command))
+
+	def remove(self, appId):
+		self.unlisten(appId)
+		del self.apps[appId]
+
+	"""
+	Run until all the applications are stopped.
+	Returns the errors of the applications that have been aborted.
+	"""
+	def run(self):
+		errorList = []
+		idleTime = timeit.default_timer() + 10
+		try:
+			while True:
+				now = timeit.default_timer()
+				nextTime = now + 1
+				for appId, app in list(self.apps.items()):
+					if not app.done:
+						nextTime = min(nextTime, app.tick(now))
+					if app.done:
+						if app.error:
+							errorList.append("%s: %s" % (appId, app.error))
+						self.remove(appId)
+						idleTime = now
+				# A shared supervisor waits a bit for new applications before exiting
+				if not self.apps and (not self.shared or now >= idleTime):
+					break
+
+				timeoutS = max(0, min(nextTime, idleTime if not self.apps else nextTime) - now)
+				if self.readers:
+					for fd in select.select(list(self.readers.keys()), [], [], timeoutS)[0]:
+						if fd in self.readers:
+							self.readers[fd](fd)
+				else:
+					time.sleep(timeoutS)
+		finally:
+			for appId in list(self.sockets.keys()):
+				self.unlisten(appId)
+		return errorList
+
+"""
+Entry point fo the script
+"""
+if __name__ == "__main__":
+
+	if sys.platform != "win32":
+		# Ignore signal SIGHUP to act like nohup/screen (on unix machine)
+		signal.signal(signal.SIGHUP, signal.SIG_IGN)
 
-			restartCounter += 1
-	except BaseException as e:
-		if logStderr:
-			logStderr.add(str(e))
-		raise e
+	# Shared supervisor, applications are added through its control socket
+	if sys.argv[1] == "--shared":
+		supervisor = Supervisor(sys.argv[2], shared=True)
+		# Another one might have been started concurrently
+		if Daemon.control(supervisor.logDir, None, "list"):
+			sys.exit(0)
+		supervisor.listen(None)
+	else:
+		supervisor = Supervisor(sys.argv[2])
+		supervisor.add(sys.argv[1], sys.argv[3:], listen=json.loads(os.environ.pop("IRAPP_LISTEN", "[]")), stopTimeoutS=os.environ.pop("IRAPP_STOP_TIMEOUT", None))
 
+	errorList = supervisor.run()
+	if errorList:
+		sys.stderr.write("%s\n" % ("\n".join(errorList)))
+		sys.exit(1)
 	sys.exit(0)
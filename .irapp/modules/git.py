@@ -11,6 +11,10 @@ class Git(lib.Module):
 		# Test the existence of a file or directory. This is important to also support gitmodules.
 		return os.path.exists(lib.path(config["root"], ".git"))
 
+	@staticmethod
+	def checkPaths():
+		return [".git"]
+
 	# ---- gitignore rules ----------------------------------------------------
 
 	@staticmethod
@@ -81,6 +81,9 @@ class Jenkins(lib.Module):
 					"lint": False,
 					"junit": False,
 					"tests": [],
+					# Number of shards of the tests supporting it, their reports are merged once completed
+					"shards": 4,
+					"merges": [],
 					"configs": {},
 					# Links to be added
 					"links": {},
@@ -106,18 +109,19 @@ class Jenkins(lib.Module):
 					for moduleId, buildConfig in updatedOptions["configs"].items():
 						self.config["pimpl"][moduleId].setDefaultBuildType(buildConfig, save=False)
 
-					# Update the tests
+					# Update the tests, the ones running under valgrind are not sharded as it does not follow the shard command
+					nbShards = 1 if updatedOptions["memleaks"] else updatedOptions["shards"]
 					for typeIds, testList in self.config["tests"].items():
 						for path in testList:
-							for name in ["junit", "test", "run"]:
-								execTest = lib.getCommand(self.config, name, "%s.%s" % (platform, typeIds), {
-										"report": "%s.%s_%i_%s.report" % (platform, buildName, lib.uniqueId(), name),
-										"path": path})
-								if execTest:
-									if name == "junit":
-										updatedOptions["junit"] = True
-									updatedOptions["tests"].append(execTest)
-									break
+							reportPath = "%s.%s_%i_junit.report" % (platform, buildName, lib.uniqueId())
+							name, execTestList, shardReportList = lib.getTestCommands(self.config, "%s.%s" % (platform, typeIds), ["junit", "test", "run"], {
+									"report": reportPath,
+									"path": path}, nbShards=nbShards)
+							if name in ["junit", "shard"]:
+								updatedOptions["junit"] = True
+							if shardReportList:
+								updatedOptions["merges"].append("./app.py junit -n %s -o %s %s" % (path, reportPath, " ".join(shardReportList)))
+							updatedOptions["tests"].extend(execTestList)
 
 				configs[platform]["builds"][buildName] = updatedOptions
 
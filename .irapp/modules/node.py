@@ -12,6 +12,10 @@ class Node(lib.Module):
 	def check(config):
 		return os.path.isfile(lib.path(config["root"], "package.json"))
 
+	@staticmethod
+	def checkPaths():
+		return ["package.json"]
+
 	@staticmethod
 	def config():
 		return {
@@ -117,7 +121,7 @@ class Node(lib.Module):
 		nodeModulesPath = lib.path(self.config["root"], "node_modules")
 		if os.path.isdir(nodeModulesPath):
 			lib.info("Removing '%s'" % (nodeModulesPath))
-			lib.rmtree(nodeModulesPath)
+			lib.trash(nodeModulesPath)
 		lib.info("Importing dependencies...")
 		lib.shell(["npm", "install"], cwd=self.config["root"])
 
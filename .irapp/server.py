@@ -0,0 +1,246 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+import sys
+import os
+import socket
+import threading
+import collections
+import email.utils
+import shutil
+try:
+	from http.server import HTTPServer, SimpleHTTPRequestHandler
+	from socketserver import ThreadingMixIn
+	from urllib.parse import urlsplit
+except ImportError:
+	from BaseHTTPServer import HTTPServer
+	from SimpleHTTPServer import SimpleHTTPRequestHandler
+	from SocketServer import ThreadingMixIn
+	from urlparse import urlsplit
+
+"""
+Bounded in-memory cache of the content of small files, the least recently used are evicted first.
+Entries are keyed by path and validated against the modification time and size of the file.
+"""
+class FileCache:
+	def __init__(self, maxSizeBytes=32 * 1024 * 1024, maxFileSizeBytes=64 * 1024):
+		self.maxSizeBytes = maxSizeBytes
+		self.maxFileSizeBytes = maxFileSizeBytes
+		self.sizeBytes = 0
+		self.entries = collections.OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, path, fileStat, f):
+		if fileStat.st_size > self.maxFileSizeBytes:
+			return None
+		key = (fileStat.st_mtime, fileStat.st_size)
+		with self.lock:
+			entry = self.entries.pop(path, None)
+			if entry:
+				if entry[0] == key:
+					self.entries[path] = entry
+					return entry[1]
+				self.sizeBytes -= len(entry[1])
+		content = f.read()
+		with self.lock:
+			if path not in self.entries:
+				self.entries[path] = (key, content)
+				self.sizeBytes += len(content)
+				while self.sizeBytes > self.maxSizeBytes:
+					self.sizeBytes -= len(self.entries.popitem(last=False)[1][1])
+		return content
+
+"""
+Serve the files of the current directory, supporting conditional and range requests.
+Precompressed siblings (<file>.gz) are served to the clients accepting gzip.
+"""
+class StaticHandler(SimpleHTTPRequestHandler):
+	# Keep the connections alive, browsers open a few and reuse them for all the assets
+	protocol_version = "HTTP/1.1"
+	cache = FileCache()
+	# Headers and small bodies are sent in one go
+	wbufsize = -1
+
+	def do_GET(self):
+		self.serve(True)
+
+	def do_HEAD(self):
+		self.serve(False)
+
+	def serve(self, withBody):
+		path = self.translate_path(self.path)
+		if os.path.isdir(path):
+			if not urlsplit(self.path).path.endswith("/"):
+				parts = urlsplit(self.path)
+				self.send_response(301)
+				self.send_header("Location", parts.path + "/" + (("?" + parts.query) if parts.query else ""))
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+				return
+			if not os.path.isfile(os.path.join(path, "index.html")):
+				f = self.list_directory(path)
+				if f:
+					try:
+						if withBody:
+							shutil.copyfileobj(f, self.wfile)
+					finally:
+						f.close()
+				return
+			path = os.path.join(path, "index.html")
+
+		if not os.path.isfile(path):
+			self.send_error(404, "File not found")
+			return
+
+		contentType = self.guess_type(path)
+		encoding = None
+		precompressed = os.path.isfile(path + ".gz")
+		if precompressed and "gzip" in self.headers.get("Accept-Encoding", ""):
+			if os.stat(path + ".gz").st_mtime >= os.stat(path).st_mtime:
+				path += ".gz"
+				encoding = "gzip"
+
+		try:
+			f = open(path, "rb")
+		except IOError:
+			self.send_error(404, "File not found")
+			return
+		try:
+			fileStat = os.fstat(f.fileno())
+			etag = "\"%x-%x%s\"" % (int(fileStat.st_mtime * 1000000), fileStat.st_size, "-gz" if encoding else "")
+			lastModified = email.utils.formatdate(fileStat.st_mtime, usegmt=True)
+
+			if self.isNotModified(etag, fileStat.st_mtime):
+				self.send_response(304)
+				self.sendCommonHeaders(etag, lastModified, encoding, precompressed)
+				self.end_headers()
+				return
+
+			start, end = 0, fileStat.st_size
+			byteRange = self.getRange(etag, fileStat.st_size)
+			if byteRange is False:
+				self.send_response(416)
+				self.send_header("Content-Range", "bytes */%i" % (fileStat.st_size))
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+				return
+			if byteRange:
+				start, end = byteRange
+				self.send_response(206)
+				self.send_header("Content-Range", "bytes %i-%i/%i" % (start, end - 1, fileStat.st_size))
+			else:
+				self.send_response(200)
+			self.send_header("Content-Type", contentType)
+			self.send_header("Content-Length", str(end - start))
+			self.send_header("Accept-Ranges", "bytes")
+			self.sendCommonHeaders(etag, lastModified, encoding, precompressed)
+			self.end_headers()
+
+			if withBody:
+				content = StaticHandler.cache.get(path, fileStat, f)
+				if content is not None:
+					self.wfile.write(content[start:end])
+				else:
+					self.sendFile(f, start, end)
+		finally:
+			f.close()
+
+	def sendCommonHeaders(self, etag, lastModified, encoding, precompressed):
+		self.send_header("ETag", etag)
+		self.send_header("Last-Modified", lastModified)
+		self.send_header("Cache-Control", "no-cache")
+		if encoding:
+			self.send_header("Content-Encoding", encoding)
+		if precompressed:
+			self.send_header("Vary", "Accept-Encoding")
+
+	"""
+	Tells if the client already has this version of the file
+	"""
+	def isNotModified(self, etag, mtime):
+		ifNoneMatch = self.headers.get("If-None-Match")
+		if ifNoneMatch:
+			return etag in [tag.strip() for tag in ifNoneMatch.split(",")] or ifNoneMatch.strip() == "*"
+		ifModifiedSince = self.headers.get("If-Modified-Since")
+		if ifModifiedSince:
+			since = email.utils.parsedate_tz(ifModifiedSince)
+			return since is not None and int(mtime) <= email.utils.mktime_tz(since)
+		return False
+
+	"""
+	Return the requested range as (start, end), None for the whole content or False if not satisfiable.
+	Only single ranges are supported, the whole content is returned for the others.
+	"""
+	def getRange(self, etag, size):
+		rangeHeader = self.headers.get("Range", "")
+		if not rangeHeader.startswith("bytes=") or "," in rangeHeader:
+			return None
+		ifRange = self.headers.get("If-Range")
+		if ifRange and ifRange != etag:
+			return None
+		try:
+			first, last = rangeHeader[6:].strip().split("-", 1)
+			if first:
+				start = int(first)
+				end = min(int(last) + 1, size) if last else size
+			else:
+				start = max(size - int(last), 0)
+				end = size
+		except ValueError:
+			return None
+		if start >= end:
+			return False
+		return (start, end)
+
+	"""
+	Send a portion of a file, directly from the kernel if supported
+	"""
+	def sendFile(self, f, start, end):
+		self.wfile.flush()
+		if hasattr(os, "sendfile"):
+			offset = start
+			while offset < end:
+				sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, end - offset)
+				if not sent:
+					break
+				offset += sent
+		else:
+			f.seek(start)
+			remaining = end - start
+			while remaining > 0:
+				data = f.read(min(remaining, 64 * 1024))
+				if not data:
+					break
+				self.wfile.write(data)
+				remaining -= len(data)
+
+class StaticServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+	request_queue_size = 128
+
+	def __init__(self, port=8000, host=""):
+		# Use the listening socket passed by the supervisor if any (LISTEN_FDS protocol)
+		if os.environ.get("LISTEN_FDS") and os.environ.get("LISTEN_PID") == str(os.getpid()):
+			HTTPServer.__init__(self, (host, port), StaticHandler, bind_and_activate=False)
+			self.socket.close()
+			if sys.version_info >= (3, 7):
+				self.socket = socket.socket(fileno=3)
+			else:
+				self.socket = socket.fromfd(3, socket.AF_INET, socket.SOCK_STREAM)
+				os.close(3)
+			self.server_address = self.socket.getsockname()
+		else:
+			HTTPServer.__init__(self, (host, port), StaticHandler)
+
+"""
+Entry point fo the script
+"""
+if __name__ == "__main__":
+	port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+	if len(sys.argv) > 2:
+		os.chdir(sys.argv[2])
+	server = StaticServer(port)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.server_close()
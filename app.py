@@ -19,6 +19,9 @@ import time
 import multiprocessing
 import errno
 import stat
+import hashlib
+import tarfile
+import uuid
 try:
 	from queue import Queue
 except:
@@ -36,13 +39,25 @@ TEMP_DIRECTORY_PATH = os.path.join(EXECUTABLE_DIRECTORY_PATH, ".irapp", "tmp")
 ASSETS_DIRECTORY_PATH = os.path.join(EXECUTABLE_DIRECTORY_PATH, ".irapp", "assets")
 ARTIFACTS_DIRECTORY_PATH = os.path.join(EXECUTABLE_DIRECTORY_PATH, ".irapp", "artifacts")
 LOG_DIRECTORY_PATH = os.path.join(EXECUTABLE_DIRECTORY_PATH, ".irapp", "log")
+TRASH_DIRECTORY_PATH = os.path.join(EXECUTABLE_DIRECTORY_PATH, ".irapp", "trash")
+# Paths of the dependencies preserved by the updates
+DEPENDENCIES_KEEP_PATH_LIST = [TEMP_DIRECTORY_PATH, LOG_DIRECTORY_PATH, TRASH_DIRECTORY_PATH, os.path.join(DEPENDENCIES_PATH, ".hash")]
 DEFAULT_CONFIG_FILE = ".irapp.json"
+# Cache shared by all the checkouts of this machine
+CACHE_DIRECTORY_PATH = os.environ.get("IRAPP_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "irapp"))
 
 """
 Load the necessary dependencies
 """
 def loadDependencies():
 	try:
+		# Complete an update that was interrupted while replacing the dependencies
+		completeStage(DEPENDENCIES_PATH, DEPENDENCIES_KEEP_PATH_LIST)
+		# Restore the dependencies from the shared store if they are incomplete
+		gitHash = getCurrentHash()
+		if gitHash and not os.path.isfile(os.path.join(DEPENDENCIES_PATH, "__init__.py")) and os.path.isdir(getStorePath(gitHash)):
+			lib.warning("Restoring tool dependencies from the shared store '%s'" % (getStorePath(gitHash)))
+			installTree(os.path.join(getStorePath(gitHash), ".irapp"), DEPENDENCIES_PATH, link=True)
 		if not os.path.isdir(DEPENDENCIES_PATH):
 			raise Exception("Missing tool dependencies at %s" % (DEPENDENCIES_PATH))
 		irapp = imp.load_module("irapp", None, DEPENDENCIES_PATH, ('', '', imp.PKG_DIRECTORY))
@@ -57,13 +72,64 @@ def loadDependencies():
 	return irapp.loadModules(), irapp.getTypeList(), irapp.lib
 
 """
-Read the configruation file and create it if it does not exists.
+Build the key identifying a resolved configuration. If any of its values changes,
+the cached configuration is not valid anymore.
 """
-def readConfig(args, verbose=True, dispatch=False, forceDispatchResults=False, forceDispatchSequential=False):
-	global lib
+def getConfigCacheKey(args, configStr, modules):
+	# Source files of the tool, in case it is modified without updating its hash
+	sourceList = [os.path.join(DEPENDENCIES_PATH, "lib.py")] + [sys.modules[moduleClass.__module__].__file__ for moduleClass in modules.values()]
+	return {
+		"root": os.path.realpath(args.rootPath),
+		"config": hashlib.sha1(configStr.encode("utf-8")).hexdigest() if configStr is not None else None,
+		"hash": getCurrentHash(),
+		"sources": [os.path.getmtime(path) for path in sorted(sourceList) if os.path.isfile(path)],
+		"checks": {moduleId: [os.path.exists(os.path.join(args.rootPath, path)) for path in moduleClass.checkPaths()] for moduleId, moduleClass in modules.items()},
+		"parallelism": multiprocessing.cpu_count()
+	}
 
-	# Read the dependencies
-	modules, types, lib = loadDependencies()
+"""
+Return the path of the resolved configuration cache associated with this root and configuration file.
+Note, it is located in the default artifacts directory as the one set by the configuration is not yet known.
+"""
+def getConfigCachePath(args):
+	name = hashlib.sha1(("%s:%s" % (os.path.realpath(args.rootPath), args.configPath)).encode("utf-8")).hexdigest()[:16]
+	return os.path.join(ARTIFACTS_DIRECTORY_PATH, ".config.%s.json" % (name))
+
+"""
+Read the cached resolved configuration, returns None if it does not exists or is outdated.
+"""
+def readConfigCache(cachePath, cacheKey):
+	try:
+		with open(cachePath, "r") as f:
+			cache = json.load(f)
+		if cache["key"] == cacheKey:
+			return cache["config"]
+	except:
+		pass
+	return None
+
+"""
+Save the resolved configuration. The file is first written and then moved, to ensure
+concurrent dispatched processes do not read partial content.
+"""
+def writeConfigCache(cachePath, cacheKey, config):
+	tempPath = "%s.%i" % (cachePath, os.getpid())
+	try:
+		if not os.path.isdir(os.path.dirname(cachePath)):
+			os.makedirs(os.path.dirname(cachePath))
+		with open(tempPath, "w") as f:
+			json.dump({"key": cacheKey, "config": {key: value for key, value in config.items() if key != "ignoreMatcher"}}, f)
+		if os.path.exists(cachePath):
+			os.remove(cachePath)
+		os.rename(tempPath, cachePath)
+	except Exception as e:
+		lib.warning("Could not cache the configuration to '%s': %s" % (cachePath, e))
+
+"""
+Resolve the configuration from the default values, the configuration file and the modules.
+The returned configuration only contains serializable values, so that it can be cached.
+"""
+def resolveConfig(args, configStr, modules, types):
 
 	# The following configuration keys can be overridden by the configuration file
 	config = {
@@ -107,6 +173,60 @@ def readConfig(args, verbose=True, dispatch=False, forceDispatchResults=False, f
 		"ignore": []
 	}
 
+	# Parse the configuration
+	if configStr is not None:
+		try:
+			configUser = json.loads(configStr)
+			lib.configSanityCheck(configUser, user=True, modules=modules)
+			config.update(configUser)
+		except Exception as e:
+			lib.configPrintHelp(user=True, modules=modules)
+			lib.fatal("Could not parse configuration file '%s'; %s" % (str(args.configPath), str(e)))
+
+	# Add parameters that are not meant to be modified
+	config.update({
+		# Value is either: "linux", "windows" or "macos"
+		"platform": "windows" if sys.platform == "win32" or sys.platform == "cygwin" else ("linux" if sys.platform.startswith("linux") else "macos"),
+		"root": os.path.realpath(args.rootPath)
+	})
+
+	# Resolve all path and make them absolute
+	for key in ["assets", "log", "artifacts"]:
+		config[key] = lib.path(config["root"], config[key])
+
+	# Map and remove unsupported modules
+	typeList = []
+	for moduleId in types:
+		moduleClass = modules[moduleId]
+		# Add module only if it checks correctly
+		if moduleId in config["types"] or moduleClass.check(config):
+			typeList.append(moduleId)
+			# The values set by the user for this module take precedence over its defaults
+			config[moduleId] = lib.deepMerge(moduleClass.config(), config.get(moduleId, {}))
+			# Merge specific items with the global configuration if present
+			for key in ["templates"]:
+				if key in config[moduleId]:
+					config[key] = lib.deepMerge(config[key], config[moduleId][key])
+	config["types"] = typeList
+
+	# Remove the ignored keys
+	ignoreMatcher = lib.IgnoreMatcher(config["ignore"])
+	ignoreMatcher.apply(config)
+	config["ignoreMatcher"] = ignoreMatcher
+
+	return config
+
+"""
+Read the configruation file and create it if it does not exists.
+@param useCache Use the cached resolved configuration if still valid. If not set, the configuration
+                is resolved from scratch and the cache updated.
+"""
+def readConfig(args, verbose=True, dispatch=False, forceDispatchResults=False, forceDispatchSequential=False, useCache=True):
+	global lib
+
+	# Read the dependencies
+	modules, types, lib = loadDependencies()
+
 	# Add logging prefix
 	if args.dispatch:
 		lib.logPrefix = args.dispatch
@@ -115,85 +235,60 @@ def readConfig(args, verbose=True, dispatch=False, forceDispatchResults=False, f
 		lib.fatal("Root path (%s) is not a valid directory" % (args.rootPath))
 
 	# Read the configuration
+	configStr = None
 	try:
-		f = open(os.path.join(args.rootPath, args.configPath), "r")
-		with f:
-			try:
-				configUser = json.load(f)
-				lib.configSanityCheck(configUser, user=True, modules=modules)
-				config.update(configUser)
-			except Exception as e:
-				lib.configPrintHelp(user=True, modules=modules)
-				lib.fatal("Could not parse configuration file '%s'; %s" % (str(args.configPath), str(e)))
+		with open(os.path.join(args.rootPath, args.configPath), "r") as f:
+			configStr = f.read()
 	except IOError:
 		if verbose:
 			lib.warning("Could not open configuration file '%s', using default" % (str(args.configPath)))
 
-	# Add parameters that are not meant to be modified
+	# Use the resolved configuration from the cache if still valid, this skips the validation
+	# and the module probing.
+	cacheKey = getConfigCacheKey(args, configStr, modules)
+	cachePath = getConfigCachePath(args)
+	config = readConfigCache(cachePath, cacheKey) if useCache else None
+	if config is None:
+		config = resolveConfig(args, configStr, modules, types)
+		writeConfigCache(cachePath, cacheKey, config)
+	else:
+		config["ignoreMatcher"] = lib.IgnoreMatcher(config.get("ignore", []))
+
+	# Add parameters that are not meant to be cached
 	config.update({
-		# Value is either: "linux", "windows" or "macos"
-		"platform": "windows" if sys.platform == "win32" or sys.platform == "cygwin" else ("linux" if sys.platform.startswith("linux") else "macos"),
 		"lib": lib,
-		"root": os.path.realpath(args.rootPath),
 		"pimpl": {},
 		"caller": True if not args.dispatch else False,
 		"dispatched": True if args.dispatch or len(config["dispatch"]) else False,
 		"dispatchResults": {}
 	})
 
-	# Resolve all path and make them absolute, plus create the directories if it does not exists
+	# Create the directories if it does not exists
 	for key in ["assets", "log", "artifacts"]:
-		config[key] = lib.path(config["root"], config[key])
 		if not os.path.exists(config[key]):
 			lib.mkdir(config[key])
 
-	# Map and remove unsupported modules
-	typeList = []
-	for moduleId in types:
-		moduleClass = modules[moduleId]
-		# Add module only if it checks correctly
-		if moduleId in config["types"] or moduleClass.check(config):
-			typeList.append(moduleId)
-			config["pimpl"][moduleId] = moduleClass
-			config[moduleId] = moduleClass.config()
-			# Merge specific items with the global configuration if present
-			for key in ["templates"]:
-				if key in config[moduleId]:
-					config[key] = lib.deepMerge(config[key], config[moduleId][key])
-	config["types"] = typeList
+	# Reclaim what is left in the trash by previous runs
+	lib.reclaimTrash()
+
+	# Share the concurrency budget of the machine with all the processes started from the top-level one.
+	# It is only created by the commands fanning out work, an explicit number of jobs can exceed the number of cores.
+	if not lib.jobserver:
+		lib.jobserver = lib.Jobserver.fromEnvironment(hasImplicitSlot=config["caller"])
+		if not lib.jobserver and config["caller"] and args.command in ["build", "test", "run"]:
+			lib.mkdir(TEMP_DIRECTORY_PATH)
+			nbJobs = max(getattr(args, "nbJobs", 0), config["parallelism"])
+			lib.jobserver = lib.Jobserver.create(os.path.join(TEMP_DIRECTORY_PATH, "jobserver.%i" % (os.getpid())), nbJobs)
 
 	# Initialize the module instances
-	for moduleId, moduleClass in config["pimpl"].items():
-		config["pimpl"][moduleId] = moduleClass(config)
+	for moduleId in config["types"]:
+		config["pimpl"][moduleId] = modules[moduleId](config)
 		# Add some specific keys
-		config[moduleId].update({
+		config.setdefault(moduleId, {}).update({
 			"buildType": config["pimpl"][moduleId].getDefaultBuildType,
 			"build": config["pimpl"][moduleId].getDefaultBuild
 		})
 
-	# Generate the ignore dictionaries
-	config["ignoreDict"] = {}
-	for ignore in config["ignore"]:
-		keyList = ignore.split(".")
-		node = lastNode = config["ignoreDict"]
-		for key in keyList:
-			lastNode = node
-			node = lastNode.setdefault(key, {})
-			if node == True:
-				break
-		lastNode[key] = True
-
-	# Have a specific path per module (specific to this module)
-	# ex: git.[...]
-	def applyIgnore(ignoreDict, config):
-		for keyPattern in ignoreDict:
-			for configKey in [key for key in config.keys() if re.match(keyPattern.replace("*", ".*"), key)]:
-				if ignoreDict[keyPattern] == True:
-					del config[configKey]
-				else:
-					applyIgnore(ignoreDict[keyPattern], config[configKey])
-	applyIgnore(config["ignoreDict"], config)
-
 	# If some commands need to be dispatched, do it now
 	if dispatch and len(config["dispatch"]):
 		dispatchCommand(config, args, forceDispatchResults, forceDispatchSequential)
@@ -202,6 +297,17 @@ def readConfig(args, verbose=True, dispatch=False, forceDispatchResults=False, f
 		lib.info("Modules identified: %s" % (", ".join(config["types"])))
 	return config
 
+"""
+Lend the jobserver slot of this process while waiting for a dispatched one
+"""
+def lendJobserver():
+	class NoLend:
+		def __enter__(self):
+			pass
+		def __exit__(self, *args):
+			pass
+	return lib.jobserver.lend() if lib.jobserver else NoLend()
+
 """
 Dispatch commands to nested modules if needed
 """
@@ -225,14 +331,16 @@ def dispatchCommand(config, args, forceDispatchResults, forceDispatchSequential)
 	for index, rootPath in enumerate(config["dispatch"]):
 		shellCommand = [sys.executable, __file__, "--root", rootPath, "--dispatch", "%s[%i] " % (args.dispatch if args.dispatch else "", index + 1)] + extraArgs
 		if fetchJsonOutput:
-			outputRaw = lib.shell(shellCommand, capture=True)
+			with lendJobserver():
+				outputRaw = lib.shell(shellCommand, capture=True)
 			try:
 				output = json.loads(" ".join(outputRaw))
 				config["dispatchResults"][rootPath] = output
 			except:
 				lib.fatal("Unable to read JSON: %s" % (" ".join(outputRaw)))
 		elif forceDispatchSequential:
-			lib.shell(shellCommand)
+			with lendJobserver():
+				lib.shell(shellCommand)
 		else:
 			# Run the command in parallel
 			lib.shell(shellCommand, blocking=False)
@@ -243,15 +351,15 @@ def dispatchCommand(config, args, forceDispatchResults, forceDispatchSequential)
 Entry point for all action mapped to the supported and enabled modules.
 """
 def action(args):
-	# Read the configuration
-	config = readConfig(args, dispatch=True)
+	# Read the configuration, do not rely on the cache when initializing as the environment might have changed
+	config = readConfig(args, dispatch=True, useCache=(args.command != "init"))
 
 	lib.info("Running command '%s' in '%s'" % (str(args.command), str(config["root"])))
 	if args.command == "init":
 		# Clean up some directory
 		for cleanup in ["assets", "artifacts"]:
 			if os.path.isdir(config[cleanup]):
-				lib.rmtree(config[cleanup])
+				lib.trash(config[cleanup])
 				lib.mkdir(config[cleanup])
 		for moduleId in config["types"]:
 			config["pimpl"][moduleId].init()
@@ -294,7 +402,7 @@ Application/command related actions
 """
 def commands(args):
 	# Read the configuration
-	config = readConfig(args, dispatch=True, forceDispatchSequential=(args.command in ["stop"]))
+	config = readConfig(args, dispatch=True, forceDispatchSequential=(args.command in ["stop", "restart"]))
 
 	idList = args.idList
 	lib.info("Executing '%s' on %s" % (args.command, ", ".join(idList)))
@@ -312,13 +420,8 @@ def commands(args):
 			if not config["dispatched"] and commandId != "all" and commandId not in commandsDescs:
 				lib.fatal("Unknown command preset '%s'" % (commandId))
 
-		# Build the list
-		if "all" not in idList:
-			commandsDescs = {commandId: commandsDescs[commandId] for commandId in idList if commandId in commandsDescs}
-
-		for commandId, commandList in commandsDescs.items():
-			lib.info("Starting command preset '%s'" % (commandId))
-			lib.start(config, commandList)
+		# Start the presets and the ones they depend on
+		lib.start(config, commandsDescs, None if "all" in idList else [commandId for commandId in idList if commandId in commandsDescs])
 
 	elif args.command == "stop":
 
@@ -326,6 +429,99 @@ def commands(args):
 			for appId in idList:
 				config["pimpl"][moduleId].stop(None if appId == "all" else appId)
 
+	elif args.command == "restart":
+
+		for moduleId in config["types"]:
+			for appId in idList:
+				config["pimpl"][moduleId].restart(None if appId == "all" else appId)
+
+"""
+This function prints a formated table
+"""
+def printTable(headerList, rowList, indent=0):
+	# Calculate teh cell lengths
+	cells = {header["key"]: [len(header["name"]), False] for header in headerList}
+	for build in rowList:
+		for header in headerList:
+			if header["key"] in build:
+				build[header["key"]] = str(header["formater"](build[header["key"]])) if "formater" in header else str(build[header["key"]])
+				if build[header["key"]] != "":
+					cells[header["key"]] = [max(cells[header["key"]][0], len(build[header["key"]])), True]
+	# Print the header
+	lib.info("%*s%s" % (indent, "", " ".join(["%-*s " % (cells[header["key"]][0], header["name"]) for header in headerList if cells[header["key"]][1]])))
+	# Print the table
+	for build in rowList:
+		lib.info("%*s%s" % (indent, "", " ".join(["%-*s " % (cells[header["key"]][0], str(build[header["key"]]) if header["key"] in build else "") for header in headerList if cells[header["key"]][1]])))
+
+"""
+Group the instances of the replicated applications, preceded by a row with their total resources
+"""
+def groupInstances(statusList):
+	rowList = []
+	for status in statusList:
+		if "app" not in status:
+			rowList.append(status)
+		elif not any(row.get("instances") and row["id"] == status["app"] for row in rowList):
+			instanceList = sorted([curStatus for curStatus in statusList if curStatus.get("app") == status["app"]], key=lambda curStatus: curStatus["instance"])
+			rowList.append({
+				"id": status["app"],
+				"type": status["type"],
+				"instances": len(instanceList),
+				"pid": "%i instances" % (len(instanceList)),
+				"cpu": round(sum([curStatus["cpu"] for curStatus in instanceList]), 1),
+				"memory": sum([curStatus["memory"] for curStatus in instanceList]),
+				"restart": sum([curStatus.get("restart", 0) for curStatus in instanceList])
+			})
+			rowList += instanceList
+	return rowList
+
+"""
+Special cell formaters
+"""
+def formaterBool(value):
+	return "x" if value else ""
+def formaterMemory(memBytes):
+	if not memBytes and memBytes != 0:
+		return "-"
+	unitIndex = 0
+	unitList = ["B", "kB", "MB", "GB", "TB"]
+	while memBytes > 768:
+		unitIndex += 1
+		memBytes /= 1024
+	return "%.1f%s" % (memBytes, unitList[unitIndex])
+def formaterTime(timeS):
+	if not timeS and timeS != 0:
+		return "-"
+	strList = []
+	for check in [[3600 * 24, " day", " days"], [3600, "h", "h"], [60, "m", "m"], [1, "s", "s"]]:
+		if timeS >= check[0]:
+			unit = int(timeS / check[0])
+			strList.append("%i%s" % (unit, check[1] if unit > 1 else check[2]))
+			timeS -= unit * check[0]
+	return " ".join(strList[:2]) or "0s"
+def formaterPercent(value):
+	return "%.1f" % (value)
+def formaterNumber(value):
+	return "%g" % (round(value, 1))
+
+"""
+Argument type of a point in time, either a duration before now ("90", "30s", "15m", "2h", "1d")
+or a local date ("YYYY-MM-DD", "YYYY-MM-DD HH:MM[:SS]", or "HH:MM[:SS]" for today). Returns a timestamp.
+"""
+def argumentTime(value):
+	match = re.match(r"^(\d+(?:\.\d+)?)([smhd]?)$", value.strip())
+	if match:
+		return time.time() - float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 3600 * 24}[match.group(2)]
+	for dateFormat in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%H:%M:%S", "%H:%M"]:
+		try:
+			date = datetime.datetime.strptime(value.strip(), dateFormat)
+		except ValueError:
+			continue
+		if not dateFormat.startswith("%Y"):
+			date = datetime.datetime.combine(datetime.date.today(), date.time())
+		return time.mktime(date.timetuple())
+	raise argparse.ArgumentTypeError("Invalid time '%s', must be a duration (e.g. 15m) or a date (e.g. '2021-05-30 12:00')" % (value))
+
 """
 Print information regarding the program and loaded modules
 """
@@ -345,49 +541,6 @@ def info(args):
 	printApps = True if printAll or args.apps else False
 	printModules = True if printAll else False
 
-	"""
-	This function prints a formated table
-	"""
-	def printTable(headerList, rowList, indent=0):
-		# Calculate teh cell lengths
-		cells = {header["key"]: [len(header["name"]), False] for header in headerList}
-		for build in rowList:
-			for header in headerList:
-				if header["key"] in build:
-					build[header["key"]] = str(header["formater"](build[header["key"]])) if "formater" in header else str(build[header["key"]])
-					if build[header["key"]] != "":
-						cells[header["key"]] = [max(cells[header["key"]][0], len(build[header["key"]])), True]
-		# Print the header
-		lib.info("%*s%s" % (indent, "", " ".join(["%-*s " % (cells[header["key"]][0], header["name"]) for header in headerList if cells[header["key"]][1]])))
-		# Print the table
-		for build in rowList:
-			lib.info("%*s%s" % (indent, "", " ".join(["%-*s " % (cells[header["key"]][0], str(build[header["key"]]) if header["key"] in build else "") for header in headerList if cells[header["key"]][1]])))
-
-	"""
-	Special cell formaters
-	"""
-	def formaterBool(value):
-		return "x" if value else ""
-	def formaterMemory(memBytes):
-		if not memBytes and memBytes != 0:
-			return "-"
-		unitIndex = 0
-		unitList = ["B", "kB", "MB", "GB", "TB"]
-		while memBytes > 768:
-			unitIndex += 1
-			memBytes /= 1024
-		return "%.1f%s" % (memBytes, unitList[unitIndex])
-	def formaterTime(timeS):
-		if not timeS and timeS != 0:
-			return "-"
-		strList = []
-		for check in [[3600 * 24, " day", " days"], [3600, "h", "h"], [60, "m", "m"], [1, "s", "s"]]:
-			if timeS >= check[0]:
-				unit = int(timeS / check[0])
-				strList.append("%i%s" % (unit, check[1] if unit > 1 else check[2]))
-				timeS -= unit * check[0]
-		return " ".join(strList[:2]) or "0s"
-
 	if printAll:
 		info["hash"] = str(getCurrentHash())
 		if verbose:
@@ -441,6 +594,11 @@ def info(args):
 				if not any(x for x in info["statusList"] if x["pid"] == status["pid"]):
 					info["statusList"].append(status)
 
+		# Add the statistics of the resources used, read from the time series recorded by the supervisors
+		if not verbose:
+			for status in info["statusList"]:
+				status.setdefault("stats", lib.StatsRing.read(lib.LogFactory.getStatsPath(config["log"], status["id"])))
+
 		# Print the status list if any
 		if verbose and len(info["statusList"]):
 			lib.info("Running application(s):")
@@ -452,12 +610,138 @@ def info(args):
 					{"key": "cpu", "name": "CPU %"},
 					{"key": "memory", "name": "Memory", "formater": formaterMemory},
 					{"key": "restart", "name": "Restart"},
-					{"key": "log", "name": "Log"}], info["statusList"], indent=3)
+					{"key": "log", "name": "Log"}], groupInstances(info["statusList"]), indent=3)
 
 	# Print the output in JSON format
 	if not verbose:
 		print(json.dumps(info))
 
+"""
+Print the statistics of the resources used by an application
+"""
+def stats(args):
+
+	verbose = not args.json
+
+	# Read the configuration
+	config = readConfig(args, verbose=False)
+
+	since = (time.time() - args.since) if args.since else None
+	summary = lib.StatsRing.read(lib.LogFactory.getStatsPath(config["log"], args.appId), since=since)
+	if not summary:
+		lib.fatal("No statistics available for '%s'" % (args.appId))
+
+	if not verbose:
+		print(json.dumps(summary))
+		return
+
+	if not summary["samples"]:
+		lib.info("No samples recorded for '%s' over this period" % (args.appId))
+		return
+
+	lib.info("Statistics of '%s' over %s (%i samples)" % (args.appId, formaterTime(summary["end"] - summary["start"]), summary["samples"]))
+	rowList = []
+	for key, name, formater in [["cpu", "CPU %", formaterPercent], ["memory", "Memory", formaterMemory], ["threads", "Threads", formaterNumber], ["fds", "Open files", formaterNumber]]:
+		row = {"name": name}
+		row.update({column: formater(value) for column, value in summary[key].items()})
+		rowList.append(row)
+	printTable([
+			{"key": "name", "name": "Resource"},
+			{"key": "min", "name": "Min"},
+			{"key": "avg", "name": "Avg"},
+			{"key": "p50", "name": "P50"},
+			{"key": "p90", "name": "P90"},
+			{"key": "p99", "name": "P99"},
+			{"key": "max", "name": "Max"}], rowList, indent=3)
+
+"""
+Print the logs of applications and of their instances, in chronological order, and follow them if requested
+"""
+def logs(args):
+
+	# Read the configuration
+	config = readConfig(args, verbose=False)
+
+	if args.follow and args.until is not None:
+		lib.fatal("--until cannot be used with --follow")
+
+	# All the applications if none is specified
+	def isSelected(appId):
+		return not args.appIdList or any(appId == selectedId or re.match(r"^%s@\d+$" % (re.escape(selectedId)), appId) for selectedId in args.appIdList)
+
+	appIdList = sorted([name for name in (os.listdir(config["log"]) if os.path.isdir(config["log"]) else [])
+			if isSelected(name) and os.path.isdir(os.path.join(config["log"], name))])
+	if not appIdList and not (args.follow and os.path.isdir(config["log"])):
+		lib.fatal("No logs available for '%s'" % ("', '".join(args.appIdList) if args.appIdList else "any application"))
+	# Identify the instance of the replicated applications
+	isPrefixed = len(appIdList) > 1 or len(args.appIdList) != 1
+
+	# Created first, so that the lines written while printing the past ones are followed instead
+	follower = lib.LogFollower(config["log"], isSelected, pattern=args.grep, ignoreCase=args.ignoreCase) if args.follow else None
+	search = lib.LogSearch([os.path.join(config["log"], appId) for appId in appIdList], since=args.since, until=args.until, pattern=args.grep, ignoreCase=args.ignoreCase,
+			limits=follower.getPositions() if follower else None)
+	output = getattr(sys.stdout, "buffer", sys.stdout)
+
+	def write(lineList):
+		for pidDirPath, prefix, line in lineList:
+			if isPrefixed or os.path.basename(os.path.dirname(pidDirPath)) not in appIdList:
+				output.write(("%s | " % (os.path.basename(os.path.dirname(pidDirPath)))).encode("utf-8"))
+			output.write(line if line.endswith(b"\n") else line + b"\n")
+		output.flush()
+
+	try:
+		write(search.lines())
+		while follower:
+			write(follower.poll())
+	except IOError as e:
+		# The output has been closed, by head for example
+		if e.errno != errno.EPIPE:
+			raise
+	except KeyboardInterrupt:
+		pass
+	finally:
+		if follower:
+			follower.close()
+
+"""
+Live view of the running applications, refreshed in place
+"""
+def top(args):
+
+	# Read the configuration
+	config = readConfig(args, verbose=False)
+	isTty = sys.stdout.isatty()
+
+	iteration = 0
+	try:
+		while True:
+			# Statuses are sampled incrementally by the modules, the CPU usage is the one since the previous iteration
+			statusList = []
+			for moduleId in config["types"]:
+				statusList += config["pimpl"][moduleId].getStatusList(live=True)
+			statusList.sort(key=lambda status: (status["id"], status["pid"]))
+
+			# Move to the top of the screen and clear it, to refresh in place
+			if isTty:
+				sys.stdout.write("\033[H\033[J")
+			lib.info("%s - %i running application(s), refreshed every %ss" % (time.strftime("%H:%M:%S"), len(statusList), args.interval))
+			if statusList:
+				printTable([
+						{"key": "id", "name": "Name"},
+						{"key": "type", "name": "Type"},
+						{"key": "pid", "name": "PID"},
+						{"key": "uptime", "name": "Uptime", "formater": formaterTime},
+						{"key": "cpu", "name": "CPU %", "formater": formaterPercent},
+						{"key": "memory", "name": "Memory", "formater": formaterMemory},
+						{"key": "restart", "name": "Restart"}], groupInstances(statusList), indent=3)
+
+			iteration += 1
+			if args.iterations and iteration >= args.iterations:
+				break
+			time.sleep(args.interval)
+	except KeyboardInterrupt:
+		pass
+
 """
 Run the program specified
 """
@@ -479,7 +763,9 @@ def run(args, verboseConfig=True):
 	nbJobs = args.nbJobs if args.nbJobs > 0 else config["parallelism"]
 
 	optionsStrList = []
-	if nbJobs > 1:
+	if args.nbJobs == 0 and nbJobs > 1:
+		optionsStrList.append("up to %i jobs based on load" % (nbJobs))
+	elif nbJobs > 1:
 		optionsStrList.append("%i jobs" % (nbJobs))
 	if totalIterations > 1:
 		optionsStrList.append("%i iterations" % (totalIterations))
@@ -515,7 +801,10 @@ def run(args, verboseConfig=True):
 				verbose=verbose,
 				timeout=timeout,
 				duration=args.duration,
-				nbJobs=nbJobs)
+				nbJobs=nbJobs,
+				spoolDir=config["artifacts"],
+				historyPath=lib.path(config["artifacts"], ".durations.json"),
+				controller=lib.LoadController(ceiling=nbJobs) if args.nbJobs == 0 and nbJobs > 1 else None)
 	except:
 		sys.exit(1)
 
@@ -536,15 +825,20 @@ def test(args):
 				return True
 		return True if len(filterList) == 0 else False
 
+	# Tests supporting it are split into shards to make use of the parallelism
+	nbShards = (args.nbJobs if args.nbJobs > 0 else config["parallelism"]) if config["platform"] != "windows" else 1
+	reportDirPath = lib.path(config["artifacts"], "tests")
+
 	commandList = []
+	shardedList = []
 	for typeIds, pathList in config["tests"].items():
 		for path in pathList:
 			if isValid(typeIds.lower(), args.filter) or isValid(path.lower(), args.filter):
-				for name in ["test", "run"]:
-					execTest = lib.getCommand(config, name, "%s.%s" % (config["platform"], typeIds), {"path": lib.path(path)})
-					if execTest:
-						commandList.append(execTest)
-						break
+				reportPath = lib.path(reportDirPath, "%s.xml" % (re.sub(r'[^\w\.\-]', "_", path)))
+				name, execTestList, shardReportList = lib.getTestCommands(config, "%s.%s" % (config["platform"], typeIds), ["test", "run"], {"path": lib.path(path), "report": reportPath}, nbShards=nbShards)
+				commandList.extend(execTestList)
+				if shardReportList:
+					shardedList.append({"path": path, "report": reportPath, "shardReports": shardReportList})
 
 	# Ensure there is at least one command
 	if len(commandList) == 0:
@@ -554,10 +848,33 @@ def test(args):
 		else:
 			lib.fatal("There are no valid test%s" % (" or none are matching with %s" % ", ".join(["'%s'" % (filt) for filt in args.filter]) if args.filter else ""))
 
+	# Remove previous reports, including the ones of shards from runs with a different number of jobs
+	for sharded in shardedList:
+		lib.mkdir(reportDirPath)
+		prefix = "%s.shard" % (os.path.basename(os.path.splitext(sharded["report"])[0]))
+		for name in os.listdir(reportDirPath):
+			if name == os.path.basename(sharded["report"]) or name.startswith(prefix):
+				os.remove(lib.path(reportDirPath, name))
+
 	# Tweak the arguments to be compatible with the run command
 	setattr(args, "commandList", commandList)
 	setattr(args, "args", None)
-	run(args, verboseConfig=False)
+	try:
+		run(args, verboseConfig=False)
+	finally:
+		# Merge the reports of the shards and report the failures of each of them
+		for sharded in shardedList:
+			lib.mergeShardReports(sharded["path"], sharded["report"], sharded["shardReports"])
+
+"""
+Merge the reports of the shards of a test, used by the continuous integration
+"""
+def junit(args):
+
+	# Read the configuration
+	readConfig(args, verbose=False)
+
+	lib.mergeShardReports(args.name or args.reportPath, args.reportPath, args.shardReportList)
 
 """
 Return the current hash or None if not available
@@ -569,6 +886,185 @@ def getCurrentHash():
 			return f.read()
 	return None
 
+"""
+Return the path of the local object cache of the tool repository. This cache is shared by all
+checkouts of the machine, if it cannot be created, a private one is used instead.
+"""
+def getRepositoryCachePath():
+	for cachePath in [os.path.join(CACHE_DIRECTORY_PATH, "repository.git"), os.path.join(TEMP_DIRECTORY_PATH, "repository.git")]:
+		try:
+			if not os.path.isdir(cachePath):
+				os.makedirs(cachePath)
+			if not os.path.isfile(os.path.join(cachePath, "HEAD")):
+				lib.shell(["git", "init", "--bare", "-q"], cwd=cachePath)
+			return cachePath
+		except Exception as e:
+			lib.warning("Cannot use repository cache at '%s': %s" % (cachePath, e))
+	lib.fatal("No repository cache available")
+
+"""
+Fetch the latest revision of the repository (without history) into the cache and return its hash.
+If the hash is already known and present in the cache, nothing is fetched.
+"""
+def fetchRepository(cachePath, gitHash=None):
+	if gitHash:
+		try:
+			lib.shell(["git", "cat-file", "-e", "%s^{commit}" % (gitHash)], cwd=cachePath, capture=True)
+			lib.info("Revision %s found in cache '%s'" % (gitHash, cachePath))
+			return gitHash
+		except:
+			pass
+	# Use a reference specific to the repository, this also protects the objects from being pruned
+	ref = "refs/irapp/%s" % (hashlib.sha1(GIT_REPOSITORY.encode("utf-8")).hexdigest())
+	lib.shell(["git", "fetch", "-q", "--depth", "1", "--no-tags", GIT_REPOSITORY, "+HEAD:%s" % (ref)], cwd=cachePath)
+	gitRawHash = lib.shell(["git", "rev-parse", ref], cwd=cachePath, capture=True)
+	return gitRawHash[0].lstrip().split()[0]
+
+"""
+Extract only the specified paths of a revision into the stage directory
+"""
+def extractRepository(cachePath, gitHash, stagePath, pathList):
+	archivePath = os.path.join(TEMP_DIRECTORY_PATH, "stage.tar")
+	lib.shell(["git", "archive", "--format=tar", "-o", archivePath, gitHash] + pathList, cwd=cachePath)
+	with tarfile.open(archivePath) as archive:
+		if hasattr(tarfile, "data_filter"):
+			archive.extractall(stagePath, filter="data")
+		else:
+			archive.extractall(stagePath)
+	os.remove(archivePath)
+
+"""
+Return the path of a specific version of the tool in the shared store
+"""
+def getStorePath(gitHash):
+	return os.path.join(CACHE_DIRECTORY_PATH, gitHash)
+
+"""
+Add a version of the tool to the shared store if not already present and return its path.
+The content is extracted aside and then renamed, so that concurrent checkouts never see a
+partial entry. Files are read-only as they are hard linked by the checkouts.
+"""
+def populateStore(cachePath, gitHash):
+	storePath = getStorePath(gitHash)
+	if not os.path.isdir(storePath):
+		tempPath = "%s.%i.tmp" % (storePath, os.getpid())
+		extractRepository(cachePath, gitHash, tempPath, ["app.py", ".irapp"])
+		for root, dirs, files in os.walk(tempPath):
+			for name in files:
+				mode = os.stat(os.path.join(root, name)).st_mode
+				os.chmod(os.path.join(root, name), mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+		try:
+			os.rename(tempPath, storePath)
+			lib.info("Added version %s to the shared store '%s'" % (gitHash, storePath))
+		except OSError:
+			# Already added concurrently by another checkout
+			lib.rmtree(tempPath)
+	return storePath
+
+"""
+Return the hash of the content of a file, None if it does not exists
+"""
+def getFileHash(path):
+	if not os.path.isfile(path):
+		return None
+	with open(path, "rb") as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+"""
+Install a file to its destination, only if its content changed. The file is replaced atomically
+through a rename, the source must therefore be on the same filesystem.
+@param link If set, the source is kept and the destination is a hard link to it (or a copy if
+            hard links are not supported).
+"""
+def installFile(sourcePath, destinationPath, link=False):
+	if os.path.isfile(destinationPath):
+		# When linking, files with the same content are still replaced to share the storage
+		if link:
+			if os.path.samefile(sourcePath, destinationPath):
+				return
+		elif getFileHash(destinationPath) == getFileHash(sourcePath):
+			return
+	if not os.path.isdir(os.path.dirname(destinationPath)):
+		os.makedirs(os.path.dirname(destinationPath))
+	if link:
+		tempPath = "%s.%i.tmp" % (destinationPath, os.getpid())
+		try:
+			os.link(sourcePath, tempPath)
+		except:
+			shutil.copy2(sourcePath, tempPath)
+		sourcePath = tempPath
+	# Windows does not support rename if the destination already exists
+	if sys.platform == "win32" and os.path.exists(destinationPath):
+		os.chmod(destinationPath, stat.S_IWRITE)
+		os.remove(destinationPath)
+	os.rename(sourcePath, destinationPath)
+
+"""
+Write the content of a file. It is written aside and then replaced, files of a checkout must never be
+written in place as they might be hard linked from the shared store.
+"""
+def writeFile(path, content):
+	tempPath = "%s.%i.tmp" % (path, os.getpid())
+	with open(tempPath, "w") as f:
+		f.write(content)
+	installFile(tempPath, path)
+	if os.path.exists(tempPath):
+		os.remove(tempPath)
+
+"""
+Install the files of a directory to their destination, see installFile().
+"""
+def installTree(sourcePath, destinationPath, link=False):
+	for root, dirs, files in os.walk(sourcePath):
+		for name in files:
+			relativePath = os.path.relpath(os.path.join(root, name), sourcePath)
+			installFile(os.path.join(root, name), os.path.join(destinationPath, relativePath), link=link)
+
+"""
+Install the staged files to their destination, see installFile().
+The new tree is assembled aside and then swapped with the destination through renames, so that an
+interrupted update never leaves a mix of old and new files. Only the paths to keep are carried over
+from the previous tree.
+"""
+def installStage(stagePath, destinationPath, keepPathList=[], link=False):
+	# Complete or discard what is left by interrupted installations
+	completeStage(destinationPath, keepPathList)
+	prefix = "%s." % (os.path.basename(destinationPath))
+	for name in os.listdir(os.path.dirname(destinationPath)):
+		if name.startswith(prefix) and name.endswith(".tmp") and os.path.isdir(os.path.join(os.path.dirname(destinationPath), name)):
+			lib.rmtree(os.path.join(os.path.dirname(destinationPath), name))
+
+	tempPath = "%s.%i.tmp" % (destinationPath, os.getpid())
+	installTree(stagePath, tempPath, link=link)
+	# Once renamed, the new tree is complete and the swap can be resumed by completeStage()
+	os.rename(tempPath, "%s.new" % (destinationPath))
+	completeStage(destinationPath, keepPathList)
+
+"""
+Swap a new tree assembled by installStage() with the destination, if any. Each step can be
+resumed, if it fails (for example on Windows if files are in use), it is completed by the next run.
+"""
+def completeStage(destinationPath, keepPathList=[]):
+	newPath = "%s.new" % (destinationPath)
+	if not os.path.isdir(newPath):
+		return
+	oldPath = "%s.%i.old" % (destinationPath, os.getpid())
+	try:
+		for keepPath in keepPathList:
+			keepNewPath = os.path.join(newPath, os.path.relpath(keepPath, destinationPath))
+			if os.path.lexists(keepPath) and not os.path.lexists(keepNewPath):
+				if not os.path.isdir(os.path.dirname(keepNewPath)):
+					os.makedirs(os.path.dirname(keepNewPath))
+				os.rename(keepPath, keepNewPath)
+		if os.path.isdir(destinationPath):
+			os.rename(destinationPath, oldPath)
+		os.rename(newPath, destinationPath)
+	except OSError as e:
+		lib.warning("Could not replace '%s', it will be completed by the next run: %s" % (destinationPath, e))
+		return
+	if os.path.isdir(oldPath):
+		lib.trash(oldPath)
+
 """
 Updating the tool
 """
@@ -578,6 +1074,7 @@ def update(args):
 	currentGitHash = getCurrentHash()
 	lib.info("Current version: %s" % (str(currentGitHash)))
 
+	gitHash = None
 	if not args.force:
 		gitRemote = lib.shell(["git", "ls-remote", GIT_REPOSITORY, "HEAD"], capture=True)
 		gitHash = gitRemote[0].lstrip().split()[0]
@@ -591,62 +1088,57 @@ def update(args):
 
 	# Create and cleanup the temporary directory
 	if os.path.isdir(TEMP_DIRECTORY_PATH):
-		lib.rmtree(TEMP_DIRECTORY_PATH)
+		lib.trash(TEMP_DIRECTORY_PATH)
 	if not os.path.exists(TEMP_DIRECTORY_PATH):
 		os.makedirs(TEMP_DIRECTORY_PATH)
 
-	# Clone the latest repository into this path
-	lib.shell(["git", "clone", GIT_REPOSITORY, "."], cwd=TEMP_DIRECTORY_PATH)
-
-	# Read the version changes
-	changeList = None
-	if currentGitHash:
-		changeList = lib.shell(["git", "log", "--pretty=\"%s\"", "%s..HEAD" % (currentGitHash)], cwd=TEMP_DIRECTORY_PATH, capture=True, ignoreError=True) 
-
 	# These are the location of the files for the updated and should NOT change over time
 	executableName = "app.py"
 	dependenciesDirectoryName = ".irapp"
 
-	# Remove everything inside the dependencies path, except the current temp directory and the log directory
-	tempFullPath = os.path.realpath(TEMP_DIRECTORY_PATH)
-	logFullPath = os.path.realpath(LOG_DIRECTORY_PATH)
-	for root, dirs, files in os.walk(DEPENDENCIES_PATH):
-		for name in files:
-			os.remove(os.path.join(root, name))
-
-		for name in dirs:
-			fullPath = os.path.realpath(os.path.join(root, name))
-			if not tempFullPath.startswith(fullPath) and not logFullPath.startswith(fullPath):
-				lib.rmtree(fullPath)
-			# Do not look into this path
-			if tempFullPath == fullPath or logFullPath == fullPath:
-				dirs.remove(name)
-
-	# Move the content of the dependencies directory into the new one
-	dependenciesDirectoryPath = os.path.join(TEMP_DIRECTORY_PATH, dependenciesDirectoryName)
-	dependenciesContentFiles = os.listdir(dependenciesDirectoryPath)
-	for fileName in dependenciesContentFiles:
-		# Probably useless but it gives a second guaranty that the files are properly deleted
-		if os.path.exists(os.path.join(DEPENDENCIES_PATH, fileName)):
-			lib.rmtree(os.path.join(DEPENDENCIES_PATH, fileName))
-		shutil.move(os.path.join(dependenciesDirectoryPath, fileName), DEPENDENCIES_PATH)
+	cachePath = getRepositoryCachePath()
+	isShared = args.shared or bool(os.environ.get("IRAPP_SHARED_STORE"))
 
-	# Replace main source file
-	shutil.move(os.path.join(TEMP_DIRECTORY_PATH, executableName), executableName)
+	# If this version is already in the shared store, there is nothing to fetch
+	if isShared and gitHash and os.path.isdir(getStorePath(gitHash)):
+		lib.info("Version %s found in the shared store" % (gitHash))
+		stagePath = getStorePath(gitHash)
+
+	else:
+		# Fetch the latest version, without its history, into the object cache
+		gitHash = fetchRepository(cachePath, gitHash)
+
+		# Only extract the files needed by the tool
+		if isShared:
+			stagePath = populateStore(cachePath, gitHash)
+		else:
+			stagePath = os.path.join(TEMP_DIRECTORY_PATH, "stage")
+			extractRepository(cachePath, gitHash, stagePath, [executableName, dependenciesDirectoryName])
+
+	# Read the version changes, only available if the current version is part of the cache
+	changeList = None
+	if currentGitHash:
+		try:
+			lib.shell(["git", "cat-file", "-e", "%s^{commit}" % (currentGitHash)], cwd=cachePath, capture=True)
+			changeList = lib.shell(["git", "log", "--pretty=%s", "%s..%s" % (currentGitHash, gitHash)], cwd=cachePath, capture=True)
+		except:
+			pass
 
-	# Read again current hash
-	gitRawHash = lib.shell(["git", "rev-parse", "HEAD"], cwd=TEMP_DIRECTORY_PATH, capture=True)
-	gitHash = gitRawHash[0].lstrip().split()[0]
+	# Replace the dependencies, except the current temp directory, the log directory, the trash and the hash
+	# The files from the shared store are hard linked, the others are moved
+	installStage(os.path.join(stagePath, dependenciesDirectoryName), DEPENDENCIES_PATH, keepPathList=DEPENDENCIES_KEEP_PATH_LIST, link=isShared)
+
+	# Replace main source file
+	installFile(os.path.join(stagePath, executableName), EXECUTABLE_PATH, link=isShared)
 
 	# Remove temporary directory
 	try:
-		lib.rmtree(TEMP_DIRECTORY_PATH)
+		lib.trash(TEMP_DIRECTORY_PATH)
 	except Exception as e:
 		lib.warning("Could not delete %s, %s" % (TEMP_DIRECTORY_PATH, e))
 
 	# Create hash file
-	with open(os.path.join(DEPENDENCIES_PATH, ".hash"), "w") as f:
-		f.write(gitHash)
+	writeFile(os.path.join(DEPENDENCIES_PATH, ".hash"), gitHash)
 
 	lib.info("Update to %s succeed." % (gitHash))
 	if changeList:
@@ -692,6 +1184,18 @@ class lib:
 				raise
 		shutil.rmtree(path, ignore_errors=False, onerror=handleRemoveReadonly)
 
+	"""
+	Move a directory into the trash, it will be reclaimed by the next run.
+	"""
+	@staticmethod
+	def trash(path):
+		if not os.path.isdir(TRASH_DIRECTORY_PATH):
+			os.makedirs(TRASH_DIRECTORY_PATH)
+		try:
+			os.rename(path, os.path.join(TRASH_DIRECTORY_PATH, str(uuid.uuid4())))
+		except OSError:
+			lib.rmtree(path)
+
 	"""
 	Execute a shell command in a specific directory.
 	If it fails, it will throw.
@@ -699,10 +1203,11 @@ class lib:
 	@staticmethod
 	def shell(command, cwd=".", capture=False, ignoreError=False, queue=None, signal=None):
 
-		def enqueueOutput(out, queue, signal):
+		def enqueueOutput(out, queue, signal, closed):
 			for line in iter(out.readline, b''):
 				queue.put(line.rstrip().decode('utf-8'))
 			out.close()
+			closed.set()
 			signal.set()
 
 		isReturnStdout = True if capture and not queue else False
@@ -718,9 +1223,13 @@ class lib:
 
 		# Wait until a signal is raised or until the the process is terminated
 		if capture:
-			outputThread = threading.Thread(target=enqueueOutput, args=(proc.stdout, queue, signal))
+			closed = threading.Event()
+			outputThread = threading.Thread(target=enqueueOutput, args=(proc.stdout, queue, signal, closed))
 			outputThread.start()
 			signal.wait()
+			# If the output has been closed, the process is about to terminate, wait for it
+			if closed.is_set():
+				proc.wait()
 		else:
 			while proc.poll() is None:
 				time.sleep(0.1)
@@ -771,13 +1280,18 @@ if __name__ == "__main__":
 
 	commandActions = {
 		"info": info,
+		"top": top,
+		"stats": stats,
+		"logs": logs,
 		"init": action,
 		"clean": action,
 		"build": action,
 		"start": commands,
 		"stop": commands,
+		"restart": commands,
 		"run": run,
 		"test": test,
+		"junit": junit,
 		"update": update
 	}
 
@@ -793,7 +1307,7 @@ if __name__ == "__main__":
 	parserRun = subparsers.add_parser("run", help='Execute the specified commmand.')
 	parserRun.add_argument("-e", "--endless", action="store_true", dest="endless", default=False, help="Run the command endlessly (until it fails).")
 	parserRun.add_argument("-v", "--verbose", action="store_true", dest="verbose", default=False, help="Force printing the output while running the command.")
-	parserRun.add_argument("-j", "--jobs", type=int, action="store", dest="nbJobs", default=1, help="Number of jobs to run in parallel. If 0 is used, the system will automatically pick the number of jobs based on the number of core.")
+	parserRun.add_argument("-j", "--jobs", type=int, action="store", dest="nbJobs", default=1, help="Number of jobs to run in parallel. If 0 is used, the system will automatically adapt the number of jobs to the number of cores and the load of the machine.")
 	parserRun.add_argument("-c", "--cmd", action="append", dest="commandList", default=[], help="Command to be executed. More than one command can be executed simultaneously sequentially. If combined with --jobs the commands will be executed simultaneously.")
 	parserRun.add_argument("-i", "--iterations", type=int, action="store", dest="iterations", default=0, help="Number of iterations to be performed.")
 	parserRun.add_argument("-d", "--duration", type=int, action="store", dest="duration", default=0, help="Run the commands for a specific amount of time (in seconds).")
@@ -803,16 +1317,38 @@ if __name__ == "__main__":
 	parserTest = subparsers.add_parser("test", help='Execute registered tests.')
 	parserTest.add_argument("-e", "--endless", action="store_true", dest="endless", default=False, help="Run the command endlessly (until it fails).")
 	parserTest.add_argument("-v", "--verbose", action="store_true", dest="verbose", default=False, help="Force printing the output while running the command.")
-	parserTest.add_argument("-j", "--jobs", type=int, action="store", dest="nbJobs", default=1, help="Number of jobs to run in parallel. If 0 is used, the system will automatically pick the number of jobs based on the number of core.")
+	parserTest.add_argument("-j", "--jobs", type=int, action="store", dest="nbJobs", default=1, help="Number of jobs to run in parallel. If 0 is used, the system will automatically adapt the number of jobs to the number of cores and the load of the machine.")
 	parserTest.add_argument("-i", "--iterations", type=int, action="store", dest="iterations", default=0, help="Number of iterations to be performed.")
 	parserTest.add_argument("-d", "--duration", type=int, action="store", dest="duration", default=0, help="Run the commands for a specific amount of time (in seconds).")
 	parserTest.add_argument("-t", "--timeout", type=int, action="store", dest="timeout", default=-1, help="Timeout (in seconds) until the iteration should be considered as invalid. If set to -1, an automatic timeout is set, calculated based on the previous run. If set to 0, no timeout is set.")
 	parserTest.add_argument("filter", nargs=argparse.REMAINDER, help='Test filter, a string that matches the test key and test names.')
 
+	parserJunit = subparsers.add_parser("junit", help='Merge the JUnit reports of the shards of a test and report their failures.')
+	parserJunit.add_argument("-o", "--output", action="store", dest="reportPath", required=True, help="Path of the merged report.")
+	parserJunit.add_argument("-n", "--name", action="store", dest="name", default=None, help="Name of the test, used for reporting.")
+	parserJunit.add_argument("shardReportList", action="store", nargs="+", help="The reports of the shards.")
+
 	parserInfo = subparsers.add_parser("info", help='Display information about the script and the loaded modules.')
 	parserInfo.add_argument("--apps", action="store_true", dest="apps", default=False, help="Display information related to the status of running applications.")
 	parserInfo.add_argument("--json", action="store_true", dest="json", default=False, help="Print the output in json format.")
 
+	parserTop = subparsers.add_parser("top", help='Live view of the resources used by the running applications.')
+	parserTop.add_argument("-i", "--interval", type=float, action="store", dest="interval", default=2, help="Refresh interval in seconds (default=2).")
+	parserTop.add_argument("-n", "--iterations", type=int, action="store", dest="iterations", default=0, help="Number of refreshes before exiting, endless if 0.")
+
+	parserStats = subparsers.add_parser("stats", help='Statistics of the resources used by a running application.')
+	parserStats.add_argument("-s", "--since", type=int, action="store", dest="since", default=0, help="Only use the samples of the last seconds specified, all if 0.")
+	parserStats.add_argument("--json", action="store_true", dest="json", default=False, help="Print the output in json format.")
+	parserStats.add_argument("appId", action="store", help="The application identifier.")
+
+	parserLogs = subparsers.add_parser("logs", help='Print the logs of applications, stdout and stderr merged in chronological order.')
+	parserLogs.add_argument("-s", "--since", type=argumentTime, action="store", dest="since", default=None, help="Only print the logs written after this time, a duration (e.g. 15m) or a date (e.g. '2021-05-30 12:00').")
+	parserLogs.add_argument("-u", "--until", type=argumentTime, action="store", dest="until", default=None, help="Only print the logs written before this time, a duration (e.g. 15m) or a date.")
+	parserLogs.add_argument("-g", "--grep", action="store", dest="grep", default=None, help="Only print the lines matching this regular expression.")
+	parserLogs.add_argument("-i", "--ignore-case", action="store_true", dest="ignoreCase", default=False, help="Ignore case distinctions with --grep.")
+	parserLogs.add_argument("-f", "--follow", action="store_true", dest="follow", default=False, help="Keep printing the logs as they are written, through rotations and restarts.")
+	parserLogs.add_argument("appIdList", action="store", nargs="*", help="The application identifiers, all their instances are included. All the applications if none is specified.")
+
 	subparsers.add_parser("init", help='Initialize or setup the project environment.')
 	subparsers.add_parser("clean", help='Clean the project environment from build artifacts.')
 	parserBuild = subparsers.add_parser("build", help='Build the project.')
@@ -821,11 +1357,14 @@ if __name__ == "__main__":
 
 	parserUpdate = subparsers.add_parser("update", help='Update the tool to the latest version available.')
 	parserUpdate.add_argument("-f", "--force", action="store_true", dest="force", default=False, help="If set, it will update even if the last version is detected.")
+	parserUpdate.add_argument("-s", "--shared", action="store_true", dest="shared", default=False, help="Use the shared store of this machine (%s), the files are hard linked from it. Also enabled by setting IRAPP_SHARED_STORE." % (CACHE_DIRECTORY_PATH))
 
 	parserStart = subparsers.add_parser("start", help="Execute a list of predefined commands.")
 	parserStart.add_argument('idList',  action='store', nargs='*', default=["default"], help='The command ID to be started. If none, the command ID named "default" will be started.')
 	parserStop = subparsers.add_parser("stop", help="Stop the applications associated with the predefined commands.")
 	parserStop.add_argument('idList',  action='store', nargs='*', default=["all"], help='The names of the application to be stopped. If none, all applications will be stopped.')
+	parserRestart = subparsers.add_parser("restart", help="Restart the applications one at a time, without downtime for the daemons with listening sockets.")
+	parserRestart.add_argument('idList',  action='store', nargs='*', default=["all"], help='The names of the application to be restarted. If none, all applications will be restarted.')
 
 	args = parser.parse_args()
 
@@ -22,16 +22,27 @@ class EndToEndTests(unittest.TestCase):
 	def setUp(self):
 		# Create a temporary directory
 		self.testDirPath = tempfile.mkdtemp()
+		# Use a dedicated cache directory to not interfere with the one of the machine
+		self.cacheDirPath = tempfile.mkdtemp()
 		# Include the app.py
 		shutil.copyfile(os.path.join(rootDirectory, "app.py"), os.path.join(self.testDirPath, "app.py"))
-		# Modify the git repository path
-		with open(os.path.join(self.testDirPath, "app.py"), "r") as f:
+		self.useLocalRepository()
+		# Update the file
+		self.assertIn("succeed", self.app("update"))
+
+	"""
+	Modify the git repository path of the app.py to point to this repository.
+	This needs to be done after every update as app.py is replaced.
+	The file is replaced and not written in place, as it might be hard linked from the shared store.
+	"""
+	def useLocalRepository(self):
+		path = os.path.join(self.testDirPath, "app.py")
+		with open(path, "r") as f:
 			content = f.read()
 		content = re.sub(r'GIT_REPOSITORY\s*=\s*[^\s]+', "GIT_REPOSITORY = '%s'" % (rootDirectory), content)
-		with open(os.path.join(self.testDirPath, "app.py"), "w") as f:
+		with open("%s.tmp" % (path), "w") as f:
 			f.write(content)
-		# Update the file
-		self.assertIn("succeed", self.app("update"))
+		os.rename("%s.tmp" % (path), path)
 
 	def usePreset(self, name):
 		self.logTest("Using preset '%s' in '%s'" % (name, self.testDirPath))
@@ -51,6 +62,7 @@ class EndToEndTests(unittest.TestCase):
 	def tearDown(self):
 		# Remove the directory after the test
 		self.lib.rmtree(self.testDirPath)
+		self.lib.rmtree(self.cacheDirPath)
 
 	def logTest(self, message):
 		sys.stdout.write("[TEST] %s\n" % (str(message)))
@@ -62,7 +74,8 @@ class EndToEndTests(unittest.TestCase):
 	def app(self, *args):
 		self.logTest("Running app.py %s" % (str(" ".join(list(args)))))
 
-		process = subprocess.Popen([sys.executable, "./app.py"] + list(args), cwd=self.testDirPath, stdin=None, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+		env = dict(os.environ, IRAPP_CACHE_PATH=self.cacheDirPath)
+		process = subprocess.Popen([sys.executable, "./app.py"] + list(args), cwd=self.testDirPath, stdin=None, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
 		stdout, stderr = process.communicate()
 
 		output = stdout.decode("utf-8", "ignore")
@@ -0,0 +1,7 @@
+#include <iostream>
+
+int main (int argc, char *argv[])
+{
+	std::cout << "Hello World!" << std::endl;
+	return 0;
+}
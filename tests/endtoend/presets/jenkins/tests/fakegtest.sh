@@ -0,0 +1,24 @@
+#!/bin/sh
+# Mimic a gtest binary with 2 tests per shard, the tests of the second shard fail
+report=`echo "$1" | sed 's/^--gtest_output=xml://'`
+index=${GTEST_SHARD_INDEX:-0}
+failures=0
+failure=""
+if [ "$index" = "1" ]; then
+	failures=1
+	failure="<failure message=\"Expected true\"/>"
+fi
+cat > "$report" <<END
+<?xml version="1.0" encoding="UTF-8"?>
+<testsuites tests="2" failures="$failures" errors="0" time="0.1" name="AllTests">
+	<testsuite name="Shard$index" tests="2" failures="$failures" errors="0" time="0.1">
+		<testcase name="first" classname="Shard$index" time="0.05"/>
+		<testcase name="second" classname="Shard$index" time="0.05">$failure</testcase>
+	</testsuite>
+</testsuites>
+END
+# Let the other shards complete before failing, as the remaining jobs are killed on failure
+if [ "$failures" != "0" ]; then
+	sleep 1
+fi
+exit $failures
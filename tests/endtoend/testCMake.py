@@ -3,6 +3,8 @@
 
 import base
 import unittest
+import json
+import os
 
 class TestCMake(base.EndToEndTests):
 
@@ -16,5 +18,16 @@ class TestCMake(base.EndToEndTests):
 		buildOutput = self.app("build")
 		print(buildOutput)
 
+		# The outputs of the build configurations that no longer exist are removed
+		staleDirPath = os.path.join(self.testDirPath, "build", "bin.removed")
+		os.makedirs(staleDirPath)
+		self.app("clean")
+		self.assertFalse(os.path.exists(staleDirPath))
+
+		# The second time, the targets are read from the cache
+		for i in range(2):
+			info = json.loads(self.app("info", "--json").strip().split("\n")[-1])
+			self.assertIn("helloworld", info["targets"])
+
 if __name__ == '__main__':
 	base.EndToEndTests.main()
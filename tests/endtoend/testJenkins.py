@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import os
+import re
+import shlex
+
+class TestJenkins(base.EndToEndTests):
+
+	def testJunitShards(self):
+		self.usePreset("jenkins")
+		initOutput = self.app("init")
+		self.assertNotIn("[ERROR]", initOutput)
+
+		with open(os.path.join(self.testDirPath, "Jenkinsfile"), "r") as f:
+			jenkinsfile = f.read()
+
+		# Only keep the stages of a build not running under valgrind
+		stageList = [stage for stage in jenkinsfile.split("stage('Build ") if stage.startswith("debian.cmake.gcc-release'")]
+		self.assertEqual(len(stageList), 1)
+		stage = stageList[0]
+		testList = re.findall(r"--cmd '([^']+)'", stage)
+		mergeList = re.findall(r'sh "(\./app\.py junit [^"]+)"', stage)
+		self.assertEqual(len(testList), 4)
+		self.assertEqual(len(mergeList), 1)
+		for index, test in enumerate(testList):
+			self.assertIn("GTEST_SHARD_INDEX=%i" % (index), test)
+
+		# The second shard fails, the reports are merged nonetheless as in the post step of the pipeline.
+		# The shards run simultaneously whatever the number of cores, so that they all complete.
+		runArgs = ["run", "-j", str(len(testList))]
+		for test in testList:
+			runArgs.extend(["--cmd", test])
+		with self.assertRaises(Exception):
+			self.app(*runArgs)
+		mergeOutput = self.app(*shlex.split(mergeList[0])[1:])
+		self.assertIn("Shard 2/4 of 'tests/fakegtest.sh' has 1 failure(s): Shard1.second", mergeOutput)
+
+		reportPath = shlex.split(mergeList[0])[5]
+		self.assertTrue(reportPath.endswith("_junit.report"))
+		report = self.lib.readJunitReport(os.path.join(self.testDirPath, reportPath))
+		self.assertEqual(report["root"].get("tests"), "8")
+		self.assertEqual(report["failures"], ["Shard1.second"])
+
+if __name__ == '__main__':
+	base.EndToEndTests.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import os
+
+class TestUpdate(base.EndToEndTests):
+
+	def testUpToDate(self):
+		self.useLocalRepository()
+		updateOutput = self.app("update")
+		self.assertIn("Already up to date", updateOutput)
+
+	def testCache(self):
+		# Simulate a checkout that needs to be updated
+		self.useLocalRepository()
+		os.remove(os.path.join(self.testDirPath, ".irapp", ".hash"))
+		os.remove(os.path.join(self.testDirPath, ".irapp", "lib.py"))
+		with open(os.path.join(self.testDirPath, ".irapp", "obsolete.py"), "w") as f:
+			f.write("")
+		updateOutput = self.app("update")
+		self.assertIn("found in cache", updateOutput)
+		self.assertIn("succeed", updateOutput)
+		self.assertTrue(os.path.isfile(os.path.join(self.testDirPath, ".irapp", "lib.py")))
+		self.assertFalse(os.path.exists(os.path.join(self.testDirPath, ".irapp", "obsolete.py")))
+
+	def testForce(self):
+		self.useLocalRepository()
+		updateOutput = self.app("update", "--force")
+		self.assertIn("succeed", updateOutput)
+		self.assertIn("Modules identified", self.app("info"))
+
+	def testInterrupted(self):
+		# Simulate an update interrupted while swapping the dependencies, the next run completes it
+		dependenciesPath = os.path.join(self.testDirPath, ".irapp")
+		os.rename(dependenciesPath, "%s.new" % (dependenciesPath))
+		if os.path.isdir(os.path.join("%s.new" % (dependenciesPath), "log")):
+			self.lib.rmtree(os.path.join("%s.new" % (dependenciesPath), "log"))
+		os.makedirs(os.path.join(dependenciesPath, "log"))
+		with open(os.path.join(dependenciesPath, "log", "kept"), "w") as f:
+			f.write("")
+		self.assertIn("Modules identified", self.app("info"))
+		self.assertFalse(os.path.exists("%s.new" % (dependenciesPath)))
+		self.assertTrue(os.path.isfile(os.path.join(dependenciesPath, "lib.py")))
+		self.assertTrue(os.path.isfile(os.path.join(dependenciesPath, "log", "kept")))
+
+	def testSharedStore(self):
+		self.useLocalRepository()
+		updateOutput = self.app("update", "--force", "--shared")
+		self.assertIn("Added version", updateOutput)
+		with open(os.path.join(self.testDirPath, ".irapp", ".hash"), "r") as f:
+			storePath = os.path.join(self.cacheDirPath, f.read())
+		# Files are shared with the store
+		self.assertEqual(os.stat(os.path.join(self.testDirPath, ".irapp", "lib.py")).st_ino, os.stat(os.path.join(storePath, ".irapp", "lib.py")).st_ino)
+		self.assertIn("Modules identified", self.app("info"))
+
+		# Modifying a checkout does not alter the store
+		with open(os.path.join(storePath, "app.py"), "r") as f:
+			storeContent = f.read()
+		self.useLocalRepository()
+		with open(os.path.join(storePath, "app.py"), "r") as f:
+			self.assertEqual(f.read(), storeContent)
+		with open(os.path.join(self.testDirPath, "app.py"), "r") as f:
+			self.assertNotEqual(f.read(), storeContent)
+
+		# Dependencies are restored from the store
+		os.remove(os.path.join(self.testDirPath, ".irapp", "__init__.py"))
+		self.assertIn("Restoring tool dependencies", self.app("info"))
+
+		# Another update uses the store directly
+		self.useLocalRepository()
+		os.remove(os.path.join(self.testDirPath, ".irapp", ".hash"))
+		updateOutput = self.app("update", "--shared")
+		self.assertIn("found in the shared store", updateOutput)
+
+if __name__ == '__main__':
+	base.EndToEndTests.main()
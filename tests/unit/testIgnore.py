@@ -0,0 +1,37 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+
+class TestIgnore(base.UnitTests):
+
+	def testIsIgnored(self):
+		matcher = self.lib.IgnoreMatcher(["git.gitignore.irapp", "cmake.builds.*-debug", "node"])
+		self.assertTrue(matcher.isIgnored("git", "gitignore", "irapp"))
+		self.assertTrue(matcher.isIgnored("git", "gitignore", "irapp", "nested"))
+		self.assertFalse(matcher.isIgnored("git", "gitignore"))
+		self.assertFalse(matcher.isIgnored("git", "gitignore", "irapp2"))
+		self.assertFalse(matcher.isIgnored("git", "python"))
+		self.assertTrue(matcher.isIgnored("cmake", "builds", "gcc-debug"))
+		self.assertFalse(matcher.isIgnored("cmake", "builds", "gcc-debug-2"))
+		self.assertTrue(matcher.isIgnored("node", "builds"))
+		self.assertFalse(matcher.isIgnored("nodejs"))
+
+	def testApply(self):
+		config = {
+			"git": {"ignore": True},
+			"gitignore": True,
+			"cmake": {"builds": {"gcc-debug": {}, "clang-debug": {}, "gcc-release": {}}},
+			"a.b": True
+		}
+		self.lib.IgnoreMatcher(["git.ignore", "cmake.builds.*-debug", "a"]).apply(config)
+		self.assertEqual(config, {
+			"git": {},
+			"gitignore": True,
+			"cmake": {"builds": {"gcc-release": {}}},
+			"a.b": True
+		})
+
+if __name__ == '__main__':
+	base.UnitTests.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import tempfile
+import shutil
+import os
+
+class TestJunit(base.UnitTests):
+
+	def setUp(self):
+		self.tempDirPath = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDirPath)
+
+	def writeReport(self, name, content):
+		path = os.path.join(self.tempDirPath, name)
+		with open(path, "w") as f:
+			f.write(content)
+		return path
+
+	def testMerge(self):
+		pathList = [
+			self.writeReport("shard0.xml", """<testsuites tests="2" failures="1" disabled="0" errors="0" time="0.5">
+				<testsuite name="A" tests="2" failures="1" disabled="0" errors="0" time="0.5">
+					<testcase name="a1" classname="A"/>
+					<testcase name="a2" classname="A"><failure message="fail"/></testcase>
+				</testsuite>
+			</testsuites>"""),
+			self.writeReport("shard1.xml", """<testsuites tests="1" failures="0" disabled="0" errors="0" time="0.25">
+				<testsuite name="A" tests="1" failures="0" disabled="0" errors="0" time="0.25">
+					<testcase name="a3" classname="A"/>
+				</testsuite>
+			</testsuites>"""),
+			os.path.join(self.tempDirPath, "missing.xml")
+		]
+		outputPath = os.path.join(self.tempDirPath, "merged.xml")
+		reportList = self.lib.mergeJunitReports(pathList, outputPath)
+
+		self.assertEqual(reportList[0]["failures"], ["A.a2"])
+		self.assertEqual(reportList[1]["failures"], [])
+		self.assertEqual(reportList[2], None)
+
+		merged = self.lib.readJunitReport(outputPath)
+		self.assertEqual(merged["root"].get("tests"), "3")
+		self.assertEqual(merged["root"].get("failures"), "1")
+		self.assertEqual(merged["root"].get("time"), "0.750")
+		self.assertEqual(len(merged["root"].findall("testsuite")), 1)
+		self.assertEqual(merged["root"].find("testsuite").get("tests"), "3")
+		self.assertEqual(merged["failures"], ["A.a2"])
+
+if __name__ == '__main__':
+	base.UnitTests.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+import subprocess
+
+class TestLogs(base.UnitTests):
+
+	def setUp(self):
+		self.tempDirPath = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDirPath)
+
+	def read(self, dirPath, prefix):
+		content = b""
+		for path in self.lib.RotatingLog.getSegments(dirPath, prefix):
+			f = self.lib.RotatingLog.open(path)
+			try:
+				content += f.read()
+			finally:
+				f.close()
+		return content.decode("utf-8")
+
+	def testCompression(self):
+		for compression, extension in [("gzip", ".gz"), ("bz2", ".bz2"), ("none", "")] + ([("xz", ".xz")] if self.lib.lzma else []):
+			factory = self.lib.LogFactory(self.tempDirPath, compression, [], maxLogSizeBytes=100, compression=compression)
+			logStdout, logStderr = factory.createLogs(1)
+			lineList = ["line %i\n" % (i) for i in range(50)]
+			for line in lineList:
+				logStdout.add(line)
+			logStdout.close()
+			logStderr.close()
+			self.lib.LogCompressor.wait()
+			pidDirPath = os.path.join(self.tempDirPath, compression, "1")
+			segmentList = self.lib.RotatingLog.getSegments(pidDirPath, "stdout")
+			self.assertEqual(len(segmentList), 4)
+			self.assertTrue(all(path.endswith(".log%s" % (extension)) for path in segmentList))
+			self.assertEqual(self.read(pidDirPath, "stdout"), "".join(lineList))
+			self.assertEqual(self.read(pidDirPath, "stderr"), "")
+
+	def testBudget(self):
+		factory = self.lib.LogFactory(self.tempDirPath, "app", [], maxLogSizeBytes=1000, compression="none", budgetBytes=5000)
+		for pid in [1, 2]:
+			logStdout, logStderr = factory.createLogs(pid)
+			for i in range(100):
+				logStdout.add("%.99i\n" % (i))
+			self.lib.LogCompressor.wait()
+			# The oldest segments are removed first, but never the one being written
+			self.assertTrue(os.path.isfile(logStdout.getLogPath(logStdout.curLogIndex)))
+			logStdout.close()
+			logStderr.close()
+		self.lib.LogCompressor.wait()
+		appDirPath = os.path.join(self.tempDirPath, "app")
+		# All the files are accounted for, not only the segments
+		sizeBytes = sum([os.path.getsize(os.path.join(root, name)) for root, dirs, files in os.walk(appDirPath) for name in files])
+		self.assertTrue(any(name.endswith(".bloom") for root, dirs, files in os.walk(appDirPath) for name in files))
+		self.assertLessEqual(sizeBytes, 5000)
+		self.assertTrue(self.read(os.path.join(appDirPath, "2"), "stdout").endswith("%.99i\n" % (99)))
+		self.assertEqual(self.read(os.path.join(appDirPath, "1"), "stdout").count("\n"), 10)
+
+	def testBudgetExited(self):
+		process = subprocess.Popen([sys.executable, "-c", ""])
+		process.wait()
+		factory = self.lib.LogFactory(self.tempDirPath, "app", [], maxLogSizeBytes=1000, compression="none", budgetBytes=5000)
+		for pid in [process.pid, os.getpid()]:
+			logStdout, logStderr = factory.createLogs(pid)
+			for i in range(100):
+				logStdout.add("%.99i\n" % (i))
+			logStdout.close()
+			logStderr.close()
+			self.lib.LogCompressor.wait()
+		# The directory of the process that exited is removed once all its segments are
+		appDirPath = os.path.join(self.tempDirPath, "app")
+		self.assertEqual(os.listdir(appDirPath), [str(os.getpid())])
+		self.assertTrue(self.read(os.path.join(appDirPath, str(os.getpid())), "stdout").endswith("%.99i\n" % (99)))
+
+	def testSearch(self):
+		factory = self.lib.LogFactory(self.tempDirPath, "app", [], maxLogSizeBytes=200)
+		logStdout, logStderr = factory.createLogs(1)
+		for i in range(100):
+			if i % 10:
+				logStdout.add("line %i info\n" % (i), timestamp=1000 + i)
+			else:
+				logStderr.add("line %i error\n" % (i), timestamp=1000 + i)
+		logStdout.close()
+		logStderr.close()
+		self.lib.LogCompressor.wait()
+
+		appDirPath = os.path.join(self.tempDirPath, "app")
+		def search(**kwargs):
+			return [line.decode("utf-8") for pidDirPath, prefix, line in self.lib.LogSearch([appDirPath], **kwargs).lines()]
+		# stdout and stderr are merged in chronological order
+		self.assertEqual(search(), ["line %i %s\n" % (i, "info" if i % 10 else "error") for i in range(100)])
+		self.assertEqual(search(since=1050, until=1059.5), ["line %i %s\n" % (i, "info" if i % 10 else "error") for i in range(50, 60)])
+		self.assertEqual(search(pattern="error"), ["line %i error\n" % (i) for i in range(0, 100, 10)])
+		self.assertEqual(search(pattern="^line 4\\d ERR", ignoreCase=True), ["line 40 error\n"])
+		self.assertEqual(search(pattern="line 42 info", until=1040), [])
+
+		# The segments that cannot match are skipped
+		for path in self.lib.RotatingLog.getSegments(os.path.join(appDirPath, "1"), "stderr"):
+			bloomFilter = self.lib.BloomFilter.load(self.lib.RotatingLog.getBloomPath(path))
+			self.assertTrue(bloomFilter.mayContain(["rro", "line"]))
+			self.assertFalse(bloomFilter.mayContain(["info"]))
+
+	def testFollow(self):
+		for inotify in [True, False]:
+			logDirPath = os.path.join(self.tempDirPath, str(inotify))
+			factory = self.lib.LogFactory(logDirPath, "app", [], maxLogSizeBytes=100)
+			logStdout, logStderr = factory.createLogs(1)
+			logStdout.add("before\n")
+			follower = self.lib.LogFollower(logDirPath, lambda appId: appId == "app", pattern="line|error", inotify=inotify)
+
+			def poll(nbLines):
+				lineList = []
+				for i in range(20):
+					lineList += [line.decode("utf-8") for pidDirPath, prefix, line in follower.poll(0.5)]
+					if len(lineList) >= nbLines:
+						break
+				return lineList
+
+			try:
+				# The past lines are left to the search, up to the position where the follower starts
+				positions = follower.getPositions()
+				self.assertEqual([line for pidDirPath, prefix, line in self.lib.LogSearch([os.path.join(logDirPath, "app")], limits=positions).lines()], [b"before\n"])
+
+				# Through the rotation of the segments
+				for i in range(20):
+					logStdout.add("line %i\n" % (i))
+				logStdout.add("ignored\n")
+				self.assertEqual(poll(20), ["line %i\n" % (i) for i in range(20)])
+
+				# And the restart of the application, the other applications are not followed
+				logStdout.close()
+				logStderr.close()
+				logStdout, logStderr = factory.createLogs(2)
+				logStderr.add("error\n")
+				otherStdout, otherStderr = self.lib.LogFactory(logDirPath, "other", []).createLogs(3)
+				otherStdout.add("line other\n")
+				self.assertEqual(poll(1), ["error\n"])
+				self.assertEqual(poll(1), [])
+			finally:
+				follower.close()
+				for log in [logStdout, logStderr, otherStdout, otherStderr]:
+					log.close()
+				self.lib.LogCompressor.wait()
+
+if __name__ == '__main__':
+	base.UnitTests.main()
@@ -3,12 +3,162 @@
 
 import base
 import unittest
+import sys
+import os
+import socket
+import tempfile
+import shutil
+import subprocess
+import time
+import timeit
 
 class TestModules(base.UnitTests):
 
+	"""
+	Read the content of a log, once its completed segments are compressed
+	"""
+	def readLog(self, dirPath, prefix):
+		self.lib.LogCompressor.wait()
+		content = b""
+		for path in self.lib.RotatingLog.getSegments(dirPath, prefix):
+			f = self.lib.RotatingLog.open(path)
+			try:
+				content += f.read()
+			finally:
+				f.close()
+		return content.decode("utf-8")
+
 	def testSanityCheck(self):
 		for moduleId, module in self.modules.items():
 			self.lib.configSanityCheck({moduleId: module.config()}, modules={moduleId: module})
 
+	def testProcessSampler(self):
+		sampler = sys.modules[self.modules["daemon"].__module__].ProcessSampler()
+		for i in range(2):
+			processes = sampler.sample()
+			self.assertIn(os.getpid(), processes)
+			self.assertGreaterEqual(processes[os.getpid()]["cpu"], 0)
+			self.assertGreater(processes[os.getpid()]["memory"], 0)
+
+	def testReadinessProbe(self):
+		ReadinessProbe = sys.modules[self.modules["daemon"].__module__].ReadinessProbe
+		tempDirPath = tempfile.mkdtemp()
+		server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		try:
+			server.bind(("localhost", 0))
+			server.listen(1)
+			port = server.getsockname()[1]
+			logDirPath = os.path.join(tempDirPath, "1234")
+			os.makedirs(logDirPath)
+
+			probe = ReadinessProbe({"tcp": port, "log": "^Listening", "pid": "app.pid"}, tempDirPath, tempDirPath)
+			self.assertFalse(probe.check())
+			self.assertEqual(probe.describe(), "log '^Listening', pid 'app.pid'")
+			with open(os.path.join(logDirPath, "stdout.00000000.log"), "w") as f:
+				f.write("Starting\nListening on")
+			self.assertFalse(probe.check())
+			with open(os.path.join(logDirPath, "stdout.00000000.log"), "a") as f:
+				f.write(" port\n")
+			with open(os.path.join(tempDirPath, "app.pid"), "w") as f:
+				f.write(str(os.getpid()))
+			self.assertTrue(probe.check())
+
+			server.close()
+			self.assertFalse(ReadinessProbe({"tcp": "localhost:%i" % (port)}, tempDirPath, tempDirPath).check())
+			with self.assertRaises(Exception):
+				ReadinessProbe({"udp": port}, tempDirPath, tempDirPath)
+		finally:
+			server.close()
+			shutil.rmtree(tempDirPath)
+
+	def testSupervisor(self):
+		Supervisor = sys.modules[self.modules["daemon"].__module__].Supervisor
+		tempDirPath = tempfile.mkdtemp()
+		try:
+			supervisor = Supervisor(tempDirPath)
+			supervisor.add("hello", ["sh", "-c", "echo hello; echo world >&2"])
+			self.assertEqual(supervisor.run(), [])
+			pidList = [name for name in os.listdir(os.path.join(tempDirPath, "hello")) if name.isdigit()]
+			self.assertEqual(len(pidList), 1)
+			for name, content in [("stdout", "hello\n"), ("stderr", "world\n")]:
+				self.assertEqual(self.readLog(os.path.join(tempDirPath, "hello", pidList[0]), name), content)
+				self.assertTrue(os.path.isfile(os.path.join(tempDirPath, "hello", pidList[0], "%s.00000000.log.gz" % (name))))
+
+			supervisor = Supervisor(tempDirPath)
+			supervisor.add("listener", [sys.executable, "-c", "import os, socket, sys; sys.stdout.write(\"%s %s %s\\n\" % (os.environ['LISTEN_FDS'], os.environ['LISTEN_PID'] == str(os.getpid()), socket.fromfd(3, socket.AF_INET, socket.SOCK_STREAM).getsockname()[0]))"], listen=["127.0.0.1:0"])
+			self.assertEqual(supervisor.run(), [])
+			pidList = [name for name in os.listdir(os.path.join(tempDirPath, "listener")) if name.isdigit()]
+			self.assertEqual(self.readLog(os.path.join(tempDirPath, "listener", pidList[0]), "stdout"), "1 True 127.0.0.1\n")
+
+			# The jobserver of the command starting the application is not inherited
+			supervisor = Supervisor(tempDirPath)
+			supervisor.add("environment", ["sh", "-c", "echo ${IRAPP_JOBSERVER:-none}"], env=dict(os.environ, IRAPP_JOBSERVER="fifo:/tmp/jobserver"))
+			self.assertEqual(supervisor.run(), [])
+			pidList = [name for name in os.listdir(os.path.join(tempDirPath, "environment")) if name.isdigit()]
+			self.assertEqual(self.readLog(os.path.join(tempDirPath, "environment", pidList[0]), "stdout"), "none\n")
+
+			# Rolling restart, the new process shares the listening socket with the previous one until it is drained
+			supervisor = Supervisor(tempDirPath)
+			app = supervisor.add("rolling", ["sleep", "1000"], listen=["127.0.0.1:0"])
+			previousProcess = app.process
+			app.spawnNext(0)
+			self.assertNotEqual(app.pid, previousProcess.pid)
+			self.assertIsNone(previousProcess.poll())
+			app.drain(0)
+			self.assertEqual(previousProcess.wait(), -15)
+			self.assertIsNone(app.process.poll())
+			app.stop(0)
+			self.assertEqual(supervisor.run(), [])
+
+			supervisor = Supervisor(tempDirPath)
+			supervisor.add("missing", ["dfsfjisdfhjdsjofhohfdsfsdjfhdsfjkh"])
+			errorList = supervisor.run()
+			self.assertEqual(len(errorList), 1)
+			self.assertIn("Could not start", errorList[0])
+		finally:
+			shutil.rmtree(tempDirPath)
+
+	def testStop(self):
+		daemon = sys.modules[self.modules["daemon"].__module__]
+		tempDirPath = tempfile.mkdtemp()
+		try:
+			# The applications are terminated at once, only the ones ignoring SIGTERM are killed once their timeout expires
+			supervisor = daemon.Supervisor(tempDirPath)
+			stubborn = supervisor.add("stubborn", ["sh", "-c", "trap '' TERM; sleep 1000"], stopTimeoutS=0.5)
+			polite = supervisor.add("polite", ["sh", "-c", "sleep 1000"], stopTimeoutS=10)
+			time.sleep(0.2)
+			timeStart = timeit.default_timer()
+			stubborn.stop(timeStart)
+			polite.stop(timeStart)
+			self.assertEqual(supervisor.run(), [])
+			self.assertLess(timeit.default_timer() - timeStart, 5)
+			self.assertEqual(len(stubborn.killedPidList), 2)
+			self.assertEqual(polite.killedPidList, [])
+
+			processList = [subprocess.Popen(["sleep", "1000"]), subprocess.Popen(["sh", "-c", "trap '' TERM; while true; do sleep 0.1; done"])]
+			time.sleep(0.2)
+			self.assertEqual(daemon.Daemon.terminateProcesses([process.pid for process in processList], 0.5), [processList[1].pid])
+			self.assertEqual([process.wait() for process in processList], [-15, -9])
+
+			# Without control socket, the processes are terminated with the timeout of the applications, which can be below the default
+			logDirPath = os.path.join(tempDirPath, "daemon")
+			os.makedirs(os.path.join(logDirPath, "stubborn"))
+			os.makedirs(os.path.join(logDirPath, "replicated@0"))
+			instance = daemon.Daemon({"root": tempDirPath, "log": logDirPath, "start": [
+					{"command": "daemon stubborn sh", "stopTimeout": 0.5},
+					{"command": "daemon replicated sh", "stopTimeout": 2},
+					"daemon default sh"]})
+			self.assertEqual(instance.getStopTimeout("stubborn"), 0.5)
+			self.assertEqual(instance.getStopTimeout("default"), 10)
+			self.assertEqual(instance.getStopTimeout(), 2)
+			process = subprocess.Popen(["sh", "-c", "trap '' TERM; while true; do sleep 0.1; done"])
+			time.sleep(0.2)
+			timeStart = timeit.default_timer()
+			self.assertEqual(daemon.Daemon.terminateProcesses([process.pid], instance.getStopTimeout("stubborn")), [process.pid])
+			self.assertEqual(process.wait(), -9)
+			self.assertLess(timeit.default_timer() - timeStart, 5)
+		finally:
+			shutil.rmtree(tempDirPath)
+
 if __name__ == '__main__':
 	base.UnitTests.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import importlib
+import threading
+import tempfile
+import shutil
+import gzip
+import io
+import os
+try:
+	import http.client as httplib
+except ImportError:
+	import httplib
+
+class TestServer(base.UnitTests):
+
+	def setUp(self):
+		self.tempDirPath = tempfile.mkdtemp()
+		with open(os.path.join(self.tempDirPath, "index.html"), "wb") as f:
+			f.write(b"0123456789")
+		with open(os.path.join(self.tempDirPath, "large.bin"), "wb") as f:
+			f.write(b"x" * (256 * 1024))
+		with open(os.path.join(self.tempDirPath, "app.js"), "wb") as f:
+			f.write(b"var a = 1;")
+		with gzip.open(os.path.join(self.tempDirPath, "app.js.gz"), "wb") as f:
+			f.write(b"var a = 1;")
+
+		server = importlib.import_module("irapp.server")
+		self.cwd = os.getcwd()
+		os.chdir(self.tempDirPath)
+		self.server = server.StaticServer(0, "127.0.0.1")
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.start()
+		self.connection = httplib.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+
+	def tearDown(self):
+		self.connection.close()
+		self.server.shutdown()
+		self.server.server_close()
+		self.thread.join()
+		os.chdir(self.cwd)
+		shutil.rmtree(self.tempDirPath)
+
+	def request(self, path, headers={}):
+		self.connection.request("GET", path, headers=headers)
+		response = self.connection.getresponse()
+		return response, response.read()
+
+	def testConditional(self):
+		# Served twice to go through the cache, on the same connection
+		for i in range(2):
+			response, body = self.request("/")
+			self.assertEqual(response.status, 200)
+			self.assertEqual(body, b"0123456789")
+		etag = response.getheader("ETag")
+		response, body = self.request("/index.html", {"If-None-Match": etag})
+		self.assertEqual(response.status, 304)
+		self.assertEqual(body, b"")
+		response, body = self.request("/index.html", {"If-Modified-Since": response.getheader("Last-Modified")})
+		self.assertEqual(response.status, 304)
+
+	def testRange(self):
+		response, body = self.request("/index.html", {"Range": "bytes=2-4"})
+		self.assertEqual(response.status, 206)
+		self.assertEqual(body, b"234")
+		self.assertEqual(response.getheader("Content-Range"), "bytes 2-4/10")
+		response, body = self.request("/large.bin", {"Range": "bytes=-3"})
+		self.assertEqual(response.status, 206)
+		self.assertEqual(body, b"xxx")
+		response, body = self.request("/index.html", {"Range": "bytes=20-"})
+		self.assertEqual(response.status, 416)
+		response, body = self.request("/large.bin")
+		self.assertEqual(len(body), 256 * 1024)
+
+	def testPrecompressed(self):
+		response, body = self.request("/app.js", {"Accept-Encoding": "gzip, deflate"})
+		self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+		self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+		self.assertEqual(gzip.GzipFile(fileobj=io.BytesIO(body)).read(), b"var a = 1;")
+		response, body = self.request("/app.js")
+		self.assertEqual(response.getheader("Content-Encoding"), None)
+		self.assertEqual(body, b"var a = 1;")
+
+if __name__ == '__main__':
+	base.UnitTests.main()
@@ -3,6 +3,10 @@
 
 import base
 import unittest
+import tempfile
+import os
+import sys
+import time
 
 class TestShell(base.UnitTests):
 
@@ -22,5 +26,117 @@ class TestShell(base.UnitTests):
 	def testMultiError(self):
 		self.assertRaises(Exception, self.lib.shellMulti, ([["dfsfjisdfhjdsjofhohfdsfsdjfhdsfjkh", "hello"], ["echo", "world"]]))
 
+	def testMultiCapture(self):
+		spoolDir = tempfile.mkdtemp()
+		try:
+			self.assertRaises(Exception, self.lib.shellMulti, [["sh", "-c", "seq 1 10000; exit 1"]], verbose=False, spoolDir=spoolDir, captureSizeBytes=1024)
+			with open(os.path.join(spoolDir, "shellMulti", "worker.0.log"), "r") as f:
+				self.assertEqual(len(f.read().split()), 10000)
+		finally:
+			self.lib.rmtree(spoolDir)
+
+	def testOutputCapture(self):
+		capture = self.lib.OutputCapture(maxSizeBytes=10)
+		for i in range(100):
+			capture.put("%i" % (i))
+		self.assertEqual(capture.tail(), ["97", "98", "99"])
+
+	def testDurationHistory(self):
+		tempDir = tempfile.mkdtemp()
+		try:
+			historyPath = os.path.join(tempDir, "durations.json")
+			self.lib.shellMulti([["sleep", "0.5"], ["true"]], historyPath=historyPath)
+			history = self.lib.DurationHistory(historyPath)
+			self.assertGreater(history.estimate(["sleep", "0.5"]), history.estimate(["true"]))
+			# Unknown commands get the average of the known ones
+			self.assertGreater(history.estimate(["unknown"]), history.estimate(["true"]))
+			self.assertEqual(history.sort([["true"], ["unknown"], ["sleep", "0.5"]]), [["sleep", "0.5"], ["unknown"], ["true"]])
+		finally:
+			self.lib.rmtree(tempDir)
+
+	def testJobserver(self):
+		tempDir = tempfile.mkdtemp()
+		try:
+			owner = self.lib.Jobserver.create(os.path.join(tempDir, "jobserver"), 3)
+			attached = self.lib.Jobserver.fromEnvironment()
+			self.assertEqual(attached.acquireSlots(10)[0], 3)
+			self.assertEqual(owner.acquire(), None)
+			# Tokens are given back when closing
+			attached.close()
+			attached = self.lib.Jobserver.fromEnvironment(hasImplicitSlot=False)
+			nbSlots, tokens = attached.acquireSlots(10)
+			self.assertEqual(nbSlots, 2)
+			for token in tokens:
+				attached.release(token)
+			# Lending the implicit slot makes an extra token available
+			with owner.lend():
+				nbSlots, tokens = attached.acquireSlots(10)
+				self.assertEqual(nbSlots, 3)
+				for token in tokens:
+					attached.release(token)
+			attached.close()
+			owner.close()
+			self.assertFalse(os.path.exists(owner.path))
+		finally:
+			os.environ.pop(self.lib.Jobserver.ENV_VARIABLE, None)
+			self.lib.rmtree(tempDir)
+
+	def testMultiJobserver(self):
+		tempDir = tempfile.mkdtemp()
+		try:
+			outputPath = os.path.join(tempDir, "output")
+			self.lib.jobserver = self.lib.Jobserver.create(os.path.join(tempDir, "jobserver"), 2)
+			script = "import time; start = time.time(); time.sleep(0.3); open(%r, 'a').write('%%f %%f\\n' %% (start, time.time()))" % (outputPath)
+			self.lib.shellMulti([[sys.executable, "-c", script]] * 4, nbJobs=4)
+			self.assertEqual(self.lib.jobserver.acquireSlots(10)[0], 2)
+			# The jobs never overlap more than the budget of the jobserver
+			with open(outputPath, "r") as f:
+				intervalList = [[float(value) for value in line.split()] for line in f.read().splitlines()]
+			self.assertEqual(len(intervalList), 4)
+			maxOverlap = max(len([1 for start, end in intervalList if start <= timestamp < end]) for timestamp, _ in intervalList)
+			self.assertLessEqual(maxOverlap, 2)
+		finally:
+			self.lib.jobserver.close()
+			self.lib.jobserver = None
+			os.environ.pop(self.lib.Jobserver.ENV_VARIABLE, None)
+			self.lib.rmtree(tempDir)
+
+	def testLoadController(self):
+		controller = self.lib.LoadController(floor=2, ceiling=4, intervalS=0)
+		for i in range(10):
+			self.assertTrue(2 <= controller.getLimit() <= 4)
+		self.assertTrue(controller.hasMemoryFor(None))
+		if controller.getAvailableMemoryKB() is not None:
+			self.assertFalse(controller.hasMemoryFor(controller.getAvailableMemoryKB() + 1))
+
+	def testMultiAdaptive(self):
+		tempDir = tempfile.mkdtemp()
+		try:
+			historyPath = os.path.join(tempDir, "durations.json")
+			self.lib.shellMulti([["sleep", "0.1"], ["true"], ["echo", "hello"]], nbJobs=4, historyPath=historyPath, controller=self.lib.LoadController(ceiling=4))
+			if hasattr(os, "wait4"):
+				self.assertGreater(self.lib.DurationHistory(historyPath).memory(["sleep", "0.1"]), 0)
+		finally:
+			self.lib.rmtree(tempDir)
+
+	def testTrash(self):
+		tempDir = tempfile.mkdtemp()
+		try:
+			trashDirPath = os.path.join(tempDir, "trash")
+			path = os.path.join(tempDir, "directory")
+			os.makedirs(os.path.join(path, "nested"))
+			with open(os.path.join(path, "nested", "file"), "w") as f:
+				f.write("content")
+			self.lib.trash(path, trashDirPath)
+			self.assertFalse(os.path.exists(path))
+			# Reclaimed in the background
+			for i in range(100):
+				if not [name for name in os.listdir(trashDirPath) if not name.startswith(".")]:
+					break
+				time.sleep(0.1)
+			self.assertEqual([name for name in os.listdir(trashDirPath) if not name.startswith(".")], [])
+		finally:
+			self.lib.rmtree(tempDir)
+
 if __name__ == '__main__':
 	base.UnitTests.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import threading
+import time
+import os
+
+class TestStart(base.UnitTests):
+
+	"""
+	Module recording the applications started, in their starting order
+	"""
+	class Recorder:
+		def __init__(self):
+			self.startedList = []
+			self.lock = threading.Lock()
+
+		def start(self, appId, commandList, context, ready=None):
+			time.sleep(float(commandList[0]))
+			with self.lock:
+				self.startedList.append((appId, context["cwd"]))
+
+	def setUp(self):
+		self.recorder = TestStart.Recorder()
+		self.config = {"root": os.path.dirname(os.path.realpath(__file__)), "pimpl": {"daemon": self.recorder}}
+
+	def testConcurrent(self):
+		presets = {
+			"db": ["daemon db 0.2"],
+			"services": [
+				{"command": "daemon s1 0", "after": ["db"]},
+				"cd ..",
+				{"command": "daemon s2 0.1", "after": ["db"]},
+				"daemon s3 0",
+				"sleep 0",
+				"daemon s4 0"
+			]
+		}
+		self.lib.start(self.config, presets, ["services"])
+		appIdList = [appId for appId, cwd in self.recorder.startedList]
+		self.assertEqual(appIdList, ["s3", "db", "s1", "s2", "s4"])
+		self.assertEqual(dict(self.recorder.startedList)["s1"], self.config["root"])
+		self.assertEqual(dict(self.recorder.startedList)["s2"], os.path.dirname(self.config["root"]))
+
+	def testErrors(self):
+		for presets, message in [
+				({"default": [{"command": "daemon a 0", "after": ["b"]}, {"command": "daemon b 0", "after": ["a"]}]}, "Circular"),
+				({"default": [{"command": "daemon a 0", "after": ["c"]}]}, "Unknown dependency"),
+				({"default": ["unknown a 0"]}, "Unknown command")]:
+			try:
+				self.lib.start(self.config, presets)
+				self.fail("No exception raised")
+			except Exception as e:
+				self.assertIn(message, str(e))
+
+if __name__ == '__main__':
+	base.UnitTests.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+# -*- coding: iso-8859-1 -*-
+
+import base
+import unittest
+import tempfile
+import shutil
+import os
+
+class TestStats(base.UnitTests):
+
+	def setUp(self):
+		self.tempDirPath = tempfile.mkdtemp()
+		self.path = os.path.join(self.tempDirPath, "stats")
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDirPath)
+
+	def testRing(self):
+		stats = self.lib.StatsRing(self.path, capacity=10, create=True)
+		for i in range(15):
+			stats.append(i, i * 1024, i, i, timestamp=1000 + i)
+		stats.close()
+
+		stats = self.lib.StatsRing(self.path)
+		recordList = stats.records()
+		self.assertEqual([record["time"] for record in recordList], [1000 + i for i in range(5, 15)])
+		self.assertEqual(len(stats.records(since=1010)), 5)
+		stats.close()
+
+		# Re-opening for writing keeps the history
+		stats = self.lib.StatsRing(self.path, capacity=10, create=True)
+		self.assertEqual(len(stats.records()), 10)
+		stats.close()
+
+	def testSummarize(self):
+		stats = self.lib.StatsRing(self.path, capacity=200, create=True)
+		for i in range(1, 101):
+			stats.append(i, i, 1, 2, timestamp=i)
+		stats.close()
+		summary = self.lib.StatsRing.read(self.path)
+		self.assertEqual(summary["samples"], 100)
+		self.assertEqual(summary["cpu"]["min"], 1)
+		self.assertEqual(summary["cpu"]["max"], 100)
+		self.assertEqual(summary["cpu"]["p50"], 50)
+		self.assertEqual(summary["cpu"]["p90"], 90)
+		self.assertEqual(summary["memory"]["avg"], 50.5)
+		self.assertEqual(summary["fds"]["p99"], 2)
+		self.assertEqual(self.lib.StatsRing.read(os.path.join(self.tempDirPath, "missing")), None)
+
+if __name__ == '__main__':
+	base.UnitTests.main()